@@ -25,6 +25,7 @@ from src.infrastructure.database.models.logs import *  # noqa
 from src.infrastructure.database.models.user import *  # noqa
 from src.infrastructure.database.models.diary import *  # noqa
 from src.infrastructure.database.models.records import *  # noqa
+from src.infrastructure.database.models.profile_current import *  # noqa
 from src.infrastructure.database.models.users_comparison import *  # noqa
 from src.infrastructure.database.models.basic_profiles.traits_basic import *  # noqa
 from src.infrastructure.database.models.triads.dark_triad import *  # noqa
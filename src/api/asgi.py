@@ -1,9 +1,14 @@
-from contextlib import asynccontextmanager
+import asyncio
+from contextlib import asynccontextmanager, suppress
 
 import uvicorn
 from fastapi import FastAPI
 
 from src.api.app.main import fastapi_app
+from src.core.services.dependencies.prompt_cache_stats_dep import prompt_cache_stats
+from src.core.services.dependencies.redis_service_dep import redis_service
+from src.core.services.dependencies.task_service_dep import close_task_service
+from src.core.services.dependencies.telegram_service_dep import telegram_service
 from src.infrastructure.config.config import config
 from src.infrastructure.config.loggerConfig import configure_logging
 from src.infrastructure.database.engine import clear_metadata_cache
@@ -15,9 +20,22 @@ async def lifespan(app: FastAPI):
     await clear_metadata_cache()
     print("✓ Metadata cache cleared")
 
+    # инвалидации L1 кэша от других процессов
+    invalidation_listener = asyncio.create_task(redis_service.listen_invalidations())
+    # доставка уведомлений из очереди Telegram (notify/broadcast)
+    delivery_worker = asyncio.create_task(telegram_service.run_delivery_worker())
+
     yield  # Здесь приложение работает
 
     # Shutdown (опционально)
+    invalidation_listener.cancel()
+    delivery_worker.cancel()
+    # дождаться worker: снятие лизы и незавершённые отправки — до закрытия сессии
+    with suppress(asyncio.CancelledError):
+        await delivery_worker
+    await telegram_service.close()
+    await prompt_cache_stats.close()
+    await close_task_service()
     print("Application shutting down")
 
 app = fastapi_app
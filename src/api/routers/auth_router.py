@@ -3,6 +3,8 @@ from fastapi import HTTPException
 from fastapi.responses import JSONResponse
 
 from src.core.schemas.user_schemas import UserTelegramDataSchema
+from src.core.services.cache_services.redis_service import RedisService
+from src.core.services.dependencies.redis_service_dep import get_redis_service
 from src.core.services.dependencies.user_service_dep import get_user_service
 from src.core.services.user_service import UserService
 from src.api.utils import auth
@@ -53,7 +55,8 @@ async def telegram_auth(
                 }
             ]
         ),
-        user_service: UserService = Depends(get_user_service)
+        user_service: UserService = Depends(get_user_service),
+        redis_service: RedisService = Depends(get_redis_service)
 ):
     """
     Авторизирует или регистрирует нового пользователя.
@@ -62,6 +65,7 @@ async def telegram_auth(
     """
     try:
         user_data = await user_service.repo.get_or_create_from_telegram(telegram_user_data)
+        await redis_service.invalidate_user_profile(user_data.telegram_id)  # могли смениться username/имя
         return {
             "token": await auth.generate_jwt(user_data.id, user_data.telegram_id)
         }
@@ -1,7 +1,11 @@
+import asyncio
+import json
 import logging
-from typing import Annotated, Any, Type
+import uuid
+from typing import Annotated, AsyncIterator, Type
 
 from fastapi import APIRouter, Depends, Header, BackgroundTasks, HTTPException
+from fastapi.responses import StreamingResponse
 from starlette import status
 
 from src.api.request_schemas.check_in import CheckInRequest
@@ -10,7 +14,7 @@ from src.api.response_schemas.characteristic import CharacteristicResponseRaw
 from src.api.response_schemas.check_in import CheckInResponse, AssistantResponse
 from src.api.response_schemas.survey import ResearchSurveyFinishResponse
 from src.api.utils.auth import get_auth_user
-from src.core.enums.user import GENDER, TALKING_MODES_CHECK_IN, TALKING_MODES
+from src.core.enums.user import GENDER, TALKING_MODES_CHECK_IN
 from src.core.lexicon.instructions_prompt import get_dark_triads_instruction, get_humor_profile_instruction, MBTI_PROMPT
 from src.core.prompts.generation.survey import SURVEY_PROMPT, TO_LEARN_SURVEY_FINISH
 from src.core.prompts.main.long import LONG_PROMPT
@@ -25,14 +29,20 @@ from src.core.services.dependencies.assistant_service_dep import get_assistant_s
 from src.core.services.dependencies.cache_service_dep import get_cache_service
 from src.core.services.dependencies.characteristic_service_dep import get_characteristic_service
 from src.core.services.dependencies.redis_service_dep import get_redis_service
+from src.core.services.dependencies.task_service_dep import get_task_service
 from src.core.services.dependencies.telegram_service_dep import get_telegram_service
 from src.core.services.dependencies.user_service_dep import get_user_service
+from src.core.services.service_container import get_session
 from src.core.services.telegram_service import TelegramService
 from src.core.services.user_service import UserService
-from src.core.utils.funcs import clean_characteristic_json, clean_characteristics_json, \
-    get_characteristics_raw_most_diff
+from src.core.task_logic.task_service import TaskService
+from src.core.utils.funcs import clean_characteristic_json, render_characteristic_block
+from src.core.utils.streaming import OnDelta, iterate_deltas
 from src.infrastructure.database.models.base import S
-from src.infrastructure.database.repository.characteristic_repo import get_schema_type_from_name
+from src.infrastructure.database.repository.characteristic_repo import CharacteristicRepository, \
+    get_schema_type_from_name
+from src.infrastructure.database.repository.user_repo import UserRepository
+from src.infrastructure.database.unit_of_work import unit_of_work
 
 router = APIRouter(prefix="/main")
 logger = logging.getLogger(__name__)
@@ -46,48 +56,226 @@ async def check_in(
         assistant_service: Annotated[AssistantService, Depends(get_assistant_service)],
         cache_service: Annotated[CacheService, Depends(get_cache_service)],
         user_service: Annotated[UserService, Depends(get_user_service)],
-        background_tasks: BackgroundTasks,
-        telegram_service: Annotated[TelegramService, Depends(get_telegram_service)],
+        task_service: Annotated[TaskService, Depends(get_task_service)],
         authorization: Annotated[str | None, Header()] = None
 ):
     """CHECK_IN"""
-    await user_service.repo.create_log(
-        user_id=user.id,
-        log_text=request.message
+    return await run_check_in(
+        user=user,
+        characteristic_service=characteristic_service,
+        request=request,
+        assistant_service=assistant_service,
+        cache_service=cache_service,
+        user_service=user_service,
+        task_service=task_service,
+        authorization=authorization
     )
 
-    check_in_response: CheckInResponse = await assistant_service.get_check_in(
-        request.message
+
+@router.post(path="/check_in/stream")
+async def check_in_stream(
+        user: Annotated[UserSchema, Depends(get_auth_user)],
+        characteristic_service: Annotated[CharacteristicService, Depends(get_characteristic_service)],
+        request: CheckInRequest,
+        assistant_service: Annotated[AssistantService, Depends(get_assistant_service)],
+        cache_service: Annotated[CacheService, Depends(get_cache_service)],
+        user_service: Annotated[UserService, Depends(get_user_service)],
+        task_service: Annotated[TaskService, Depends(get_task_service)],
+        authorization: Annotated[str | None, Header()] = None
+):
+    """
+    CHECK_IN со стримингом ответа (SSE):
+        event: delta  — {"text": кусок user_answer} по мере генерации
+        event: result — финальный AssistantResponse
+        event: error  — {"detail": ...}
+    """
+    async def run(on_delta: OnDelta) -> AssistantResponse:
+        return await run_check_in(
+            user=user,
+            characteristic_service=characteristic_service,
+            request=request,
+            assistant_service=assistant_service,
+            cache_service=cache_service,
+            user_service=user_service,
+            task_service=task_service,
+            authorization=authorization,
+            on_delta=on_delta
+        )
+
+    async def events() -> AsyncIterator[str]:
+        try:
+            async for item in iterate_deltas(run):
+                if isinstance(item, str):
+                    yield f"event: delta\ndata: {json.dumps({'text': item}, ensure_ascii=False)}\n\n"
+                else:
+                    yield f"event: result\ndata: {item.model_dump_json()}\n\n"
+        except Exception as e:
+            logger.exception(f"Ошибка в стриме check_in для {user.telegram_id}")
+            detail: str = e.detail if isinstance(e, HTTPException) else "check_in failed"
+            yield f"event: error\ndata: {json.dumps({'detail': detail}, ensure_ascii=False)}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
     )
-    logger.info(f"выбранный режим {user.telegram_id}: {check_in_response.talk_mode}")
 
-    all_chars: list[CharacteristicResponseRaw] | None = await characteristic_service.repo.get_all_characteristics(
-        user.id
+
+async def run_check_in(
+        user: UserSchema,
+        characteristic_service: CharacteristicService,
+        request: CheckInRequest,
+        assistant_service: AssistantService,
+        cache_service: CacheService,
+        user_service: UserService,
+        task_service: TaskService,
+        authorization: str | None = None,
+        on_delta: OnDelta | None = None
+) -> AssistantResponse:
+    """
+    CHECK_IN (тело ручки, on_delta — стриминг user_answer)
+
+    Сначала этапы LLM (без транзакции — соединение пула не держится на время ответа),
+    затем записи check_in (лог + батчи характеристик) — одна короткая транзакция (save_check_in).
+    Лог сохраняется и при ошибке LLM/обрыве стрима, батчи — только при успешной классификации.
+    Генерация характеристик ставится в arq только для схем с набравшимся батчем — после commit.
+    """
+    response: AssistantResponse | None = None
+    try:
+        response = await get_check_in_response(
+            user=user,
+            characteristic_service=characteristic_service,
+            request=request,
+            assistant_service=assistant_service,
+            cache_service=cache_service,
+            on_delta=on_delta
+        )
+    finally:
+        # shield: при обрыве SSE задача отменяется, а запись должна дойти до commit
+        ready_schemas: list[str] = await asyncio.shield(
+            save_check_in(
+                user=user,
+                request=request,
+                classifications=response.classifications if response else None,
+                assistant_service=assistant_service,
+                cache_service=cache_service
+            )
+        )
+
+    change_name: bool = "ChangeName" in (response.classifications or [])
+    if ready_schemas or change_name:
+        # [ генерация характеристик — задачи arq (переживают рестарт API, повторяются при ошибках) ]
+        access_token = authorization.split(" ")[1]
+        await task_service.enqueue_characteristic_generation(
+            user=user,
+            message=request.message,
+            characteristic_names=ready_schemas,
+            change_name=change_name,
+            access_token=access_token,
+            talk_mode=user.talk_mode
+        )
+
+    return response
+
+
+async def save_check_in(
+        user: UserSchema,
+        request: CheckInRequest,
+        classifications: list[str] | None,
+        assistant_service: AssistantService,
+        cache_service: CacheService
+) -> list[str]:
+    """
+    Записи check_in одной транзакцией (unit_of_work) в отдельной сессии: лог + сообщение в батчи схем.
+    Возвращает схемы, у которых набрался батч.
+    """
+    schema_types: list[Type[S]] = [
+        schema_type for schema_type in map(get_schema_type_from_name, classifications or [])
+        if schema_type is not None
+    ]
+
+    async with get_session() as write_session, unit_of_work(write_session):
+        await UserRepository(write_session).create_log(user_id=user.id, log_text=request.message)
+        if not schema_types:
+            return []
+
+        # [ сообщение в батчи: один upsert счётчиков + одна вставка логов ]
+        return [
+            schema_type.__name__ for schema_type in await CharacteristicService(
+                repo=CharacteristicRepository(write_session, cache_service),
+                assistant_service=assistant_service
+            ).add_to_batches(
+                user_id=user.id,
+                message_text=request.message,
+                schema_types=schema_types,
+                talk_mode=user.talk_mode
+            )
+        ]
+
+
+async def get_check_in_response(
+        user: UserSchema,
+        characteristic_service: CharacteristicService,
+        request: CheckInRequest,
+        assistant_service: AssistantService,
+        cache_service: CacheService,
+        on_delta: OnDelta | None = None
+) -> AssistantResponse:
+    """
+    Ответ на check_in. Этапы запускаются графом зависимостей:
+        — блоки профиля (кэш по версии, при промахе — БД) и история из Redis
+          идут параллельно с классификацией (LLM)
+        — ответ шизы стартует, как только готовы классификация, профиль и история
+    """
+    check_in_task = asyncio.create_task(
+        assistant_service.get_check_in(request.message)
+    )
+    fragments_task = asyncio.create_task(
+        load_profile_fragments(user.id, characteristic_service.repo, cache_service.redis_service)
+    )
+    history_task = asyncio.create_task(
+        assistant_service.load_history(user_id=user.id, redis_service=cache_service.redis_service)
     )
-    critical_profiles, mbti_prompt = await get_critical_profiles_to_assistant(
-        all_chars=all_chars,
+
+    stages = (check_in_task, fragments_task, history_task)
+    try:
+        check_in_response, fragments, history = await asyncio.gather(*stages)
+    except Exception:
+        for task in stages:
+            task.cancel()
+        raise
+
+    logger.info(f"выбранный режим {user.telegram_id}: {check_in_response.talk_mode}")
+
+    critical_profiles, mbti_prompt = get_critical_profiles_to_assistant(
+        fragments=fragments,
         characteristics_name=check_in_response.characteristics_list,
         real_name=user.real_name,
         gender=user.gender
     )
 
+    # статичный промпт режима идёт первым, данные юзера — после (префиксный кэш DeepSeek)
     prompt: str = ""
     match check_in_response.talk_mode:
         case TALKING_MODES_CHECK_IN.RESEARCH:
-            prompt = mbti_prompt + RESEARCH_DEFAULT_PROMPT
+            prompt = RESEARCH_DEFAULT_PROMPT
         case TALKING_MODES_CHECK_IN.SURVEY:
-            prompt = mbti_prompt + SURVEY_PROMPT
+            prompt = SURVEY_PROMPT
         case TALKING_MODES_CHECK_IN.INDIVIDUAL_PSYCHO:
-            prompt = mbti_prompt + PSYCHO_PROMPT
+            prompt = PSYCHO_PROMPT
         case TALKING_MODES_CHECK_IN.LONG:
-            prompt = mbti_prompt + LONG_PROMPT
+            prompt = LONG_PROMPT
 
     response: AssistantResponse | None = await assistant_service.get_shiza_response(
         user_message=request.message,
         user_id=user.id,
         prompt=prompt,
         redis_service=cache_service.redis_service,
-        user_profile=critical_profiles
+        user_context=mbti_prompt,
+        user_profile=critical_profiles,
+        history=history,
+        on_delta=on_delta,
+        prompt_template=f"check_in:{check_in_response.talk_mode.value}"
     )
     response.about_mbti = check_in_response.about_mbti
 
@@ -97,23 +285,6 @@ async def check_in(
             detail=f"Ошибка в ручке check_in: response from assistant not found"
         )
 
-    if response.classifications:
-        # [ background ]
-        access_token = authorization.split(" ")[1]
-        background_tasks.add_task(
-            process_generation_background,
-            user=user,
-            message=request.message,
-            classifications=response.classifications,
-            characteristic_service=characteristic_service,
-            cache_service=cache_service,
-            telegram_service=telegram_service,
-            access_token=access_token,
-            assistant_service=assistant_service,
-            talk_mode=user.talk_mode,
-            user_service=user_service
-        )
-
     return response
 
 
@@ -138,7 +309,8 @@ async def research_survey_finish(
         user_message=request.answer,
         redis_service=redis_service,
         user_id=user.id,
-        prompt=PSYCHO_PROMPT
+        prompt=PSYCHO_PROMPT,
+        prompt_template="survey_finish"
     )
 
     background_tasks.add_task(
@@ -154,42 +326,98 @@ async def research_survey_finish(
     return response
 
 
-async def get_critical_profiles_to_assistant(
-        all_chars: list[CharacteristicResponseRaw],
+STYLE_SCHEMAS = ("MBTISchema", "HumorProfileSchema", "DarkTriadsSchema")
+
+
+def render_profile_fragments(all_chars: list[CharacteristicResponseRaw]) -> dict[str, str]:
+    """
+    Рендер блоков профиля для промпта (поля схем — из реестра, результат кэшируется по версии профиля):
+        — "mbti": описание типа, "style": как разговаривать с юзером (юмор + тёмная триада)
+        — "schema:<SchemaName>": характеристика схемы (поле: значение — описание)
+    """
+    fragments: dict[str, str] = {}
+    all_chars_dict = {
+        schema.type: schema.characteristics[0]
+        for schema in all_chars
+    }
+
+    # [ ОПИСАНИЕ ЮЗЕРА ]
+    if "MBTISchema" in all_chars_dict:
+        fragments["mbti"] = MBTI_PROMPT[all_chars_dict["MBTISchema"].primary_type]
+
+    # [ стиль общения ]
+    style_instructions: list[str] = []
+    if "HumorProfileSchema" in all_chars_dict:
+        humor_text = get_humor_profile_instruction(all_chars_dict["HumorProfileSchema"])
+        if humor_text:
+            style_instructions.append(humor_text)
+    if "DarkTriadsSchema" in all_chars_dict:
+        dark_text = get_dark_triads_instruction(all_chars_dict["DarkTriadsSchema"])
+        if dark_text:
+            style_instructions.append(dark_text)
+    if style_instructions:
+        fragments["style"] = "".join(style_instructions)
+
+    for schema_name, schema_instance in all_chars_dict.items():
+        if schema_name in STYLE_SCHEMAS:
+            continue
+        cleaned = clean_characteristic_json(schema_instance, generate=False)
+        if cleaned:
+            fragments[f"schema:{schema_name}"] = render_characteristic_block(schema_name, cleaned)
+
+    return fragments
+
+
+async def load_profile_fragments(
+        user_id: uuid.UUID,
+        characteristic_repo: CharacteristicRepository,
+        redis_service: RedisService
+) -> dict[str, str]:
+    """
+    Блоки профиля текущей версии из Redis; при промахе (профиль обновился) — рендер из БД и запись в кэш.
+    Ошибки Redis не мешают ответу — блоки просто рендерятся заново.
+    """
+    version: str | None = None
+    try:
+        fragments, version = await redis_service.get_profile_fragments(user_id)
+        if fragments is not None:
+            return fragments
+    except Exception as e:
+        logger.warning(f"Кэш блоков профиля недоступен для {user_id}: {e}")
+
+    fragments = render_profile_fragments(await characteristic_repo.get_all_characteristics(user_id))
+
+    if version is not None:
+        try:
+            await redis_service.set_profile_fragments(user_id, fragments, version)
+        except Exception as e:
+            logger.warning(f"Не удалось сохранить блоки профиля {user_id}: {e}")
+    return fragments
+
+
+def get_critical_profiles_to_assistant(
+        fragments: dict[str, str],
         characteristics_name: list[str],
         real_name: str | None = None,
         gender: GENDER | None = None
 ) -> tuple[str, str]:
     """
+        Собирает промпт из готовых блоков (render_profile_fragments), без обхода схем.
+
         Возвращает:
         - text: форматированные характеристики (cleaned)
         - mbti_prompt: строка с "О пользователе:" + стиль общения (MBTI + Humor + DarkTriads)
         """
-
-    critical_schemas = {
-        'MBTISchema', 'HumorProfileSchema', 'DarkTriadsSchema'
-    }
-    for name in characteristics_name:
-        critical_schemas.add(name)
-
-    critical_characteristics: dict[str, dict[str, Any]] = {}
-    prompt_parts: list[str] = []
-
-    if not all_chars:
+    if not fragments:
         return "", ""
 
-    all_chars_dict = {
-        schema.type: schema.characteristics[0]
-        for schema in all_chars
-    }
+    prompt_parts: list[str] = []
 
     # [ ОПИСАНИЕ ЮЗЕРА ]
     # TODO: вынести в отдельную функцию get_prompt_parts(dark_triads, humor_profile, real_name, gender)
-    if "MBTISchema" in all_chars_dict:
-        schema_instance = all_chars_dict["MBTISchema"]
-
+    if "mbti" in fragments:
         prompt_parts.append("О пользователе:\n")
-        prompt_parts.append(MBTI_PROMPT[schema_instance.primary_type])
+        prompt_parts.append(fragments["mbti"])
 
         if real_name:
             prompt_parts.append(f"Пользователя зовут: {real_name}")
@@ -199,28 +427,16 @@ async def get_critical_profiles_to_assistant(
             ...
 
     # [ стиль общения ]
-    style_instructions: list[str] = []
-    if "HumorProfileSchema" in all_chars_dict:
-        humor_text = get_humor_profile_instruction(all_chars_dict["HumorProfileSchema"])
-        if humor_text:
-            style_instructions.append(humor_text)
-    if "DarkTriadsSchema" in all_chars_dict:
-        dark_text = get_dark_triads_instruction(all_chars_dict["DarkTriadsSchema"])
-        if dark_text:
-            style_instructions.append(dark_text)
-    if style_instructions:
+    if "style" in fragments:
         prompt_parts.append("\nКак нужно разговаривать с пользователем:\n")
-        prompt_parts.extend(style_instructions)
-
-    for schema_name in critical_schemas:
-        if schema_name in all_chars_dict and schema_name not in ["MBTISchema", "HumorProfileSchema",
-                                                                 "DarkTriadsSchema"]:
-            schema_instance = all_chars_dict[schema_name]
-            cleaned = clean_characteristic_json(schema_instance, generate=False)
-            if cleaned:
-                critical_characteristics[schema_name] = cleaned
+        prompt_parts.append(fragments["style"])
 
-    text: str = clean_characteristics_json(critical_characteristics)
+    # порядок схем — как в классификации (стабильный промпт для префиксного кэша)
+    text: str = "\n\n".join(
+        fragments[f"schema:{schema_name}"]
+        for schema_name in dict.fromkeys(characteristics_name)
+        if f"schema:{schema_name}" in fragments
+    )
 
     mbti_prompt = "".join(prompt_parts).strip()
     return text, mbti_prompt
@@ -240,7 +456,8 @@ async def process_survey_finish_in_background(
         user_id=user.id,
         redis_service=redis_service,
         prompt=TO_LEARN_SURVEY_FINISH,
-        pydantic_model=ResearchSurveyFinishResponse
+        pydantic_model=ResearchSurveyFinishResponse,
+        prompt_template="survey_finish_characteristics"
     )
 
     await characteristic_service.research_survey_finish(
@@ -251,87 +468,3 @@ async def process_survey_finish_in_background(
 
     #  Уведомляем пользователя, что именно поменялось (сделать словарь key: characteristic_name; value: читабельное название)
     # await telegram_service.
-
-
-async def process_generation_background(
-        user: UserSchema,
-        message: str,
-        classifications: list[str],
-        characteristic_service: CharacteristicService,
-        cache_service: CacheService,
-        telegram_service: TelegramService,
-        assistant_service: AssistantService,
-        access_token: str | None,
-        talk_mode: TALKING_MODES,
-        user_service: UserService | None
-):
-    """
-    смотрит
-    — какие характеристики можно извлечь из сообщения юзера
-    — последовательно генерирует их / добавляет в батч-очереди.
-    """
-    notification_was_send: bool = False
-
-    for characteristic_name in classifications:
-        if characteristic_name == "ChangeName":
-            # [ смена имени юзера ]
-            history: list[dict] = await cache_service.redis_service.get_history(
-                user_id=user.id,
-                max_messages=5
-            )
-            history_str: str = "".join([message["content"] for message in history])
-
-            new_name: str = await assistant_service.extract_user_name(message + history_str)
-            await user_service.repo.update(user.id, real_name=new_name)
-            await cache_service.redis_service.invalidate_user_profile(user.telegram_id)
-
-            continue
-
-        try:
-            schema_type: Type[S] | None = get_schema_type_from_name(characteristic_name)
-
-            generated: bool = await characteristic_service.should_generate_characteristic(
-                user_id=user.id,
-                message_text=message,
-                schema_type=schema_type,
-                access_token=access_token,
-                telegram_id=user.telegram_id,
-                talk_mode=talk_mode
-            )
-
-            if generated:
-                await cache_service.redis_service.invalidate_characteristics(user.telegram_id)
-
-                characteristics_raw: list[S] = await cache_service.get_characteristic_row(
-                    access_token,
-                    user.telegram_id,
-                    characteristic_name=characteristic_name,
-                )
-
-                if notification_was_send:  # [ только одно уведомление за цикл ]
-                    continue
-
-                if characteristic_name not in ["MBTISchema", "HollandCodesSchema", "HexacoSchema"]:
-                    percent_diff, diff_type, field_name = get_characteristics_raw_most_diff(characteristics_raw)
-
-                    message_text = await assistant_service.generate_telegram_message_characteristic_diff(
-                        str(percent_diff) + diff_type + field_name
-                    )
-                    await telegram_service.send_message(
-                        message=f"{message_text}",
-                        user_telegram_id=user.telegram_id
-                    )
-                else:
-                    await telegram_service.send_message(
-                        message=f"<b>твой тип личности стал точнее з:</b>",
-                        user_telegram_id=user.telegram_id
-                    )
-
-                notification_was_send = True
-
-        except Exception as e:
-            # Важно: логировать, но не падать — фоновая задача
-            logger.exception(
-                f"Ошибка обработки характеристики {characteristic_name} для пользователя {user.id}",
-                extra={"error": str(e)}
-            )
@@ -2,9 +2,13 @@ from typing import Annotated
 
 from fastapi import APIRouter, Depends
 
-from src.api.utils.auth import get_auth_user
+from src.api.utils.auth import get_auth_user, validate_api_key
 from src.core.schemas.user_schemas import UserSchema
+from src.core.services.cache_services.llm_response_cache import LLMResponseCache
+from src.core.services.dependencies.llm_response_cache_dep import get_llm_response_cache
+from src.core.services.dependencies.prompt_cache_stats_dep import get_prompt_cache_stats
 from src.core.services.dependencies.user_service_dep import get_user_service
+from src.core.services.prompt_cache_stats import PromptCacheStats
 from src.core.services.user_service import UserService
 from src.core.task_logic.tasks.summarize_daily_logs import summarize_daily_logs
 
@@ -26,3 +30,19 @@ async def test_summary_logs(
     return {
         "response": response
     }
+
+
+@router.get(path="/prompt_cache_stats", dependencies=[Depends(validate_api_key)])
+async def get_prompt_cache_stats_route(
+        prompt_cache_stats: Annotated[PromptCacheStats, Depends(get_prompt_cache_stats)]
+):
+    """hit ratio префиксного кэша DeepSeek по шаблонам промптов"""
+    return await prompt_cache_stats.get_stats()
+
+
+@router.get(path="/llm_response_cache_stats", dependencies=[Depends(validate_api_key)])
+async def get_llm_response_cache_stats_route(
+        llm_response_cache: Annotated[LLMResponseCache, Depends(get_llm_response_cache)]
+):
+    """кэш ответов LLM: записей и hit/miss по шаблонам (hit — сэкономленный запрос к DeepSeek)"""
+    return await llm_response_cache.get_stats()
@@ -6,15 +6,18 @@ from fastapi import APIRouter, Depends, HTTPException, Header
 from src.api.request_schemas.typification import TypificationRequest, TypificationAssistantRequest, \
     TypificationGetQuestion, DeleteTypificationRequest, TypificationGetStatisticsRequest
 from src.api.utils.auth import get_auth_user
+from src.core import consts
 from src.core.lexicon.typifications import TypificationPack
 from src.core.prompts.typifications.get_next_question import GET_NEXT_QUESTION
 from src.core.prompts.typifications.mid_stats import CAREER_HOLLAND_MID_PROMPT, NEURO_DIVERSITY_MID_PROMPT, \
     MOOD_ANXIETY_MID_PROMPT, LOOKS_DISORDERS_MID_PROMPT, PERSONALITY_CORE_MID_PROMPT
 from src.core.schemas.user_schemas import UserSchema
 from src.core.services.assistant_service import AssistantService
+from src.core.services.cache_services.redis_service import RedisService
 from src.core.services.characteristic_service import CharacteristicService
 from src.core.services.dependencies.assistant_service_dep import get_assistant_service
 from src.core.services.dependencies.characteristic_service_dep import get_characteristic_service
+from src.core.services.dependencies.redis_service_dep import get_redis_service
 from src.core.services.dependencies.user_service_dep import get_user_service
 from src.core.services.user_service import UserService
 
@@ -26,8 +29,9 @@ async def delete_progress(
         typification_name: TypificationPack,
         user: Annotated[UserSchema, Depends(get_auth_user)],
         user_service: Annotated[UserService, Depends(get_user_service)],
+        redis_service: Annotated[RedisService, Depends(get_redis_service)],
 ):
-    """Удалить прогресс типирования"""
+    """Удалить прогресс типирования + invalidate cache"""
     typification_to_field_name: dict = {
         TypificationPack.PERSONALITY_CORE: "passed_personality_core",
         TypificationPack.CAREER_HOLLAND: "passed_holland",
@@ -46,6 +50,7 @@ async def delete_progress(
     update_data = {field_name: False}
 
     await user_service.repo.update(user.id, **update_data)
+    await redis_service.invalidate_user_profile(user.telegram_id)
 
 
 @router.get(path="/get_stats_on_middle_of_test")
@@ -80,7 +85,9 @@ async def get_stats_on_middle_of_test(
 
     stats: str = await assistant_service.get_response(
         input_query=assistant_request.model_dump_json(),
-        prompt=prompt
+        prompt=prompt,
+        prompt_template=f"typification_mid:{request.typification_name.value}",
+        cache_ttl=consts.LLM_RESPONSE_CACHE_TTL_SECONDS
     )
     return stats
 
@@ -93,7 +100,9 @@ async def get_question(
     """Склеивает прошлый ответ с текущим вопросом"""
     return await assistant_service.get_response(
         input_query=request.model_dump_json(),
-        prompt=GET_NEXT_QUESTION
+        prompt=GET_NEXT_QUESTION,
+        prompt_template="typification_question",
+        cache_ttl=consts.LLM_RESPONSE_CACHE_TTL_SECONDS
     )
 
 
@@ -103,6 +112,7 @@ async def end_typification(
         characteristic_service: Annotated[CharacteristicService, Depends(get_characteristic_service)],
         user_service: Annotated[UserService, Depends(get_user_service)],
         user: Annotated[UserSchema, Depends(get_auth_user)],
+        redis_service: Annotated[RedisService, Depends(get_redis_service)],
         authorization: Annotated[str | None, Header()] = None
 ):
     """ЗАКАНЧИВАЕТ ТЕСТ И ЗАПИСЫВАЕТ НОВУЮ ХАРАКТЕРИСТИКУ / ХАРАКТЕРИСТИКИ"""
@@ -115,19 +125,19 @@ async def end_typification(
     await delete_progress(
         typification_name,
         user,
-        user_service
+        user_service,
+        redis_service
     )
 
     # [ generation ]
     characteristics_to_generate: list[str] = request.characteristics
-    for characteristic_name in characteristics_to_generate:
-        await characteristic_service.typification_end(
-            user.id,
-            answers=request.answers,
-            characteristic_name=characteristic_name,
-            access_token=access_token,
-            user_telegram_id=user.telegram_id
-        )
+    await characteristic_service.typification_end_many(
+        user.id,
+        answers=request.answers,
+        characteristic_names=characteristics_to_generate,
+        access_token=access_token,
+        user_telegram_id=user.telegram_id
+    )
 
 
 @router.put(path="/delete_progress")
@@ -135,9 +145,11 @@ async def delete_progress_from_request(
         request: DeleteTypificationRequest,
         user: Annotated[UserSchema, Depends(get_auth_user)],
         user_service: Annotated[UserService, Depends(get_user_service)],
+        redis_service: Annotated[RedisService, Depends(get_redis_service)],
 ):
     await delete_progress(
         request.typification_name,
         user,
-        user_service
+        user_service,
+        redis_service
     )
@@ -1,7 +1,7 @@
 import logging
 from datetime import datetime
 from datetime import timedelta, UTC
-from typing import Annotated
+from typing import Annotated, Awaitable, Callable
 from uuid import UUID
 
 import jwt
@@ -13,6 +13,8 @@ from starlette.status import HTTP_403_FORBIDDEN
 
 from src.infrastructure.config.config import config
 from src.core.schemas.user_schemas import UserSchema
+from src.core.services.cache_services.redis_service import RedisService
+from src.core.services.dependencies.redis_service_dep import get_redis_service
 from src.core.services.dependencies.user_service_dep import get_user_service
 from src.core.services.user_service import UserService
 
@@ -37,13 +39,11 @@ async def generate_jwt(user_id: UUID, user_tg_id: str) -> str:
     )
 
 
-async def decode_jwt(token: str) -> UUID:
+async def decode_jwt_payload(token: str) -> dict:
     """
-    Decoding jwt-token to user_id
+    Decoding jwt-token to payload: {"sub": user_id, "tg_id": telegram_id, "exp": ...}
 
     :param token: JWT-Token
-
-    :returns: User ID: UUID
     """
     try:
         payload = jwt.decode(
@@ -57,24 +57,63 @@ async def decode_jwt(token: str) -> UUID:
     except jwt.InvalidTokenError:
         raise HTTPException(401, "JWT token invalid!")
 
-    user_id = payload.get("sub")  # user_id
-    if not user_id:
+    if not payload.get("sub"):  # user_id
         raise HTTPException(403, "Can't get user_id from payload")
-    return user_id
+    return payload
+
+
+async def decode_jwt(token: str) -> UUID:
+    """
+    Decoding jwt-token to user_id
+
+    :param token: JWT-Token
+
+    :returns: User ID: UUID
+    """
+    payload: dict = await decode_jwt_payload(token)
+    return payload["sub"]
+
+
+async def resolve_auth_user(
+        payload: dict,
+        redis_service: RedisService,
+        load_user: Callable[[UUID], Awaitable[UserSchema | None]]
+) -> UserSchema | None:
+    """
+    Юзер по payload токена: L1 -> Redis (профиль по tg_id) -> БД.
+
+    Кэш профиля общий с ботом, поэтому его сбрасывают все пути изменения юзера
+    (invalidate_user_profile). Из БД идём только при промахе.
+
+    :param load_user: загрузка юзера из БД по user_id (при промахе кэша)
+    """
+    user_id: str = payload["sub"]
+    telegram_id: str | None = payload.get("tg_id")
+
+    if telegram_id:
+        user: UserSchema | None = await redis_service.get_user_profile(telegram_id)
+        if user is not None and str(user.id) == user_id:
+            return user
+
+    user = await load_user(user_id)
+    if user is not None:
+        await redis_service.set_user_profile(user.telegram_id, user)
+    return user
 
 
 async def get_auth_user(
         user_service: Annotated[UserService, Depends(get_user_service)],
+        redis_service: Annotated[RedisService, Depends(get_redis_service)],
         token: str = Depends(config.OAUTH2_SCHEME)
 ) -> UserSchema:
     """
-    Getting User Schema from token.
+    Getting User Schema from token (cached).
 
     :return: User: UserSchema
     """
-    user_id: UUID = await decode_jwt(token)
+    payload: dict = await decode_jwt_payload(token)
 
-    user: UserSchema = await user_service.repo.get_user(user_id)
+    user: UserSchema | None = await resolve_auth_user(payload, redis_service, user_service.repo.get_user)
     if not user:
         logger.exception(f"Cannot find user by token: {token}")
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Wrong user.")
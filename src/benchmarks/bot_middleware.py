@@ -0,0 +1,83 @@
+"""
+Бенчмарк DependencyInjectionMiddleware (апдейтов/сек):
+    — старый вариант: после каждого апдейта закрывается общий клиент Redis
+    — новый вариант: ресурсы живут весь процесс, на апдейт — только его scope
+
+Хендлер пустой, access token заранее лежит в Redis из REDIS_URL — меряется только накладная middleware.
+
+Запуск:
+    python -m src.benchmarks.bot_middleware --updates 5000 --concurrency 50
+"""
+import argparse
+import asyncio
+import time
+from typing import Any
+
+from aiogram.types import User
+from redis.asyncio import Redis
+
+from src.bot.middlewares.depends_injectors import DependencyInjectionMiddleware
+from src.core.services.cache_services.cache_service import CacheService
+from src.core.services.cache_services.redis_service import RedisService
+from src.infrastructure.config.redis_config import REDIS_POOL
+
+USERS_COUNT = 100
+
+
+class LegacyDependencyInjectionMiddleware(DependencyInjectionMiddleware):
+    """Прежнее поведение (для сравнения): закрывает общий Redis после каждого апдейта"""
+
+    async def __call__(self, handler, event, data) -> Any:
+        try:
+            return await super().__call__(handler, event, data)
+        finally:
+            await self.cache_service.redis_service.redis.close()
+
+
+async def handler(event, data: dict) -> None:
+    return None
+
+
+async def measure(middleware: DependencyInjectionMiddleware, updates: int, concurrency: int) -> float:
+    users = [User(id=10_000 + i, is_bot=False, first_name="bench") for i in range(USERS_COUNT)]
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int) -> None:
+        async with semaphore:
+            await middleware(handler, None, {"event_from_user": users[i % USERS_COUNT]})
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(updates)))
+    return updates / (time.perf_counter() - start)
+
+
+async def run(updates: int, concurrency: int) -> None:
+    redis_client = Redis(connection_pool=REDIS_POOL)
+    redis_service = RedisService(redis_client)
+    cache_service = CacheService(redis_service=redis_service, api_client=None)
+
+    for i in range(USERS_COUNT):
+        await redis_service.set_access_token(str(10_000 + i), "bench-token", expire_seconds=600)
+
+    try:
+        for name, middleware_cls in (
+                ("close-per-update", LegacyDependencyInjectionMiddleware),
+                ("shared", DependencyInjectionMiddleware),
+        ):
+            middleware = middleware_cls(cache_service=cache_service, api_client=None)
+            await measure(middleware, updates // 10, concurrency)  # прогрев
+            rate = await measure(middleware, updates, concurrency)
+            print(f"{name:<17} {rate:9.1f} updates/s")
+    finally:
+        await redis_client.delete(*(redis_service._get_token_key(str(10_000 + i)) for i in range(USERS_COUNT)))
+        await redis_client.aclose()
+        await REDIS_POOL.disconnect()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--updates", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+
+    asyncio.run(run(args.updates, args.concurrency))
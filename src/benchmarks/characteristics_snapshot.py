@@ -0,0 +1,135 @@
+"""
+Бенчмарк CharacteristicRepository.get_all_characteristics:
+    — старый вариант: count + по одному SELECT на каждую таблицу профиля (21 round trip)
+    — новый вариант: один UNION ALL запрос
+
+Засевает тестового юзера в БД из DATABASE_URL, сверяет вывод обоих вариантов и печатает тайминги.
+Юзер удаляется после прогона (ON DELETE CASCADE).
+
+Запуск:
+    python -m src.benchmarks.characteristics_snapshot --rows 200 --iterations 50
+"""
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+from datetime import datetime, timedelta, UTC
+
+from sqlalchemy import select, desc, func, delete, insert
+
+from src.api.response_schemas.characteristic import CharacteristicResponseRaw
+from src.core.schemas.user_schemas import UserTelegramDataSchema
+from src.infrastructure.database.engine import async_session_maker, engine
+from src.infrastructure.database.models.records import UserRecords
+from src.infrastructure.database.models.user import User
+from src.infrastructure.database.repository.characteristic_repo import CharacteristicRepository, \
+    CHARACTERISTIC_SCHEMAS_TO_MODELS
+from src.infrastructure.database.repository.user_repo import UserRepository
+
+
+async def get_all_characteristics_sequential(session, user_id: uuid.UUID) -> list[CharacteristicResponseRaw]:
+    """Прежняя реализация (для сравнения)"""
+    profile_names = {m.__tablename__ for m in CHARACTERISTIC_SCHEMAS_TO_MODELS.values()}
+    counts_result = await session.execute(
+        select(UserRecords.profile_name, func.count(UserRecords.id))
+        .where(UserRecords.user_id == user_id, UserRecords.profile_name.in_(profile_names))
+        .group_by(UserRecords.profile_name)
+    )
+    records_map = dict(counts_result.all())
+
+    response: list[CharacteristicResponseRaw] = []
+    for schema_cls, model_cls in CHARACTERISTIC_SCHEMAS_TO_MODELS.items():
+        result = await session.execute(
+            select(model_cls)
+            .where(model_cls.user_id == user_id)
+            .order_by(desc(model_cls.created_at))
+            .limit(20)
+        )
+        instances = result.scalars().all()
+        if not instances:
+            continue
+
+        latest = instances[0]
+        second = next((inst for inst in instances[1:] if inst.created_at.date() != latest.created_at.date()), None)
+        instances = [latest] + ([second] if second else [])
+
+        raw = CharacteristicResponseRaw(
+            type=schema_cls.__name__,
+            characteristics=[schema_cls.model_validate(inst, from_attributes=True) for inst in instances]
+        )
+        raw.characteristics[0].records = records_map.get(model_cls.__tablename__, 0)
+        response.append(raw)
+    return response
+
+
+async def seed_user(rows_per_table: int) -> uuid.UUID:
+    """Создаёт юзера и rows_per_table записей в каждой таблице профиля (по несколько в день)"""
+    async with async_session_maker() as session:
+        user = await UserRepository(session).get_or_create_from_telegram(
+            UserTelegramDataSchema(telegram_id=f"bench-{uuid.uuid4().hex[:12]}", username="bench")
+        )
+
+        now = datetime.now(UTC)
+        for model_cls in CHARACTERISTIC_SCHEMAS_TO_MODELS.values():
+            rows = [
+                {
+                    "user_id": user.id,
+                    "created_at": now - timedelta(hours=6 * i),
+                    "updated_at": now - timedelta(hours=6 * i),
+                }
+                for i in range(rows_per_table)
+            ]
+            await session.execute(insert(model_cls), rows)
+            await session.execute(
+                insert(UserRecords),
+                [{"user_id": user.id, "profile_name": model_cls.__tablename__} for _ in range(rows_per_table)]
+            )
+        await session.commit()
+        return user.id
+
+
+async def measure(loader, user_id: uuid.UUID, iterations: int) -> list[float]:
+    timings: list[float] = []
+    async with async_session_maker() as session:
+        await loader(session, user_id)  # прогрев (соединение, кэш компиляции)
+        for _ in range(iterations):
+            start = time.perf_counter()
+            await loader(session, user_id)
+            timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+async def run(rows_per_table: int, iterations: int) -> None:
+    user_id = await seed_user(rows_per_table)
+
+    async def snapshot(session, uid):
+        return await CharacteristicRepository(session, cache_service=None).get_all_characteristics(uid)
+
+    try:
+        async with async_session_maker() as session:
+            old = await get_all_characteristics_sequential(session, user_id)
+            new = await snapshot(session, user_id)
+        assert [r.model_dump() for r in old] == [r.model_dump() for r in new], "вывод отличается"
+
+        for name, loader in (("sequential", get_all_characteristics_sequential), ("snapshot", snapshot)):
+            timings = await measure(loader, user_id, iterations)
+            print(
+                f"{name:<12} p50={statistics.median(timings):7.2f}ms "
+                f"p95={statistics.quantiles(timings, n=20)[-1]:7.2f}ms "
+                f"mean={statistics.mean(timings):7.2f}ms"
+            )
+    finally:
+        async with async_session_maker() as session:
+            await session.execute(delete(User).where(User.id == user_id))
+            await session.commit()
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=200, help="записей на таблицу профиля")
+    parser.add_argument("--iterations", type=int, default=50)
+    args = parser.parse_args()
+
+    asyncio.run(run(args.rows, args.iterations))
@@ -0,0 +1,90 @@
+"""
+Бенчмарк сборки профиля для промпта check_in (сборок/сек, промах кэша блоков профиля):
+    — старый вариант: поиск схемы линейным проходом по CHARACTERISTIC_SCHEMAS_TO_MODELS,
+      clean_characteristic_json с обходом model_fields и model_dump на каждый вызов
+    — новый вариант: реестр схем (поиск по словарю, поля и описания посчитаны при импорте)
+
+Профиль — все схемы характеристик юзера, заполненные синтетическими значениями; БД и Redis не нужны.
+
+Запуск:
+    python -m src.benchmarks.schema_registry --builds 2000
+"""
+import argparse
+import time
+import uuid
+from datetime import datetime, UTC
+from typing import Any, Callable
+
+from src.core.utils.funcs import clean_characteristic_json, _clean_characteristic_json_reflective, \
+    render_characteristic_block
+from src.infrastructure.database.models.base import S
+from src.infrastructure.database.schema_registry import CHARACTERISTIC_SCHEMAS_TO_MODELS, \
+    CHARACTERISTIC_SCHEMAS_BY_NAME
+
+
+def legacy_get_schema_type_from_name(schema_name: str) -> type[S] | None:
+    """Прежний поиск (для сравнения)"""
+    for schema in CHARACTERISTIC_SCHEMAS_TO_MODELS.keys():
+        if schema_name == schema.__name__:
+            return schema
+
+
+def make_profile() -> dict[str, S]:
+    """Схема → экземпляр со значениями во всех числовых полях"""
+    profile: dict[str, S] = {}
+    for schema in CHARACTERISTIC_SCHEMAS_TO_MODELS:
+        now = datetime.now(UTC)
+        payload: dict[str, Any] = {"id": uuid.uuid4(), "user_id": uuid.uuid4(), "created_at": now, "updated_at": now}
+        for field_name, field_info in schema.model_fields.items():
+            annotation = str(field_info.annotation)
+            if field_name == "records":
+                payload[field_name] = 5
+            elif "float" in annotation:
+                payload[field_name] = 0.5
+        profile[schema.__name__] = schema.model_validate(payload)
+    return profile
+
+
+def build_profile_prompt(
+        profile: dict[str, S],
+        get_schema: Callable[[str], type[S] | None],
+        clean: Callable[[S], dict[str, str]]
+) -> str:
+    blocks: list[str] = []
+    for schema_name, characteristic in profile.items():
+        if get_schema(schema_name) is None:
+            continue
+        blocks.append(render_characteristic_block(schema_name, clean(characteristic)))
+    return "\n\n".join(blocks)
+
+
+def measure(builds: int, get_schema, clean, profile: dict[str, S]) -> float:
+    start = time.perf_counter()
+    for _ in range(builds):
+        build_profile_prompt(profile, get_schema, clean)
+    return builds / (time.perf_counter() - start)
+
+
+def run(builds: int) -> None:
+    profile = make_profile()
+    variants = (
+        ("reflective", legacy_get_schema_type_from_name, _clean_characteristic_json_reflective),
+        ("registry", CHARACTERISTIC_SCHEMAS_BY_NAME.get, clean_characteristic_json),
+    )
+
+    prompts = {name: build_profile_prompt(profile, get_schema, clean) for name, get_schema, clean in variants}
+    assert prompts["reflective"] == prompts["registry"], "промпты отличаются"
+
+    print(f"схем в профиле: {len(profile)}, длина промпта: {len(prompts['registry'])} символов")
+    for name, get_schema, clean in variants:
+        measure(builds // 10, get_schema, clean, profile)  # прогрев
+        rate = measure(builds, get_schema, clean, profile)
+        print(f"{name:<11} {rate:9.1f} builds/s  ({1e6 / rate:7.1f} µs/build)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--builds", type=int, default=2000)
+    args = parser.parse_args()
+
+    run(args.builds)
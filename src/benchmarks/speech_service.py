@@ -0,0 +1,101 @@
+"""
+Бенчмарк SpeechService: проходят ли апдейты других юзеров, пока распознаются голосовые.
+    — старый вариант: синхронный клиент Deepgram прямо в корутине (блокирует event loop)
+    — новый вариант: AsyncDeepgramClient + семафор + таймаут
+
+Deepgram подменяется фейковыми клиентами с задержкой --latency (сеть не нужна).
+Параллельно с --voices распознаваниями «хендлер» обрабатывает апдейт каждые --tick мс —
+меряется, сколько апдейтов успело пройти и максимальная задержка одного апдейта.
+
+Запуск:
+    python -m src.benchmarks.speech_service --voices 8 --latency 0.5
+"""
+import argparse
+import asyncio
+import time
+from types import SimpleNamespace
+
+from src.core.services.speech_to_text_service import SpeechService
+
+
+def _fake_response() -> SimpleNamespace:
+    alternative = SimpleNamespace(transcript="привет")
+    return SimpleNamespace(results=SimpleNamespace(channels=[SimpleNamespace(alternatives=[alternative])]))
+
+
+class _BlockingMedia:
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    def transcribe_file(self, request: bytes, **options) -> SimpleNamespace:
+        time.sleep(self.latency)
+        return _fake_response()
+
+
+class _AsyncMedia:
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    async def transcribe_file(self, request: bytes, **options) -> SimpleNamespace:
+        await asyncio.sleep(self.latency)
+        return _fake_response()
+
+
+def _fake_client(media) -> SimpleNamespace:
+    return SimpleNamespace(listen=SimpleNamespace(v1=SimpleNamespace(media=media)))
+
+
+class LegacySpeechService(SpeechService):
+    """Прежнее поведение (для сравнения): синхронный вызов SDK внутри async метода"""
+
+    async def transcribe_bytes(self, audio_bytes: bytes, **override_options) -> str:
+        response = self.client.listen.v1.media.transcribe_file(request=audio_bytes, **self.default_options)
+        return response.results.channels[0].alternatives[0].transcript
+
+
+async def measure(service: SpeechService, voices: int, tick: float) -> tuple[float, int, float]:
+    """(время всех распознаваний, обработано апдейтов, макс. задержка апдейта в мс)"""
+    processed = 0
+    max_lag = 0.0
+    done = asyncio.Event()
+
+    async def updates() -> None:
+        nonlocal processed, max_lag
+        while not done.is_set():
+            expected = time.perf_counter() + tick
+            await asyncio.sleep(tick)
+            max_lag = max(max_lag, time.perf_counter() - expected)
+            processed += 1
+
+    updates_task = asyncio.create_task(updates())
+    await asyncio.sleep(0)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(service.transcribe_bytes(b"voice") for _ in range(voices)))
+    elapsed = time.perf_counter() - start
+
+    done.set()
+    await updates_task
+    return elapsed, processed, max_lag * 1000
+
+
+async def run(voices: int, latency: float, tick: float) -> None:
+    legacy = LegacySpeechService(api_key="bench")
+    legacy.client = _fake_client(_BlockingMedia(latency))
+
+    service = SpeechService(api_key="bench")
+    service.client = _fake_client(_AsyncMedia(latency))
+
+    for name, speech_service in (("blocking", legacy), ("async", service)):
+        elapsed, processed, max_lag = await measure(speech_service, voices, tick)
+        print(f"{name:<9} voices {elapsed:6.2f}s | updates handled {processed:5d} | max update lag {max_lag:8.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--voices", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.5, help="секунд на одно распознавание")
+    parser.add_argument("--tick", type=float, default=0.01, help="секунд между апдейтами")
+    args = parser.parse_args()
+
+    asyncio.run(run(args.voices, args.latency, args.tick))
@@ -17,13 +17,25 @@ from src.bot.handlers.listing.personality_list import router as personality_rout
 from src.bot.handlers.listing.characteristic_listing import router as characteristic_listing_router
 from src.bot.handlers.diary import router as diary_router
 from src.bot.middlewares.depends_injectors import DependencyInjectionMiddleware
-from src.core.services.dependencies.redis_service_dep import redis_client
+from src.core.services.api_client.inprocess_api import InProcessAPIClient
+from src.core.services.dependencies.api_client_dep import set_api_client, get_api_client
+from src.core.services.dependencies.cache_service_dep import cache_service
+from src.core.services.dependencies.prompt_cache_stats_dep import prompt_cache_stats
+from src.core.services.dependencies.redis_service_dep import redis_client, redis_service
+from src.core.services.dependencies.task_service_dep import close_task_service
+from src.infrastructure.config.redis_config import REDIS_POOL
+from src.infrastructure.config.config import config
 from src.infrastructure.config.loggerConfig import configure_logging
 
 
 def setup_auth(dp: Dispatcher):
-    # Регистрация middleware
-    dp.update.outer_middleware(DependencyInjectionMiddleware())
+    # Регистрация middleware (общие ресурсы создаются один раз на процесс)
+    dp.update.outer_middleware(
+        DependencyInjectionMiddleware(
+            cache_service=cache_service,
+            api_client=get_api_client()
+        )
+    )
 
     # Регистрация хендлеров (порядок важен)
     for router in [
@@ -40,6 +52,37 @@ def setup_auth(dp: Dispatcher):
         dp.include_router(router)
 
 
+def setup_api_transport():
+    """in-process режим: бот вызывает ручки API напрямую, без HTTP"""
+    if config.API_TRANSPORT != "inprocess":
+        return
+
+    api_client = InProcessAPIClient()
+    set_api_client(api_client)
+    cache_service.api_client = api_client  # промахи кэша тоже идут мимо HTTP
+
+
+async def on_startup(dispatcher: Dispatcher):
+    # инвалидации L1 кэша от API и других инстансов бота
+    dispatcher["invalidation_listener"] = asyncio.create_task(redis_service.listen_invalidations())
+
+
+async def on_shutdown(dispatcher: Dispatcher):
+    """Общие ресурсы закрываются один раз — при остановке бота"""
+    dispatcher["invalidation_listener"].cancel()
+
+    await get_api_client().close()
+    await close_task_service()  # пул arq (создаётся только в in-process режиме)
+    await prompt_cache_stats.close()  # остаток статистики кэша промптов (in-process режим)
+    await redis_client.aclose()
+    await REDIS_POOL.disconnect()
+
+
+def setup_lifecycle(dp: Dispatcher):
+    dp.startup.register(on_startup)
+    dp.shutdown.register(on_shutdown)
+
+
 async def start_polling(dp: Dispatcher):
     await dp.start_polling(bot)
 
@@ -60,6 +103,8 @@ storage = RedisStorage(
 dp = Dispatcher(storage=None)
 
 if __name__ == "__main__":
+    setup_api_transport()
+    setup_lifecycle(dp)
     setup_auth(dp)
     configure_logging()
     logging.basicConfig(
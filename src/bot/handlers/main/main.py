@@ -7,9 +7,11 @@ from src.api.response_schemas.check_in import AssistantResponse
 from src.bot.keyboards.inline.personality import get_about_mbti
 from src.bot.keyboards.inline.survey import get_survey_keyboard
 from src.bot.lexicon.message_text import MessageText
+from src.bot.utils.streaming_editor import StreamingMessageEditor
 from src.core.schemas.user_schemas import UserSchema
 from src.core.services.api_client.personalityGPT_api import PersonalityGPT_APIClient
 from src.core.services.cache_services.cache_service import CacheService
+from src.infrastructure.config.config import config
 
 logger = logging.getLogger(__name__)
 
@@ -41,14 +43,26 @@ async def main(
 
     user_text: str = message.text or voice_text
 
+    check_in_request = CheckInRequest(
+        message=user_text,
+        talk_mode_input=user.talk_mode
+    )
+
     # [ выбор режима ]
-    response: AssistantResponse = await api_client.check_in(
-        access_token,
-        request=CheckInRequest(
-            message=user_text,
-            talk_mode_input=user.talk_mode
+    editor: StreamingMessageEditor | None = None
+    if config.LLM_STREAMING:
+        editor = StreamingMessageEditor(message_obj)
+        response: AssistantResponse = await stream_check_in(
+            api_client,
+            access_token,
+            check_in_request,
+            editor
+        )
+    else:
+        response: AssistantResponse = await api_client.check_in(
+            access_token,
+            request=check_in_request
         )
-    )
 
     if response.question_pack:
         await research_survey(
@@ -68,12 +82,33 @@ async def main(
         access_token,
         str(message.from_user.id)
     )
-    await message_obj.edit_text(
-        text,
-        reply_markup=get_about_mbti(
-            passed_first_typification=user.passed_personality_core
-        ) if response.about_mbti else None  # about mbti (можно потом дополнить другими клавами)
-    )
+    reply_markup = get_about_mbti(
+        passed_first_typification=user.passed_personality_core
+    ) if response.about_mbti else None  # about mbti (можно потом дополнить другими клавами)
+
+    if editor:
+        await editor.finish(text, reply_markup=reply_markup)
+    else:
+        await message_obj.edit_text(text, reply_markup=reply_markup)
+
+
+async def stream_check_in(
+        api_client: PersonalityGPT_APIClient,
+        access_token: str,
+        request: CheckInRequest,
+        editor: StreamingMessageEditor
+) -> AssistantResponse:
+    """check_in со стримингом: куски ответа сразу показываются в сообщении"""
+    response: AssistantResponse | None = None
+    async for item in api_client.check_in_stream(access_token, request=request):
+        if isinstance(item, str):
+            await editor.push(item)
+        else:
+            response = item
+
+    if response is None:
+        raise RuntimeError("check_in stream завершился без результата")
+    return response
 
 
 async def research_survey(
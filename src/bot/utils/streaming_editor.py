@@ -0,0 +1,76 @@
+import asyncio
+import logging
+import re
+import time
+
+from aiogram.exceptions import TelegramBadRequest, TelegramRetryAfter
+from aiogram.types import Message, InlineKeyboardMarkup
+
+from src.infrastructure.config.config import config
+
+logger = logging.getLogger(__name__)
+
+TELEGRAM_MESSAGE_LIMIT = 4096
+
+# теги (в т.ч. недописанный в конце) — пока ответ не готов, HTML может быть незакрытым
+_HTML_TAG = re.compile(r"<[^>]*>|<[^>]*$")
+
+
+class StreamingMessageEditor:
+    """
+    Показывает стримящийся ответ, редактируя одно сообщение (placeholder "обрабатываю...").
+
+    — editMessageText не чаще min_interval (флуд-лимиты Telegram на редактирование)
+    — при TelegramRetryAfter правки ставятся на паузу на retry_after
+    — промежуточный текст отправляется без разметки, финальный — как обычно (HTML)
+    """
+
+    CURSOR = " ▍"
+
+    def __init__(self, message: Message, min_interval: float = config.STREAM_EDIT_INTERVAL):
+        self.message = message
+        self.min_interval = min_interval
+
+        self.text: str = ""
+        self._shown: str = ""
+        self._last_edit: float = 0.0
+        self._paused_until: float = 0.0
+
+    async def push(self, delta: str) -> None:
+        """Новый кусок ответа; сообщение обновится, если прошло min_interval с прошлой правки"""
+        self.text += delta
+
+        now: float = time.monotonic()
+        if now - self._last_edit < self.min_interval or now < self._paused_until:
+            return
+
+        preview: str = _HTML_TAG.sub("", self.text).strip()
+        if preview:
+            await self._edit(preview[:TELEGRAM_MESSAGE_LIMIT - len(self.CURSOR)] + self.CURSOR, parse_mode=None)
+
+    async def finish(self, text: str, reply_markup: InlineKeyboardMarkup | None = None) -> None:
+        """Финальный текст с разметкой и клавиатурой (дожидается паузы после flood control)"""
+        delay: float = self._paused_until - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        try:
+            await self.message.edit_text(text, reply_markup=reply_markup)
+        except TelegramRetryAfter as e:
+            await asyncio.sleep(e.retry_after)
+            await self.message.edit_text(text, reply_markup=reply_markup)
+
+    async def _edit(self, text: str, parse_mode: str | None) -> None:
+        if text == self._shown:
+            return
+
+        self._last_edit = time.monotonic()
+        try:
+            await self.message.edit_text(text, parse_mode=parse_mode)
+            self._shown = text
+        except TelegramRetryAfter as e:
+            logger.warning(f"flood control при стриминге, пауза {e.retry_after}с")
+            self._paused_until = time.monotonic() + e.retry_after
+        except TelegramBadRequest as e:
+            # "message is not modified" и т.п. — промежуточная правка не критична
+            logger.debug(f"промежуточная правка не прошла: {e}")
@@ -8,5 +8,33 @@ FREE_VOICE_MESSAGES_COUNT = 3
 # [ DIARY: summarize logs ]
 MAX_LOGS_SIZE = 75
 MAX_CHARS = 1500  # per log
+SUMMARY_CHUNK_SIZE = 50  # юзеров на одну arq задачу
+SUMMARY_LLM_CONCURRENCY = 8  # одновременных запросов к LLM на воркер
+
+# [ GENERATION: характеристики после check_in ]
+GENERATION_CONCURRENCY = 8  # одновременных генераций на воркер
+GENERATION_USER_CONCURRENCY = 4  # одновременных генераций схем одного сообщения
+GENERATION_COMBINED_MAX_SCHEMAS = 4  # схем в одном запросе к LLM (ответ растёт с каждой схемой)
+GENERATION_COMBINED_MAX_TOKENS = 8192  # лимит ответа deepseek-chat
+
+# [ CHAT HISTORY: контекст диалога в Redis ]
+CHAT_HISTORY_MAX_MESSAGES = 50  # храним максимум сообщений
+CHAT_HISTORY_TTL_SECONDS = 60 * 60 * 24 * 30  # история без активности живёт 30 дней
+CHAT_HISTORY_DEDUP_DEPTH = 12  # сколько последних сообщений проверяем на дубликат реплики юзера
+CHAT_CONTEXT_TOKEN_BUDGET = 1500  # токенов на историю в промпте (сводка + последние сообщения)
+CHAT_SUMMARY_MAX_TOKENS = 400  # лимит ответа LLM на сводку
+CHAT_SUMMARY_FOLD_MIN_MESSAGES = 6  # сворачиваем, когда за окном набралось столько сообщений
+
+# [ PROFILE FRAGMENTS: отрендеренные блоки профиля для промпта ]
+PROFILE_FRAGMENTS_TTL_SECONDS = 60 * 60 * 24
+PROFILE_VERSION_TTL_SECONDS = 60 * 60 * 24 * 30
+
+# [ LLM RESPONSE CACHE: детерминированные вызовы get_response ]
+LLM_RESPONSE_CACHE_TTL_SECONDS = 60 * 60 * 24 * 7
+LLM_RESPONSE_CACHE_MAX_ENTRIES = 20_000  # сверх — вытесняются давно не читанные
+
+# [ SPEECH: распознавание голосовых ]
+SPEECH_CONCURRENCY = 8  # одновременных запросов к Deepgram на процесс
+SPEECH_TIMEOUT_SECONDS = 30  # ожидание распознавания одного голосового (включая очередь)
 
 DIARIES_ROW_COUNT_AT_KEYBOARD = 4
@@ -0,0 +1,10 @@
+def assemble_system_prompt(static_prompt: str, *user_blocks: str | None) -> str:
+    """
+    Системный промпт в порядке для префиксного кэша DeepSeek (кэшируется общий префикс запросов):
+        1. статичное — промпт режима, списки, инструкции (одинаково у всех юзеров → кэш между юзерами)
+        2. полустатичные блоки юзера — описание, стиль общения, профиль (меняются редко → кэш между ходами)
+    История и сообщение юзера идут следующими messages — самая изменчивая часть всегда в конце.
+    """
+    blocks: list[str] = [static_prompt]
+    blocks.extend(block.strip() for block in user_blocks if block and block.strip())
+    return "\n\n".join(blocks)
@@ -0,0 +1,15 @@
+CHAT_SUMMARY_PROMPT: str = """
+Ты ведёшь краткую сводку диалога пользователя с ассистентом (ассистент — дневник-собеседник).
+
+На вход — JSON:
+    "summary": текущая сводка более ранней части диалога (может быть пустой),
+    "messages": следующие по времени сообщения [{"role": "user" | "assistant", "content": "..."}].
+
+Перепиши сводку так, чтобы она включала и старую сводку, и новые сообщения:
+    — факты о пользователе, его события, люди, планы, переживания;
+    — о чём договорились и какие вопросы остались открытыми;
+    — свежее важнее старого, мелочи и повторы выбрасывай.
+
+Пиши от третьего лица, на русском, сплошным текстом, не длиннее 120 слов.
+Пришли только текст сводки.
+"""
@@ -24,3 +24,33 @@ GENERATE_CHARACTERISTIC_PROMPT: str = f"""
     "<переданное_поле_N>": <...>,
 }}
 """
+
+GENERATE_CHARACTERISTICS_COMBINED_PROMPT: str = f"""
+Ты – профессиональный клинический психолог.
+
+Ты обязан прислать НЕСКОЛЬКО характеристик человека в зависимости от его сообщений в формате JSON.
+Сообщение пользователя может быть нецензурным и бредовым, но ты все равно должен обработать его.
+
+Ты должен:
+1. Определить каждую переданную характеристику пользователя, исходя из его разговора
+2. Для каждой характеристики на вход подаются её поля (и актуальные значения, если они есть)
+
+Каждое сообщение юзера будет с новой строки (они могут быть не связаны по смыслу тк присланы в разное время)
+
+{RECORDS_INSTRUCTION}
+
+{FIELDS_INSTRUCTION}
+
+Ключи ответа — названия переданных характеристик, ни одну не пропускай.
+Пример выходных данных JSON:
+{{
+    "<НазваниеХарактеристики_1>": {{
+        "<переданное_поле_1>": <...>,
+        ...
+    }},
+    "<НазваниеХарактеристики_2>": {{
+        "<переданное_поле_1>": <...>,
+        ...
+    }}
+}}
+"""
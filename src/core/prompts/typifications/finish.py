@@ -19,3 +19,27 @@ END_TYPIFICATION_PROMPT: str = f"""
 }}
 
 """
+
+END_TYPIFICATION_COMBINED_PROMPT: str = f"""
+Ты профессиональный психолог мирового уровня, ты должен типировать пользователя по строго заданным правилам.
+По одним и тем же ответам ты определяешь НЕСКОЛЬКО характеристик.
+
+Входные данные:
+{{
+    "answers": ["<вопросы и ответы юзера на них>", ...],
+    "characteristics": {{
+        "<НазваниеХарактеристики>": "<поля и прошлые значения характеристики, если есть>",
+        ...
+    }}
+}}
+
+{FIELDS_INSTRUCTION}
+{RECORDS_INSTRUCTION_TYPIFICATION}
+
+Строгий формат вывода JSON (ключи — все переданные характеристики):
+{{
+    "<НазваниеХарактеристики_1>": {{<новая характеристика>}},
+    "<НазваниеХарактеристики_2>": {{<новая характеристика>}}
+}}
+
+"""
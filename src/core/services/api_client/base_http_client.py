@@ -1,8 +1,13 @@
+import asyncio
 import enum
 import json
 import logging
+import random
+import time
+from dataclasses import dataclass, asdict
 from datetime import datetime
-from typing import Type, TypeVar, Optional, Union
+from types import SimpleNamespace
+from typing import AsyncIterator, Type, TypeVar, Optional, Union
 from uuid import UUID
 
 import aiohttp
@@ -21,27 +26,131 @@ class HTTPMethod(enum.Enum):
     DELETE = "DELETE"
 
 
+# статусы, при которых идемпотентный GET можно повторить
+RETRY_STATUSES: frozenset[int] = frozenset({502, 503, 504})
+
+
+@dataclass
+class PoolMetrics:
+    """Метрики пула соединений для подбора лимитов под нагрузкой"""
+    requests: int = 0
+    retries: int = 0
+    connections_created: int = 0
+    connections_reused: int = 0
+    queued: int = 0  # сколько раз запрос ждал свободное соединение
+    wait_time_total: float = 0.0
+    wait_time_max: float = 0.0
+
+
 class BaseHttpClient:
-    def __init__(self, base_url: str):
+    def __init__(
+            self,
+            base_url: str,
+            limit: int = config.HTTP_POOL_LIMIT,
+            limit_per_host: int = config.HTTP_POOL_LIMIT_PER_HOST,
+            keepalive_timeout: float = config.HTTP_KEEPALIVE_TIMEOUT,
+            dns_cache_ttl: int = config.HTTP_DNS_CACHE_TTL,
+            force_close: bool = config.HTTP_FORCE_CLOSE,
+            get_retries: int = config.HTTP_GET_RETRIES,
+            retry_backoff: float = config.HTTP_RETRY_BACKOFF,
+    ):
         self.base_url = base_url
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.dns_cache_ttl = dns_cache_ttl
+        self.force_close = force_close
+        self.get_retries = get_retries
+        self.retry_backoff = retry_backoff
+
         self._session: Optional[aiohttp.ClientSession] = None
+        self._connector: Optional[TCPConnector] = None
+        self._metrics = PoolMetrics()
 
     async def _ensure_session(self):
-        if self._session is None:
-            connector = TCPConnector(
-                force_close=True,           # ← главное изменение
-                enable_cleanup_closed=True, # помогает при частых обрывах
-                limit=100                   # можно уменьшить при необходимости
-            )
+        if self._session is None or self._session.closed:
+            if self.force_close:
+                # старый режим: новое TCP соединение на каждый запрос
+                self._connector = TCPConnector(
+                    force_close=True,
+                    enable_cleanup_closed=True,
+                    limit=self.limit
+                )
+            else:
+                self._connector = TCPConnector(
+                    limit=self.limit,
+                    limit_per_host=self.limit_per_host,
+                    keepalive_timeout=self.keepalive_timeout,  # idle соединения закрываются раньше, чем это сделает сервер
+                    ttl_dns_cache=self.dns_cache_ttl,
+                    use_dns_cache=True,
+                    enable_cleanup_closed=True,
+                )
             self._session = aiohttp.ClientSession(
                 base_url=self.base_url,
-                connector=connector,
+                connector=self._connector,
+                trace_configs=[self._build_trace_config()],
             )
 
     async def close(self):
         if self._session:
             await self._session.close()
             self._session = None
+            self._connector = None
+
+    # [ METRICS ]
+    def _build_trace_config(self) -> aiohttp.TraceConfig:
+        metrics = self._metrics
+
+        async def on_queued_start(session, ctx: SimpleNamespace, params):
+            ctx.queued_at = time.monotonic()
+            metrics.queued += 1
+
+        async def on_queued_end(session, ctx: SimpleNamespace, params):
+            waited = time.monotonic() - ctx.queued_at
+            metrics.wait_time_total += waited
+            metrics.wait_time_max = max(metrics.wait_time_max, waited)
+
+        async def on_create_end(session, ctx, params):
+            metrics.connections_created += 1
+
+        async def on_reuse(session, ctx, params):
+            metrics.connections_reused += 1
+
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_connection_queued_start.append(on_queued_start)
+        trace_config.on_connection_queued_end.append(on_queued_end)
+        trace_config.on_connection_create_end.append(on_create_end)
+        trace_config.on_connection_reuseconn.append(on_reuse)
+        return trace_config
+
+    def pool_metrics(self) -> dict:
+        """
+        Снимок состояния пула:
+            open/in_use/idle — соединения сейчас,
+            остальное — счётчики с момента старта процесса
+        """
+        in_use = idle = 0
+        if self._connector is not None and not self._connector.closed:
+            # у aiohttp нет публичного API для размера пула
+            in_use = len(getattr(self._connector, "_acquired", ()))
+            idle = sum(len(conns) for conns in getattr(self._connector, "_conns", {}).values())
+
+        metrics = asdict(self._metrics)
+        metrics["wait_time_avg"] = (
+            self._metrics.wait_time_total / self._metrics.queued if self._metrics.queued else 0.0
+        )
+        return {
+            "limit": self.limit,
+            "limit_per_host": self.limit_per_host,
+            "open": in_use + idle,
+            "in_use": in_use,
+            "idle": idle,
+            **metrics,
+        }
+
+    def _retry_delay(self, attempt: int) -> float:
+        # экспоненциальный backoff с джиттером
+        return self.retry_backoff * (2 ** attempt) * (0.5 + random.random() / 2)
 
     async def _request(
             self,
@@ -55,6 +164,92 @@ class BaseHttpClient:
     ) -> Union[T, dict, list, None]:
         await self._ensure_session()
 
+        headers: dict = self._build_headers(access_token, api_key)
+        json_data: str | None = self._serialize_body(request_body)
+
+        # повторяем только идемпотентные GET: запрос мог не дойти до сервера (протухшее keep-alive соединение)
+        attempts: int = 1 + (self.get_retries if method is HTTPMethod.GET else 0)
+        self._metrics.requests += 1
+
+        for attempt in range(attempts):
+            is_last: bool = attempt == attempts - 1
+            try:
+                async with self._session.request(
+                        method=method.value,
+                        url=endpoint,
+                        headers=headers,
+                        data=json_data,
+                        **kwargs
+                ) as response:
+                    retry_status: bool = response.status in RETRY_STATUSES and not is_last
+                    if not retry_status:
+                        response.raise_for_status()
+
+                        if response.status == 204:  # No Content
+                            return None
+
+                        data = await response.json()
+
+                        if response_model:
+                            return response_model.model_validate(data)
+                        return data
+
+                # соединение уже вернулось в пул, ждём вне контекста ответа
+                logging.warning(f"{method.value} {endpoint}: {response.status}, повтор #{attempt + 1}")
+                self._metrics.retries += 1
+                await asyncio.sleep(self._retry_delay(attempt))
+
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                if is_last:
+                    logging.error(f"Request failed: {e}")
+                    raise
+                logging.warning(f"{method.value} {endpoint}: {e!r}, повтор #{attempt + 1}")
+                self._metrics.retries += 1
+                await asyncio.sleep(self._retry_delay(attempt))
+            except aiohttp.ClientError as e:
+                logging.error(f"Request failed: {e}")
+                raise
+            except Exception as e:
+                logging.error(f"Unexpected error: {e}")
+                raise
+
+    async def _stream_events(
+            self,
+            endpoint: str,
+            access_token: Optional[str] = None,
+            request_body: Optional[Union[dict, BaseModel]] = None,
+    ) -> AsyncIterator[tuple[str, str]]:
+        """POST с ответом text/event-stream (SSE): отдаёт (event, data) по мере прихода"""
+        await self._ensure_session()
+        self._metrics.requests += 1
+
+        headers: dict = self._build_headers(access_token)
+        headers["Accept"] = "text/event-stream"
+
+        async with self._session.post(
+                endpoint,
+                headers=headers,
+                data=self._serialize_body(request_body),
+                timeout=aiohttp.ClientTimeout(total=None, sock_read=120)  # стрим длится дольше обычного запроса
+        ) as response:
+            response.raise_for_status()
+
+            event: str = "message"
+            data_lines: list[str] = []
+            async for raw_line in response.content:
+                line: str = raw_line.decode("utf-8").rstrip("\r\n")
+
+                if not line:  # пустая строка — конец события
+                    if data_lines:
+                        yield event, "\n".join(data_lines)
+                    event, data_lines = "message", []
+                elif line.startswith("event:"):
+                    event = line[len("event:"):].strip()
+                elif line.startswith("data:"):
+                    data_lines.append(line[len("data:"):].lstrip())
+
+    @staticmethod
+    def _build_headers(access_token: Optional[str] = None, api_key: str | None = None) -> dict:
         headers = {}
         if access_token:
             headers["Authorization"] = f"Bearer {access_token}"
@@ -63,41 +258,17 @@ class BaseHttpClient:
             headers["X-API-Key"] = config.API_KEY
 
         headers["Content-Type"] = "application/json"
+        return headers
 
-        json_data = None
-        if request_body is not None:
-            if isinstance(request_body, BaseModel):
-                # Преобразуем Pydantic модель в словарь и сериализуем
-                json_data = json.dumps(request_body.model_dump(), default=self._json_serializer)
-            else:
-                # Сериализуем обычный словарь
-                json_data = json.dumps(request_body, default=self._json_serializer)
-
-        try:
-            async with self._session.request(
-                    method=method.value,
-                    url=endpoint,
-                    headers=headers,
-                    data=json_data,
-                    **kwargs
-            ) as response:
-                response.raise_for_status()
-
-                if response.status == 204:  # No Content
-                    return None
-
-                data = await response.json()
-
-                if response_model:
-                    return response_model.model_validate(data)
-                return data
-
-        except aiohttp.ClientError as e:
-            logging.error(f"Request failed: {e}")
-            raise
-        except Exception as e:
-            logging.error(f"Unexpected error: {e}")
-            raise
+    def _serialize_body(self, request_body: Optional[Union[dict, BaseModel]]) -> str | None:
+        if request_body is None:
+            return None
+
+        if isinstance(request_body, BaseModel):
+            # Преобразуем Pydantic модель в словарь и сериализуем
+            return json.dumps(request_body.model_dump(), default=self._json_serializer)
+        # Сериализуем обычный словарь
+        return json.dumps(request_body, default=self._json_serializer)
 
     @staticmethod
     def _json_serializer(obj):
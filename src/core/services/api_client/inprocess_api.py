@@ -0,0 +1,270 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import AsyncIterator
+
+from fastapi import BackgroundTasks
+
+from request_schemas.typification import TypificationRequest, TypificationGetQuestion, DeleteTypificationRequest, \
+    TypificationGetStatisticsRequest
+from src.api.request_schemas.check_in import CheckInRequest
+from src.api.request_schemas.survey import ResearchSurveyFinishRequest
+from src.api.request_schemas.user import ChangeGenderRequest, ChangeTalkModeRequest
+from src.api.response_schemas.characteristic import GetAllCharacteristicResponse
+from src.api.response_schemas.check_in import AssistantResponse
+from src.api.routers.main_router import check_in as check_in_route, \
+    research_survey_finish as research_survey_finish_route, run_check_in
+from src.api.routers.typification import get_stats_on_middle_of_test as get_stats_on_middle_of_test_route, \
+    get_question as get_question_route, end_typification as end_typification_route, \
+    delete_progress_from_request as delete_progress_route
+from src.api.routers.user_router import increase_used_voices as increase_used_voices_route, \
+    get_user_diary_list as get_user_diary_list_route, change_gender as change_gender_route, \
+    change_talking_mode as change_talking_mode_route
+from src.api.utils.auth import generate_jwt, decode_jwt_payload, resolve_auth_user
+from src.core.enums.user import GENDER, TALKING_MODES
+from src.core.schemas.diary_schema import DiarySchema
+from src.core.schemas.user_schemas import UserSchema, UserTelegramDataSchema
+from src.core.services.api_client.personalityGPT_api import PersonalityGPT_APIClient
+from src.core.services.characteristic_service import CharacteristicService
+from src.core.services.dependencies.assistant_service_dep import get_assistant_service
+from src.core.services.dependencies.cache_service_dep import get_cache_service
+from src.core.services.dependencies.redis_service_dep import get_redis_service
+from src.core.services.dependencies.task_service_dep import get_task_service
+from src.core.services.dependencies.telegram_service_dep import get_telegram_service
+from src.core.services.service_container import get_session
+from src.core.services.user_service import UserService
+from src.core.utils.streaming import OnDelta, iterate_deltas
+from src.infrastructure.database.repository.characteristic_repo import CharacteristicRepository
+from src.infrastructure.database.repository.user_repo import UserRepository
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _Scope:
+    """Зависимости одного вызова — то, что в HTTP режиме собирает FastAPI через Depends"""
+    user_service: UserService
+    characteristic_service: CharacteristicService
+
+
+class InProcessAPIClient(PersonalityGPT_APIClient):
+    """
+    In-process транспорт для деплоя бота и API на одном хосте.
+
+    Тот же интерфейс, что и у PersonalityGPT_APIClient, но вместо HTTP вызывает ручки роутеров напрямую:
+        — нет JSON сериализации запроса/ответа и HTTP хопа
+        — юзер берётся из JWT + кэша профиля, без запроса в БД на каждую ручку (get_auth_user)
+    Фоновые задачи ручек (BackgroundTasks) запускаются в event loop бота, генерация характеристик — задачи arq.
+    """
+
+    def __init__(self):
+        super().__init__(base_url="")
+        self._background: set[asyncio.Task] = set()
+
+    async def close(self):
+        if self._background:
+            await asyncio.gather(*self._background, return_exceptions=True)
+
+    # [ SCOPE ]
+    @asynccontextmanager
+    async def _scope(self) -> AsyncIterator[_Scope]:
+        async with get_session() as session:
+            yield _Scope(
+                user_service=UserService(repo=UserRepository(session)),
+                characteristic_service=CharacteristicService(
+                    repo=CharacteristicRepository(session, await get_cache_service()),
+                    assistant_service=await get_assistant_service()
+                )
+            )
+
+    async def _get_user(self, access_token: str) -> UserSchema:
+        """
+        Аналог get_auth_user:
+            JWT проверяется локально, профиль берётся из кэша, в БД идём только при промахе
+        """
+        payload: dict = await decode_jwt_payload(access_token)
+
+        async def load_user(user_id) -> UserSchema | None:
+            async with get_session() as session:
+                return await UserRepository(session).get_user(user_id)
+
+        user: UserSchema | None = await resolve_auth_user(payload, get_redis_service(), load_user)
+        if user is None:
+            raise ValueError(f"Юзер из токена не найден: {payload['sub']}")
+        return user
+
+    def _run_background(self, background_tasks: BackgroundTasks) -> None:
+        """Фоновые задачи ручки — как после отправки HTTP ответа, не блокируя хендлер"""
+        if not background_tasks.tasks:
+            return
+
+        task = asyncio.create_task(background_tasks())
+        self._background.add(task)
+        task.add_done_callback(self._on_background_done)
+
+    def _on_background_done(self, task: asyncio.Task) -> None:
+        self._background.discard(task)
+        if not task.cancelled() and task.exception():
+            logger.error("Ошибка фоновой задачи in-process ручки", exc_info=task.exception())
+
+    # [ AUTH ]
+    async def telegram_auth(self, telegram_user_data: UserTelegramDataSchema) -> str:
+        async with get_session() as session:
+            user: UserSchema = await UserRepository(session).get_or_create_from_telegram(telegram_user_data)
+        await get_redis_service().invalidate_user_profile(user.telegram_id)  # могли смениться username/имя
+        return await generate_jwt(user.id, user.telegram_id)
+
+    # [ USER ]
+    async def get_current_user(self, access_token: str) -> UserSchema:
+        """Получение текущего пользователя (промах кэша профиля — всегда из БД)"""
+        payload: dict = await decode_jwt_payload(access_token)
+        async with get_session() as session:
+            return await UserRepository(session).get_user(payload["sub"])
+
+    async def increase_used_voices(self, access_token: str) -> None:
+        """Отнимает 1 голосовой запрос + invalidate cache"""
+        user: UserSchema = await self._get_user(access_token)
+        async with self._scope() as scope:
+            await increase_used_voices_route(
+                user=user,
+                user_service=scope.user_service,
+                redis_service=get_redis_service()
+            )
+
+    # [ DIARY ]
+    async def get_diary(self, access_token: str) -> list[DiarySchema]:
+        user: UserSchema = await self._get_user(access_token)
+        async with self._scope() as scope:
+            return await get_user_diary_list_route(
+                user=user,
+                user_service=scope.user_service
+            )
+
+    # [ CHARACTERISTIC ]
+    async def check_in(self, access_token: str, request: CheckInRequest) -> AssistantResponse:
+        """check_in"""
+        user: UserSchema = await self._get_user(access_token)
+
+        async with self._scope() as scope:
+            return await check_in_route(
+                user=user,
+                characteristic_service=scope.characteristic_service,
+                request=request,
+                assistant_service=scope.characteristic_service.assistant_service,
+                cache_service=await get_cache_service(),
+                user_service=scope.user_service,
+                task_service=await get_task_service(),
+                authorization=f"Bearer {access_token}"
+            )
+
+    async def check_in_stream(self, access_token: str, request: CheckInRequest) -> AsyncIterator[str | AssistantResponse]:
+        """check_in со стримингом: куски user_answer, последним — AssistantResponse"""
+        user: UserSchema = await self._get_user(access_token)
+
+        async with self._scope() as scope:
+            async def run(on_delta: OnDelta) -> AssistantResponse:
+                return await run_check_in(
+                    user=user,
+                    characteristic_service=scope.characteristic_service,
+                    request=request,
+                    assistant_service=scope.characteristic_service.assistant_service,
+                    cache_service=await get_cache_service(),
+                    user_service=scope.user_service,
+                    task_service=await get_task_service(),
+                    authorization=f"Bearer {access_token}",
+                    on_delta=on_delta
+                )
+
+            async for item in iterate_deltas(run):
+                yield item
+
+    async def research_survey_finish(self, access_token: str, request: ResearchSurveyFinishRequest) -> AssistantResponse:
+        """режим исследования: survey — финал"""
+        user: UserSchema = await self._get_user(access_token)
+        background_tasks = BackgroundTasks()
+
+        async with self._scope() as scope:
+            response: AssistantResponse = await research_survey_finish_route(
+                request=request,
+                user=user,
+                assistant_service=scope.characteristic_service.assistant_service,
+                characteristic_service=scope.characteristic_service,
+                telegram_service=await get_telegram_service(),
+                redis_service=get_redis_service(),
+                background_tasks=background_tasks
+            )
+
+        self._run_background(background_tasks)
+        return response
+
+    async def get_characteristics(self, access_token: str) -> GetAllCharacteristicResponse:
+        """получить все характеристики (в том же JSON виде, что отдаёт HTTP ручка)"""
+        user: UserSchema = await self._get_user(access_token)
+        async with self._scope() as scope:
+            characteristics = await scope.characteristic_service.repo.get_all_characteristics(user.id)
+
+        return GetAllCharacteristicResponse(response=characteristics).model_dump(mode="json")
+
+    # [ SETTINGS ]
+    async def change_gender(self, gender: GENDER, access_token: str) -> None:
+        """поменять гендер"""
+        user: UserSchema = await self._get_user(access_token)
+        async with self._scope() as scope:
+            await change_gender_route(
+                user=user,
+                request=ChangeGenderRequest(gender=gender),
+                user_service=scope.user_service,
+                redis_service=get_redis_service()
+            )
+
+    async def change_talk_mode(self, access_token: str, talk_mode: TALKING_MODES) -> None:
+        """меняет режим общения"""
+        user: UserSchema = await self._get_user(access_token)
+        async with self._scope() as scope:
+            await change_talking_mode_route(
+                user=user,
+                request=ChangeTalkModeRequest(talk_mode=talk_mode),
+                user_service=scope.user_service,
+                redis_service=get_redis_service()
+            )
+
+    # [ TYPIFICATION ]
+    async def get_additional_text_on_mid_test(self, access_token: str, request: TypificationGetStatisticsRequest) -> str:
+        """получить доп текст на середине теста"""
+        return await get_stats_on_middle_of_test_route(
+            request=request,
+            assistant_service=await get_assistant_service(),
+            user=await self._get_user(access_token)
+        )
+
+    async def post_typification_results(self, access_token: str, request: TypificationRequest) -> None:
+        """закончить типирование"""
+        user: UserSchema = await self._get_user(access_token)
+        async with self._scope() as scope:
+            await end_typification_route(
+                request=request,
+                characteristic_service=scope.characteristic_service,
+                user_service=scope.user_service,
+                user=user,
+                redis_service=get_redis_service(),
+                authorization=f"Bearer {access_token}"
+            )
+
+    async def get_next_question(self, access_token: str, request: TypificationGetQuestion) -> str:
+        """склеить прошлый вопрос + ответ с новым вопросом"""
+        return await get_question_route(
+            request=request,
+            assistant_service=await get_assistant_service()
+        )
+
+    async def delete_typification(self, access_token: str, request: DeleteTypificationRequest) -> str:
+        """удалить прогресс типирования"""
+        user: UserSchema = await self._get_user(access_token)
+        async with self._scope() as scope:
+            return await delete_progress_route(
+                request=request,
+                user=user,
+                user_service=scope.user_service,
+                redis_service=get_redis_service()
+            )
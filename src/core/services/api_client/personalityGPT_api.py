@@ -1,3 +1,6 @@
+import json
+from typing import AsyncIterator
+
 from request_schemas.typification import TypificationRequest, TypificationGetQuestion, DeleteTypificationRequest, \
     TypificationGetStatisticsRequest
 from src.api.request_schemas.check_in import CheckInRequest
@@ -58,6 +61,24 @@ class PersonalityGPT_APIClient(BaseHttpClient):
             access_token=access_token
         )
 
+    async def check_in_stream(self, access_token: str, request: CheckInRequest) -> AsyncIterator[str | AssistantResponse]:
+        """
+        check_in со стримингом:
+        отдаёт куски user_answer по мере генерации, последним — AssistantResponse
+        """
+        async for event, data in self._stream_events(
+                endpoint="/v1/main/check_in/stream",
+                access_token=access_token,
+                request_body=request
+        ):
+            match event:
+                case "delta":
+                    yield json.loads(data)["text"]
+                case "result":
+                    yield AssistantResponse.model_validate_json(data)
+                case "error":
+                    raise RuntimeError(f"check_in stream: {json.loads(data)['detail']}")
+
     async def research_survey_finish(self, access_token: str, request: ResearchSurveyFinishRequest) -> AssistantResponse:
         """режим исследования: survey — финал"""
         return await self._request(
@@ -4,22 +4,30 @@ import time
 from typing import Type, Any
 from uuid import UUID
 
-import aiohttp
-from fastapi import HTTPException
 from openai import AsyncOpenAI, NOT_GIVEN, NotGiven
 from pydantic import ValidationError
-from starlette import status
 
 from src.api.response_schemas.check_in import CheckInResponse, AssistantResponse
 from src.api.response_schemas.survey import ResearchSurveyFinishResponse
+from src.core.consts import GENERATION_COMBINED_MAX_TOKENS, CHAT_CONTEXT_TOKEN_BUDGET, CHAT_SUMMARY_MAX_TOKENS, \
+    LLM_RESPONSE_CACHE_TTL_SECONDS
+from src.core.prompts.assembly import assemble_system_prompt
 from src.core.prompts.check_in import CHECK_IN_PROMPT
+from src.core.prompts.funcs.chat_summary import CHAT_SUMMARY_PROMPT
 from src.core.prompts.funcs.diary import GET_SUMMARY_LOG_FROM_DAILY_LOGS
 from src.core.prompts.funcs.extract_name import EXTRACT_NAME_PROMPT
 from src.core.prompts.funcs.telegram import TELEGRAM_CHARACTERISTIC_DIFF
-from src.core.prompts.generation.generation import GENERATE_CHARACTERISTIC_PROMPT
+from src.core.prompts.generation.generation import GENERATE_CHARACTERISTIC_PROMPT, \
+    GENERATE_CHARACTERISTICS_COMBINED_PROMPT
 from src.core.prompts.main.psycho import PSYCHO_PROMPT
 from src.core.schemas.assistant_response import SummaryResponseSchema
+from src.core.services.balance_service import BalanceService
+from src.core.services.cache_services.llm_response_cache import LLMResponseCache
 from src.core.services.cache_services.redis_service import RedisService
+from src.core.services.chat_context_service import ChatContextService
+from src.core.services.prompt_cache_stats import PromptCacheStats
+from src.core.utils.streaming import JsonFieldStream, OnDelta
+from src.core.utils.tokens import token_estimator
 from src.infrastructure.config.config import config
 from src.infrastructure.database.models.base import S
 
@@ -112,43 +120,22 @@ def truncate_to_token_limit(text: str) -> str:
 
 
 class AssistantService:
-    def __init__(self):
-        self.client = AsyncOpenAI(api_key=config.DEEPSEEK_API_KEY, base_url="https://api.deepseek.com")
-        self._session: aiohttp.ClientSession | None = None
-
-    @staticmethod
-    async def check_balance():
-        """Асинхронная проверка баланса"""
-        try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(
-                        "https://api.deepseek.com/user/balance",
-                        headers={
-                            'Accept': 'application/json',
-                            'Authorization': f'Bearer {config.DEEPSEEK_API_KEY}'
-                        }
-                ) as response:
-                    balance_data = await response.json()
-
-                    usd_balance_info = next(
-                        (item for item in balance_data["balance_infos"] if item["currency"] == "USD"),
-                        None
-                    )
-                    balance_now: float = float(usd_balance_info["total_balance"]) if usd_balance_info else 0.0
+    MODEL = "deepseek-chat"
 
-                    if balance_now > config.MINIMUM_USD_ON_BALANCE:
-                        logger.info(f"Выполняется запрос, на балансе: {balance_now}")
-                        return
-
-                    logger.error(f"На балансе недостаточно денег: {balance_now} < {config.MINIMUM_USD_ON_BALANCE}")
-                    raise HTTPException(
-                        status_code=status.HTTP_402_PAYMENT_REQUIRED,
-                        detail="На балансе DeepseekAPI недостаточно денег!"
-                    )
+    def __init__(
+            self,
+            balance_service: BalanceService,
+            prompt_cache_stats: PromptCacheStats,
+            response_cache: LLMResponseCache
+    ):
+        self.client = AsyncOpenAI(api_key=config.DEEPSEEK_API_KEY, base_url="https://api.deepseek.com")
+        self.balance_service = balance_service
+        self.prompt_cache_stats = prompt_cache_stats
+        self.response_cache = response_cache
 
-        except aiohttp.ClientError as e:
-            logger.error(f"Ошибка при проверке баланса: {e}")
-            return
+    async def check_balance(self):
+        """Проверка баланса по кэшу (без запроса к DeepseekAPI на каждый вызов)"""
+        await self.balance_service.check_balance()
 
     async def get_response(
             self,
@@ -156,45 +143,97 @@ class AssistantService:
             prompt: str,
             pydantic_model: Type[S] | None = None,
             temperature: float = 0.3,
-            max_tokens: int | NotGiven = NOT_GIVEN
-    ) -> S | str:
+            max_tokens: int | NotGiven = NOT_GIVEN,
+            json_response: bool = False,
+            prompt_template: str = "default",
+            cache_ttl: int | None = None
+    ) -> S | str | dict:
         """
         Одноразовый запрос к модели без сохранения контекста.
         Используется для случаев, где история не нужна (например, разовые генерации характеристик).
+
+        json_response — вернуть JSON ответа как dict (без валидации pydantic моделью)
+        prompt_template — имя шаблона промпта для статистики префиксного кэша
+        cache_ttl — opt-in кэш ответа (для вызовов, где ответ — функция входа): повторный вход не идёт в LLM
         """
         try:
-            await self.check_balance()
-
-            response = await self.client.chat.completions.create(
-                model="deepseek-chat",
-                messages=[
-                    {"role": "system", "content": prompt},
-                    {"role": "user", "content": input_query},
-                ],
-                response_format={"type": "json_object"} if pydantic_model else NOT_GIVEN,
-                temperature=temperature,
-                max_tokens=max_tokens,
-            )
-
-            logger.info("статистика по токенам:\n")
-            logger.info(response.usage)
-
-            content = response.choices[0].message.content.strip()
+            cache_key: str | None = None
+            content: str | None = None
+            if cache_ttl:
+                cache_key = self.response_cache.make_key(
+                    prompt_template=prompt_template,
+                    prompt=prompt,
+                    input_query=input_query,
+                    model=self.MODEL,
+                    temperature=temperature,
+                    response_model=pydantic_model.__name__ if pydantic_model else ("json" if json_response else "text")
+                )
+                content = await self.response_cache.get(cache_key, prompt_template)
+
+            if content is None:
+                await self.check_balance()
+
+                response = await self.client.chat.completions.create(
+                    model=self.MODEL,
+                    messages=[
+                        {"role": "system", "content": prompt},
+                        {"role": "user", "content": input_query},
+                    ],
+                    response_format={"type": "json_object"} if pydantic_model or json_response else NOT_GIVEN,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                )
+
+                logger.info("статистика по токенам:\n")
+                logger.info(response.usage)
+                self.balance_service.register_usage(response.usage)
+                self.prompt_cache_stats.record(prompt_template, response.usage)
+
+                content = response.choices[0].message.content.strip()
+            else:
+                cache_key = None  # уже в кэше
 
             try:
                 if pydantic_model:
-                    return pydantic_model.model_validate_json(content)
-                return content
-            except ValidationError as e:
+                    result = pydantic_model.model_validate_json(content)
+                elif json_response:
+                    result = json.loads(content)
+                else:
+                    result = content
+            except (ValidationError, json.JSONDecodeError) as e:
                 logger.error(f"Validation error: {e}")
                 logger.error(f"Input Query: {input_query}")
                 logger.error(f"Raw response: {content}\nModel: {pydantic_model}")
                 raise ValueError(f"Invalid assistant response: {e}")
 
+            # в кэш — только ответ, прошедший валидацию
+            if cache_key:
+                await self.response_cache.set(cache_key, content, cache_ttl)
+            return result
+
         except Exception as ex:
             logger.error(f"Error in get_response: {ex}")
             raise
 
+    @staticmethod
+    async def load_history(
+            user_id: UUID,
+            redis_service: RedisService | None,
+            token_budget: int = CHAT_CONTEXT_TOKEN_BUDGET
+    ) -> list[dict]:
+        """История диалога для контекста в пределах бюджета токенов (пустая, если Redis недоступен)"""
+        if not redis_service:
+            return []
+
+        try:
+            return await ChatContextService(redis_service).build_history(
+                user_id=user_id,
+                token_budget=token_budget
+            )
+        except Exception as e:
+            logger.warning(f"Не удалось загрузить историю для {user_id}: {e}")
+            return []
+
     async def get_chat_response(
             self,
             user_id: UUID,
@@ -204,27 +243,33 @@ class AssistantService:
             pydantic_model: Type[S] | None = None,
             temperature: float = 0.6,
             max_tokens: int | NotGiven = NOT_GIVEN,
-            history_limit: int = 12,
+            history_token_budget: int = CHAT_CONTEXT_TOKEN_BUDGET,
+            history: list[dict] | None = None,
+            on_delta: OnDelta | None = None,
+            stream_field: str = "user_answer",
+            prompt_template: str = "chat",
     ) -> S | str:
         """
         Запрос с поддержкой контекста (истории диалога).
 
         Если redis_service и user_id переданы — загружает историю, добавляет новое сообщение
         и сохраняет ответ в историю после успешного ответа.
+
+        :param history: заранее загруженная история (load_history) — тогда Redis не читается повторно
+        :param on_delta: opt-in стриминг — получает текст ответа по мере генерации
+            (для JSON ответа — только значение поля stream_field)
+        :param prompt_template: имя шаблона промпта для статистики префиксного кэша
         """
         time_start = time.time()
         try:
             await self.check_balance()
 
-            history = []
-            if redis_service:
-                try:
-                    history = await redis_service.get_history(
-                        user_id=user_id,
-                        max_messages=history_limit  # с запасом
-                    )
-                except Exception as e:
-                    logger.warning(f"Не удалось загрузить историю для {user_id}: {e}")
+            if history is None:
+                history = await self.load_history(
+                    user_id=user_id,
+                    redis_service=redis_service,
+                    token_budget=history_token_budget
+                )
 
             messages = [
                 {"role": "system", "content": prompt},
@@ -232,34 +277,46 @@ class AssistantService:
                 {"role": "user", "content": input_query},
             ]
 
-            response = await self.client.chat.completions.create(
-                model="deepseek-chat",
-                messages=messages,
-                response_format={"type": "json_object"} if pydantic_model else NOT_GIVEN,
-                temperature=temperature,
-                max_tokens=max_tokens,
-            )
+            if on_delta is None:
+                response = await self.client.chat.completions.create(
+                    model=self.MODEL,
+                    messages=messages,
+                    response_format={"type": "json_object"} if pydantic_model else NOT_GIVEN,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                )
+                content = response.choices[0].message.content.strip()
+                usage = response.usage
+            else:
+                content, usage = await self._stream_completion(
+                    messages=messages,
+                    json_response=pydantic_model is not None,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                    on_delta=on_delta,
+                    stream_field=stream_field
+                )
 
             logger.info(f"Время ответа: {(time.time() - time_start)}")
 
-            content = response.choices[0].message.content.strip()
             logger.info("статистика по токенам (чат):\n")
-            logger.info(response.usage)
+            logger.info(usage)
+            self.balance_service.register_usage(usage)
+            self.prompt_cache_stats.record(prompt_template, usage)
+            if usage:
+                token_estimator.observe(token_estimator.estimate_messages(messages), usage.prompt_tokens)
 
             # [ cache ]
             assistant_content = content.strip()
             input_query = clean_message_for_history(message=input_query)
             assistant_message = clean_message_for_history(message=assistant_content)
             try:
-                if input_query not in (message['content'] for message in history):  # anti-duplicates
-                    if input_query and assistant_message:
-                        await redis_service.add_message(user_id, "user", input_query)
-                        await redis_service.add_message(user_id, "assistant", assistant_message)
-                    else:
-                        logger.error("ошибка парсинга ответа для контекста")
-                        raise
+                if input_query and assistant_message:
+                    # anti-duplicates — внутри скрипта, атомарно с записью
+                    if not await redis_service.append_turn(user_id, input_query, assistant_message):
+                        logger.info(f"дубликат лога пропущен: {input_query}")
                 else:
-                    logger.info(f"дубликат лога пропущен: {input_query}")
+                    logger.error("ошибка парсинга ответа для контекста")
             except Exception as e:
                 logger.warning(f"Не удалось сохранить историю для {user_id}: {e}")
 
@@ -268,11 +325,11 @@ class AssistantService:
                 if pydantic_model:
                     return pydantic_model.model_validate_json(content)
                 return content
-            except ValidationError as e:
+            except (ValidationError, json.JSONDecodeError) as e:
                 logger.error(f"Validation error in chat: {e}")
                 logger.error(f"User message: {input_query}")
                 logger.error(f"Raw response: {content}")
-                if prompt == PSYCHO_PROMPT:
+                if prompt.startswith(PSYCHO_PROMPT):
                     # noinspection PyArgumentList
                     return AssistantResponse(
                         user_answer="шиза дневник не понимает тебя ;( \nпопробуй написать что-то другое"
@@ -283,6 +340,50 @@ class AssistantService:
             logger.error(f"Error in get_chat_response: {ex}")
             raise
 
+    async def _stream_completion(
+            self,
+            messages: list[dict],
+            json_response: bool,
+            temperature: float,
+            max_tokens: int | NotGiven,
+            on_delta: OnDelta,
+            stream_field: str
+    ) -> tuple[str, Any]:
+        """
+        Completion со stream=True.
+        Куски ответа отдаются в on_delta сразу по приходу, возвращает (полный content, usage)
+        """
+        stream = await self.client.chat.completions.create(
+            model=self.MODEL,
+            messages=messages,
+            response_format={"type": "json_object"} if json_response else NOT_GIVEN,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stream=True,
+            stream_options={"include_usage": True},
+        )
+
+        field_stream: JsonFieldStream | None = JsonFieldStream(stream_field) if json_response else None
+        parts: list[str] = []
+        usage = None
+
+        async for chunk in stream:
+            if chunk.usage:
+                usage = chunk.usage  # приходит последним чанком
+            if not chunk.choices:
+                continue
+
+            delta: str | None = chunk.choices[0].delta.content
+            if not delta:
+                continue
+
+            parts.append(delta)
+            text: str = field_stream.feed(delta) if field_stream else delta
+            if text:
+                await on_delta(text)
+
+        return "".join(parts).strip(), usage
+
     # [ GENERATION ]
     async def generate_characteristic(
             self,
@@ -297,16 +398,54 @@ class AssistantService:
         return await self.get_response(
             old_characteristic,
             prompt=prompt,
-            pydantic_model=pydantic_model
+            pydantic_model=pydantic_model,
+            prompt_template="generation"
+        )
+
+    async def generate_characteristics_combined(
+            self,
+            input_query: str,
+            characteristic_types: list[type[S]],
+            prompt: str = GENERATE_CHARACTERISTICS_COMBINED_PROMPT,
+            prompt_template: str = "generation_combined"
+    ) -> tuple[dict[type[S], S], list[type[S]]]:
+        """
+        Генерация нескольких характеристик одним запросом: ответ — {"<SchemaName>": {...}, ...}
+
+        Каждая часть валидируется своей схемой.
+        Возвращает (валидные характеристики, схемы без валидной части — их генерируют по одной)
+        """
+        raw: dict = await self.get_response(
+            input_query,
+            prompt=prompt,
+            json_response=True,
+            max_tokens=GENERATION_COMBINED_MAX_TOKENS,
+            prompt_template=prompt_template
         )
 
+        generated: dict[type[S], S] = {}
+        invalid: list[type[S]] = []
+        for characteristic_type in characteristic_types:
+            part = raw.get(characteristic_type.__name__) if isinstance(raw, dict) else None
+            try:
+                if not isinstance(part, dict):
+                    raise ValueError("нет части ответа")
+                generated[characteristic_type] = characteristic_type.model_validate(part)
+            except (ValidationError, ValueError) as e:
+                logger.warning(f"Комбинированная генерация: {characteristic_type.__name__} не прошла валидацию: {e}")
+                invalid.append(characteristic_type)
+
+        return generated, invalid
+
     async def generate_telegram_message_characteristic_diff(
             self,
             input_query: str
     ) -> str:
         return await self.get_response(
             input_query,
-            prompt=TELEGRAM_CHARACTERISTIC_DIFF
+            prompt=TELEGRAM_CHARACTERISTIC_DIFF,
+            prompt_template="telegram_diff",
+            cache_ttl=LLM_RESPONSE_CACHE_TTL_SECONDS
         )
 
     # [ CHECK IN ]
@@ -322,7 +461,8 @@ class AssistantService:
         return await self.get_response(
             user_message,
             prompt=prompt,
-            pydantic_model=pydantic_model
+            pydantic_model=pydantic_model,
+            prompt_template="check_in"
         )
 
     async def get_shiza_response(
@@ -332,16 +472,26 @@ class AssistantService:
             prompt: str,
             redis_service: RedisService,
             temperature: float | None = 0.6,
+            user_context: str | None = None,
             user_profile: str | None = None,
-            pydantic_model: type[S] = None
+            pydantic_model: type[S] = None,
+            history: list[dict] | None = None,
+            on_delta: OnDelta | None = None,
+            prompt_template: str = "chat"
     ) -> AssistantResponse | ResearchSurveyFinishResponse:
-        """ШИЗА ответ"""
+        """
+        ШИЗА ответ (on_delta — стриминг user_answer)
+
+        :param prompt: статичный промпт режима — идёт первым (общий префикс кэша для всех юзеров)
+        :param user_context: описание юзера и стиль общения (MBTI, юмор, тёмная триада)
+        :param user_profile: характеристики юзера, нужные для ответа
+        """
         profile_text = ""
         if user_profile:
-            profile_text = "\n\nТекущая характеристика юзера:\n" + user_profile
+            profile_text = "Текущая характеристика юзера:\n" + user_profile
             logger.info(profile_text)
 
-        full_prompt: str = prompt + profile_text
+        full_prompt: str = assemble_system_prompt(prompt, user_context, profile_text)
 
         return await self.get_chat_response(
             input_query=user_message,
@@ -350,7 +500,10 @@ class AssistantService:
             temperature=temperature,
             max_tokens=600,
             user_id=user_id,
-            redis_service=redis_service
+            redis_service=redis_service,
+            history=history,
+            on_delta=on_delta,
+            prompt_template=prompt_template
         )
 
     # [ SUMMARIZE ]
@@ -367,7 +520,21 @@ class AssistantService:
         return await self.get_response(
             input_query=user_logs,
             pydantic_model=pydantic_model,
-            prompt=prompt
+            prompt=prompt,
+            prompt_template="diary_summary"
+        )
+
+    async def summarize_chat_history(self, summary: str | None, messages: list[dict]) -> str:
+        """Сворачивает сообщения в сводку диалога (поверх прошлой сводки)"""
+        input_query: str = json.dumps(
+            {"summary": summary or "", "messages": messages},
+            ensure_ascii=False
+        )
+        return await self.get_response(
+            input_query,
+            prompt=CHAT_SUMMARY_PROMPT,
+            max_tokens=CHAT_SUMMARY_MAX_TOKENS,
+            prompt_template="chat_summary"
         )
 
     # [ FUNCS ]
@@ -375,5 +542,7 @@ class AssistantService:
     async def extract_user_name(self, input_query: str) -> str:
         return await self.get_response(
             input_query,
-            prompt=EXTRACT_NAME_PROMPT
+            prompt=EXTRACT_NAME_PROMPT,
+            prompt_template="extract_name",
+            cache_ttl=LLM_RESPONSE_CACHE_TTL_SECONDS
         )
@@ -0,0 +1,183 @@
+import asyncio
+import json
+import logging
+import time
+
+import aiohttp
+from fastapi import HTTPException
+from redis.asyncio import Redis
+from starlette import status
+
+from src.infrastructure.config.config import config
+
+logger = logging.getLogger(__name__)
+
+
+class BalanceService:
+    """
+    Кэш баланса DeepseekAPI.
+
+    Последний известный баланс хранится в памяти процесса и в Redis (общий для всех воркеров API).
+    Обновляется в фоне: когда значение устарело или после N потраченных токенов.
+    Запрос блокируется только если закэшированный баланс ниже MINIMUM_USD_ON_BALANCE.
+    """
+
+    BALANCE_KEY = "deepseek:balance"
+    LOCK_KEY = "deepseek:balance:lock"
+    BALANCE_URL = "https://api.deepseek.com/user/balance"
+
+    def __init__(
+            self,
+            redis_client: Redis,
+            refresh_interval: int = config.DEEPSEEK_BALANCE_REFRESH_SECONDS,
+            refresh_after_tokens: int = config.DEEPSEEK_BALANCE_REFRESH_TOKENS,
+            minimum_balance: float = config.MINIMUM_USD_ON_BALANCE,
+    ):
+        self.redis = redis_client
+        self.refresh_interval = refresh_interval
+        self.refresh_after_tokens = refresh_after_tokens
+        self.minimum_balance = minimum_balance
+
+        self._balance: float | None = None
+        self._updated_at: float = 0.0
+        self._last_attempt: float = 0.0
+        self._tokens_spent: int = 0
+
+        self._session: aiohttp.ClientSession | None = None
+        self._refresh_task: asyncio.Task | None = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def balance(self) -> float | None:
+        return self._balance
+
+    def _is_low(self) -> bool:
+        return self._balance is not None and self._balance <= self.minimum_balance
+
+    def _max_age(self, balance: float) -> int:
+        # при нехватке денег обновляем чаще, чтобы пополнение подхватилось быстро
+        if balance <= self.minimum_balance:
+            return max(self.refresh_interval // 10, 1)
+        return self.refresh_interval
+
+    def _is_stale(self) -> bool:
+        return time.monotonic() - self._updated_at > self._max_age(self._balance)
+
+    async def check_balance(self) -> None:
+        """
+        Гейт перед запросом к LLM.
+
+        Первый вызов в процессе ждёт загрузку баланса, дальше — только кэш + фоновое обновление.
+        """
+        if self._balance is None:
+            # баланс ещё не известен: ждём первый запрос (но не долбим API, если он недоступен)
+            if time.monotonic() - self._last_attempt > self.refresh_interval // 10:
+                await self.refresh()
+        elif self._is_stale():
+            self._schedule_refresh()
+
+        if self._is_low():
+            logger.error(f"На балансе недостаточно денег: {self._balance} <= {self.minimum_balance}")
+            raise HTTPException(
+                status_code=status.HTTP_402_PAYMENT_REQUIRED,
+                detail="На балансе DeepseekAPI недостаточно денег!"
+            )
+
+    def register_usage(self, usage) -> None:
+        """Учитывает потраченные токены (response.usage), после N токенов обновляет баланс"""
+        if usage is None:
+            return
+
+        self._tokens_spent += getattr(usage, "total_tokens", 0) or 0
+        if self._tokens_spent >= self.refresh_after_tokens:
+            self._tokens_spent = 0
+            self._schedule_refresh()
+
+    def _schedule_refresh(self) -> None:
+        if self._refresh_task and not self._refresh_task.done():
+            return
+        self._refresh_task = asyncio.create_task(self.refresh())
+
+    async def refresh(self) -> None:
+        """
+        Обновляет баланс:
+            — берёт свежее значение из Redis, если его уже обновил другой воркер
+            — иначе запрашивает API (под Redis-локом) и кладёт результат в Redis
+        """
+        async with self._lock:
+            self._last_attempt = time.monotonic()
+            try:
+                if await self._load_from_cache():
+                    return
+
+                got_lock = await self.redis.set(self.LOCK_KEY, "1", nx=True, ex=10)
+                if not got_lock and self._balance is not None:
+                    return  # другой воркер уже обновляет баланс
+
+                balance_now: float | None = await self._fetch_balance()
+                if balance_now is None:
+                    return
+
+                self._set_balance(balance_now)
+                await self.redis.set(
+                    self.BALANCE_KEY,
+                    json.dumps({"balance": balance_now, "updated_at": time.time()}),
+                    ex=self.refresh_interval
+                )
+                logger.info(f"Баланс DeepseekAPI обновлён: {balance_now}")
+
+            except Exception as e:
+                logger.error(f"Ошибка при обновлении баланса: {e}")
+
+    async def _load_from_cache(self) -> bool:
+        """Подтягивает баланс из Redis, если он свежее локального"""
+        cached = await self.redis.get(self.BALANCE_KEY)
+        if not cached:
+            return False
+
+        data: dict = json.loads(cached)
+        balance: float = float(data["balance"])
+        age: float = time.time() - float(data["updated_at"])
+        if age > self._max_age(balance):
+            return False
+
+        self._set_balance(balance, age=age)
+        return True
+
+    def _set_balance(self, balance: float, age: float = 0.0) -> None:
+        self._balance = balance
+        self._updated_at = time.monotonic() - age
+
+    async def _fetch_balance(self) -> float | None:
+        """Запрос баланса в DeepseekAPI"""
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(total=10)
+            )
+
+        try:
+            async with self._session.get(
+                    self.BALANCE_URL,
+                    headers={
+                        'Accept': 'application/json',
+                        'Authorization': f'Bearer {config.DEEPSEEK_API_KEY}'
+                    }
+            ) as response:
+                balance_data = await response.json()
+
+        except aiohttp.ClientError as e:
+            logger.error(f"Ошибка при проверке баланса: {e}")
+            return None
+
+        usd_balance_info = next(
+            (item for item in balance_data["balance_infos"] if item["currency"] == "USD"),
+            None
+        )
+        return float(usd_balance_info["total_balance"]) if usd_balance_info else 0.0
+
+    async def close(self) -> None:
+        if self._refresh_task and not self._refresh_task.done():
+            self._refresh_task.cancel()
+        if self._session:
+            await self._session.close()
+            self._session = None
@@ -1,112 +1,101 @@
+import asyncio
 import logging
-from typing import Optional, Any
+import uuid
+from typing import Optional, Any, Awaitable, Callable, TypeVar
 
 from src.api.response_schemas.characteristic import GetAllCharacteristicResponse
-from src.core.schemas.clinical_disorders.anxiety.gdr import GDRSchema
-from src.core.schemas.clinical_disorders.anxiety.panic import PanicSchema
-from src.core.schemas.clinical_disorders.anxiety.ptsd import PTSDSchema
-from src.core.schemas.clinical_disorders.mood_disorders.bipolar import BipolarDisorderSchema
-from src.core.schemas.clinical_disorders.mood_disorders.depression import DepressionDisorderSchema
-from src.core.schemas.clinical_disorders.neuro_disorders.adhd import ADHDSchema
-from src.core.schemas.clinical_disorders.neuro_disorders.autism import AutismSchema
-from src.core.schemas.clinical_disorders.neuro_disorders.dissociative import DissociativeSchema
-from src.core.schemas.clinical_disorders.neuro_disorders.eating import EatingSchema
-from src.core.schemas.clinical_disorders.neuro_disorders.looks_disorder import LooksSchema
-from src.core.schemas.clinical_disorders.personality_disorders.bpd import BPDSchema
 from src.core.schemas.diary_schema import DiarySchema
-from src.core.schemas.personality_types.hexaco import HexacoSchema
-from src.core.schemas.personality_types.holland_codes import HollandCodesSchema
-from src.core.schemas.personality_types.socionics_type import MBTISchema
-from src.core.schemas.traits.traits_basic import EmotionalProfileSchema, BehavioralProfileSchema, \
-    CognitiveProfileSchema, \
-    SocialProfileSchema
-from src.core.schemas.traits.traits_humor import HumorProfileSchema
-from src.core.schemas.triads.dark_triad import DarkTriadsSchema
-from src.core.schemas.triads.light_triad import LightTriadsSchema
 from src.core.schemas.user_schemas import UserSchema, UserTelegramDataSchema
 from src.core.services.api_client.personalityGPT_api import PersonalityGPT_APIClient
 from src.core.services.cache_services.redis_service import RedisService
 from src.infrastructure.database.models.base import S
+from src.infrastructure.database.schema_registry import SCHEMA_GROUPS, SCHEMA_REGISTRY, SchemaMeta
 
 logger = logging.getLogger(__name__)
 
-GROUP_REGISTRY: dict[str, list[type[S]]] = {
-    "basic": [
-        SocialProfileSchema,
-        CognitiveProfileSchema,
-        EmotionalProfileSchema,
-        BehavioralProfileSchema,
-    ],
-    "humor": [
-        HumorProfileSchema
-    ],
-    "triads": [
-        DarkTriadsSchema,
-        LightTriadsSchema
-    ],
-    "neuro": [
-        AutismSchema,
-        ADHDSchema
-    ],
-    "mood_disorders": [
-        DepressionDisorderSchema,
-        BipolarDisorderSchema
-    ],
-    "bpd": [
-        BPDSchema
-    ],
-    "dissociative": [
-        DissociativeSchema
-    ],
-    "anxiety": [
-        PTSDSchema,
-        PanicSchema,
-        GDRSchema
-    ],
-    "looks": [
-        LooksSchema,
-        EatingSchema
-    ]
-}
-
-SCHEMA_REGISTRY = {
-    "SocialProfileSchema": SocialProfileSchema,
-    "CognitiveProfileSchema": CognitiveProfileSchema,
-    "EmotionalProfileSchema": EmotionalProfileSchema,
-    "BehavioralProfileSchema": BehavioralProfileSchema,
-
-    "MBTISchema": MBTISchema,
-    "HollandCodesSchema": HollandCodesSchema,
-    "HexacoSchema": HexacoSchema,
-
-    "HumorProfileSchema": HumorProfileSchema,
-    "DarkTriadsSchema": DarkTriadsSchema,
-    "LightTriadsSchema": LightTriadsSchema,
-
-    "AutismSchema": AutismSchema,
-    "ADHDSchema": ADHDSchema,
-    "DepressionDisorderSchema": DepressionDisorderSchema,
-    "BipolarDisorderSchema": BipolarDisorderSchema,
-    "BPDSchema": BPDSchema,
-    "DissociativeSchema": DissociativeSchema,
-    "PTSDSchema": PTSDSchema,
-    "PanicSchema": PanicSchema,
-    "GDRSchema": GDRSchema,
-    "LooksSchema": LooksSchema,
-    "EatingSchema": EatingSchema,
-}
+T = TypeVar("T")
 
 
 class CacheService:
-    """Сервис для работы с кэшем"""
+    """
+    Сервис для работы с кэшем
+
+    Промахи кэша коалесцируются (single-flight) по ключу (операция, telegram_id):
+    параллельные запросы одного юзера ждут один и тот же запрос к API.
+    С use_redis_lock — дополнительно Redis-лок, чтобы несколько процессов не били в API одновременно.
+    """
 
     def __init__(
             self,
             redis_service: RedisService,
-            api_client: PersonalityGPT_APIClient
+            api_client: PersonalityGPT_APIClient,
+            use_redis_lock: bool = False,
+            lock_timeout: float = 10.0
     ):
         self.redis_service = redis_service
         self.api_client = api_client
+        self.use_redis_lock = use_redis_lock
+        self.lock_timeout = lock_timeout
+
+        self._in_flight: dict[tuple[str, str], asyncio.Task] = {}
+
+    # [ SINGLE FLIGHT ]
+    async def _single_flight(
+            self,
+            operation: str,
+            telegram_id: str,
+            fetch: Callable[[], Awaitable[T]],
+            read_cache: Callable[[], Awaitable[T | None]]
+    ) -> T:
+        """
+        Один запрос на промах кэша для (operation, telegram_id) в пределах процесса.
+
+        :param fetch: запрос к API + запись в кэш
+        :param read_cache: чтение кэша (нужно, пока ждём Redis-лок другого процесса)
+        """
+        key = (operation, telegram_id)
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._fetch_with_lock(operation, telegram_id, fetch, read_cache))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+
+        # shield: отмена одного ожидающего не отменяет общий запрос
+        return await asyncio.shield(task)
+
+    async def _fetch_with_lock(
+            self,
+            operation: str,
+            telegram_id: str,
+            fetch: Callable[[], Awaitable[T]],
+            read_cache: Callable[[], Awaitable[T | None]]
+    ) -> T:
+        """Защита от cache stampede между процессами"""
+        if not self.use_redis_lock:
+            return await fetch()
+
+        lock_key = f"lock:{operation}:{telegram_id}"
+        lock_token = uuid.uuid4().hex
+        redis = self.redis_service.redis
+
+        if await redis.set(lock_key, lock_token, nx=True, ex=int(self.lock_timeout)):
+            try:
+                return await fetch()
+            finally:
+                if await redis.get(lock_key) == lock_token:
+                    await redis.delete(lock_key)
+
+        # [ лок у другого процесса — ждём, пока он заполнит кэш ]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.lock_timeout
+        while loop.time() < deadline:
+            await asyncio.sleep(0.05)
+            cached = await read_cache()
+            if cached is not None:
+                return cached
+
+        logger.warning(f"Не дождались кэша {operation} для {telegram_id}, запрашиваем сами")
+        return await fetch()
 
     async def get_or_refresh_access_token(
             self,
@@ -139,16 +128,23 @@ class CacheService:
         if cache_data:
             return cache_data
 
-        fresh_data: UserSchema = await self.api_client.get_current_user(access_token)
+        async def fetch() -> UserSchema:
+            fresh_data: UserSchema = await self.api_client.get_current_user(access_token)
+
+            await self.redis_service.set_user_profile(
+                telegram_id,
+                fresh_data,
+                expiry
+            )
+            return fresh_data
 
-        await self.redis_service.set_user_profile(
+        return await self._single_flight(
+            "user_profile",
             telegram_id,
-            fresh_data,
-            expiry
+            fetch=fetch,
+            read_cache=lambda: self.redis_service.get_user_profile(telegram_id)
         )
 
-        return fresh_data
-
     async def get_all_characteristics(
             self,
             access_token: str,
@@ -164,28 +160,36 @@ class CacheService:
         if cached_all is not None:
             return cached_all
 
-        try:
-            response_obj: GetAllCharacteristicResponse = await self.api_client.get_characteristics(access_token)
-            all_raw: list[dict] = response_obj["response"]
-        except Exception as e:
-            logger.error(f"Ошибка получения всех характеристик для {telegram_id}: {e}")
-            return {}
+        async def fetch() -> dict[str, dict[str, Any]]:
+            try:
+                response_obj: GetAllCharacteristicResponse = await self.api_client.get_characteristics(access_token)
+                all_raw: list[dict] = response_obj["response"]
+            except Exception as e:
+                logger.error(f"Ошибка получения всех характеристик для {telegram_id}: {e}")
+                return {}
 
-        characteristics_dict: dict[str, dict[str, Any]] = {}
+            characteristics_dict: dict[str, dict[str, Any]] = {}
 
-        for raw in all_raw:
-            type_name = raw["type"]
-            two_last_characteristics: list[S] | S = raw["characteristics"]  # две последние характеристики
+            for raw in all_raw:
+                type_name = raw["type"]
+                two_last_characteristics: list[S] | S = raw["characteristics"]  # две последние характеристики
 
-            characteristics_dict[type_name] = two_last_characteristics
+                characteristics_dict[type_name] = two_last_characteristics
 
-        await self.redis_service.set_all_characteristics(
-            telegram_id=telegram_id,
-            characteristics=characteristics_dict,
-            expire_seconds=expiry
-        )
+            await self.redis_service.set_all_characteristics(
+                telegram_id=telegram_id,
+                characteristics=characteristics_dict,
+                expire_seconds=expiry
+            )
+
+            return characteristics_dict
 
-        return characteristics_dict
+        return await self._single_flight(
+            "characteristics",
+            telegram_id,
+            fetch=fetch,
+            read_cache=lambda: self.redis_service.get_characteristics(telegram_id)
+        )
 
     async def get_characteristic_row(
             self,
@@ -202,7 +206,7 @@ class CacheService:
         all_chars = await self.get_all_characteristics(access_token, telegram_id, expiry)
 
         if characteristic_group:
-            schemas = GROUP_REGISTRY.get(characteristic_group, [])
+            schemas = SCHEMA_GROUPS.get(characteristic_group, ())
             if not schemas:
                 raise ValueError(f"Unknown group: {characteristic_group}")
             result = []
@@ -226,11 +230,11 @@ class CacheService:
         if not raw:
             return None
 
-        cls = SCHEMA_REGISTRY.get(type_name)
-        if not cls:
+        meta: SchemaMeta | None = SCHEMA_REGISTRY.get(type_name)
+        if not meta:
             raise ValueError(f"Unknown schema: {type_name}")
 
-        return [cls.model_validate(raw) for raw in raw]
+        return [meta.schema.model_validate(raw) for raw in raw]
 
     async def get_diary(
             self,
@@ -244,15 +248,23 @@ class CacheService:
             if cached is not None:
                 return cached
 
-        try:
-            entries = await self.api_client.get_diary(access_token)
+        async def fetch() -> list[DiarySchema] | None:
+            try:
+                entries = await self.api_client.get_diary(access_token)
 
-            if entries and isinstance(entries[0], dict):
-                entries = [DiarySchema.model_validate(e) for e in entries]
+                if entries and isinstance(entries[0], dict):
+                    entries = [DiarySchema.model_validate(e) for e in entries]
 
-            await self.redis_service.set_diary(telegram_id, entries, expiry)
-            return entries
+                await self.redis_service.set_diary(telegram_id, entries, expiry)
+                return entries
 
-        except Exception:
-            logger.error(f"Ошибка получения дневника {telegram_id}", exc_info=True)
-            return None
+            except Exception:
+                logger.error(f"Ошибка получения дневника {telegram_id}", exc_info=True)
+                return None
+
+        return await self._single_flight(
+            "diary",
+            telegram_id,
+            fetch=fetch,
+            read_cache=lambda: self.redis_service.get_diary(telegram_id)
+        )
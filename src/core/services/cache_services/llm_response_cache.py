@@ -0,0 +1,124 @@
+import hashlib
+import json
+import logging
+import time
+
+from redis.asyncio import Redis
+
+from src.core import consts
+
+logger = logging.getLogger(__name__)
+
+# KEYS[1] — ответ, KEYS[2] — индекс LRU, KEYS[3] — счётчики; ARGV: сейчас, шаблон
+GET_SCRIPT = """
+local value = redis.call('GET', KEYS[1])
+if value then
+    redis.call('ZADD', KEYS[2], ARGV[1], KEYS[1])
+    redis.call('HINCRBY', KEYS[3], ARGV[2] .. ':hit', 1)
+else
+    redis.call('HINCRBY', KEYS[3], ARGV[2] .. ':miss', 1)
+end
+return value
+"""
+
+# KEYS[1] — ответ, KEYS[2] — индекс LRU; ARGV: ответ, TTL, сейчас, макс. записей
+SET_SCRIPT = """
+redis.call('SET', KEYS[1], ARGV[1], 'EX', tonumber(ARGV[2]))
+redis.call('ZADD', KEYS[2], ARGV[3], KEYS[1])
+local excess = redis.call('ZCARD', KEYS[2]) - tonumber(ARGV[4])
+if excess > 0 then
+    local evicted = redis.call('ZPOPMIN', KEYS[2], excess)
+    for i = 1, #evicted, 2 do
+        redis.call('DEL', evicted[i])
+    end
+end
+return excess
+"""
+
+
+class LLMResponseCache:
+    """
+    Кэш ответов LLM для детерминированных вызовов (opt-in в get_response через cache_ttl).
+
+    Ключ — хэш (шаблон, текст промпта, нормализованный вход, модель, temperature, модель ответа),
+    значение — сырой ответ модели. Размер ограничен: индекс по времени обращения (ZSET),
+    при переполнении вытесняются давно не читанные ответы (LRU). Попадания/промахи — счётчики по шаблонам.
+    Поиск и запись — по одному Lua скрипту (один round trip).
+    """
+
+    KEY_PREFIX = "llm:response_cache"
+    INDEX_KEY = "llm:response_cache:index"
+    STATS_KEY = "llm:response_cache:stats"
+
+    def __init__(self, redis_client: Redis, max_entries: int = consts.LLM_RESPONSE_CACHE_MAX_ENTRIES):
+        self.redis = redis_client
+        self.max_entries = max_entries
+        self._get_script = self.redis.register_script(GET_SCRIPT)
+        self._set_script = self.redis.register_script(SET_SCRIPT)
+
+    @staticmethod
+    def normalize_input(input_query: str) -> str:
+        """Пробелы/переносы не влияют на ответ — не влияют и на ключ"""
+        return " ".join(input_query.split())
+
+    def make_key(
+            self,
+            prompt_template: str,
+            prompt: str,
+            input_query: str,
+            model: str,
+            temperature: float,
+            response_model: str
+    ) -> str:
+        # текст промпта в ключе: правка промпта сама сбрасывает старые ответы
+        payload: str = json.dumps(
+            [
+                prompt_template,
+                hashlib.sha256(prompt.encode()).hexdigest(),
+                self.normalize_input(input_query),
+                model,
+                temperature,
+                response_model,
+            ],
+            ensure_ascii=False
+        )
+        return f"{self.KEY_PREFIX}:{prompt_template}:{hashlib.sha256(payload.encode()).hexdigest()}"
+
+    async def get(self, key: str, prompt_template: str) -> str | None:
+        """Ответ из кэша (ошибка Redis = промах, запрос уйдёт в LLM)"""
+        try:
+            return await self._get_script(
+                keys=[key, self.INDEX_KEY, self.STATS_KEY],
+                args=[time.time(), prompt_template]
+            )
+        except Exception as e:
+            logger.warning(f"Кэш ответов LLM недоступен: {e}")
+            return None
+
+    async def set(self, key: str, content: str, ttl: int) -> None:
+        try:
+            evicted = await self._set_script(
+                keys=[key, self.INDEX_KEY],
+                args=[content, ttl, time.time(), self.max_entries]
+            )
+            if evicted and int(evicted) > 0:
+                logger.info(f"Кэш ответов LLM: вытеснено {evicted}")
+        except Exception as e:
+            logger.warning(f"Не удалось сохранить ответ LLM в кэш: {e}")
+
+    async def get_stats(self) -> dict:
+        """{"entries": N, "templates": {template: {"hit", "miss", "hit_ratio"}}} — сэкономленные запросы = hit"""
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.zcard(self.INDEX_KEY)
+            pipe.hgetall(self.STATS_KEY)
+            entries, counters = await pipe.execute()
+
+        templates: dict[str, dict[str, float]] = {}
+        for field, value in counters.items():
+            template, _, kind = field.rpartition(":")
+            templates.setdefault(template, {"hit": 0, "miss": 0})[kind] = int(value)
+        for stats in templates.values():
+            total = stats["hit"] + stats["miss"]
+            stats["hit_ratio"] = stats["hit"] / total if total else 0.0
+
+        return {"entries": entries, "templates": templates}
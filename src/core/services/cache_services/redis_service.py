@@ -1,13 +1,18 @@
+import asyncio
 import json
 import logging
+import time
+import uuid
 from enum import Enum
 from typing import Optional, Any
 from uuid import UUID
 
 from redis.asyncio import Redis
 
+from src.core import consts
 from src.core.schemas.diary_schema import DiarySchema
 from src.core.schemas.user_schemas import UserSchema
+from src.core.services.cache_services.local_cache import LocalCache
 from src.infrastructure.config.config import config
 
 logger = logging.getLogger(__name__)
@@ -18,9 +23,116 @@ class CacheKeys(str, Enum):
     USER_PROFILE = "user_profile"
 
 
+# KEYS[1] — история; ARGV: реплика юзера, ответ, макс. длина, TTL, глубина проверки дубликата
+APPEND_TURN_SCRIPT = """
+local recent = redis.call('LRANGE', KEYS[1], 0, tonumber(ARGV[5]) - 1)
+for _, message in ipairs(recent) do
+    if message == ARGV[1] then
+        return 0
+    end
+end
+redis.call('LPUSH', KEYS[1], ARGV[1], ARGV[2])
+redis.call('LTRIM', KEYS[1], 0, tonumber(ARGV[3]) - 1)
+redis.call('EXPIRE', KEYS[1], tonumber(ARGV[4]))
+return redis.call('LLEN', KEYS[1])
+"""
+
+# KEYS[1] — история, KEYS[2] — сводка; ARGV: сводка, TTL, свёрнутые сообщения (хвост списка, от новых к старым)
+FOLD_HISTORY_SCRIPT = """
+local folded = #ARGV - 2
+local tail = redis.call('LRANGE', KEYS[1], -folded, -1)
+if #tail ~= folded then
+    return 0
+end
+for i = 1, folded do
+    if tail[i] ~= ARGV[i + 2] then
+        return 0
+    end
+end
+redis.call('SET', KEYS[2], ARGV[1], 'EX', tonumber(ARGV[2]))
+redis.call('LTRIM', KEYS[1], 0, -folded - 1)
+return folded
+"""
+
+
 class RedisService:
-    def __init__(self, redis_client: Redis):
+    INVALIDATION_CHANNEL = "cache:invalidate"
+    INVALIDATION_PING_INTERVAL = 5  # сек тишины в канале до проверки соединения (меньше socket_timeout пула)
+
+    def __init__(self, redis_client: Redis, local_cache: LocalCache | None = None):
         self.redis = redis_client
+        self.local_cache = local_cache  # L1: опционально, согласуется через pub/sub
+        self._instance_id = uuid.uuid4().hex  # свои сообщения об инвалидации пропускаем
+        self._append_turn_script = self.redis.register_script(APPEND_TURN_SCRIPT)
+        self._fold_history_script = self.redis.register_script(FOLD_HISTORY_SCRIPT)
+
+    # [ L1 ]
+    async def _set_local(self, redis_key: str, value, expire_seconds: int) -> None:
+        """
+        Кладёт свежее значение в свой L1 (если включен), у остальных процессов ключ сбрасывается.
+        Публикуется всегда: пишут в основном API/воркер без L1, а L1 держат процессы бота.
+        """
+        if self.local_cache is not None:
+            self.local_cache.set(redis_key, value, ttl=expire_seconds)
+        await self._publish_invalidation(redis_key)
+
+    async def _invalidate_key(self, redis_key: str) -> None:
+        """Удаляет ключ из Redis и из L1 всех процессов (публикуется и без своего L1)"""
+        await self.redis.delete(redis_key)
+
+        if self.local_cache is not None:
+            self.local_cache.delete(redis_key)
+        await self._publish_invalidation(redis_key)
+
+    async def _publish_invalidation(self, redis_key: str) -> None:
+        await self.redis.publish(self.INVALIDATION_CHANNEL, f"{self._instance_id}:{redis_key}")
+
+    async def listen_invalidations(self) -> None:
+        """
+        Слушает инвалидации других процессов и чистит L1.
+        Запускается фоновой задачей при старте процесса (если L1 включен).
+
+        Чтение — get_message с таймаутом меньше socket_timeout пула: простой канала не считается обрывом.
+        Живость соединения проверяется PING после INVALIDATION_PING_INTERVAL секунд тишины;
+        L1 сбрасывается только при (пере)подписке — пока её не было, инвалидации могли потеряться.
+        """
+        if self.local_cache is None:
+            return
+
+        while True:
+            pubsub = self.redis.pubsub()
+            try:
+                await pubsub.subscribe(self.INVALIDATION_CHANNEL)
+                self.local_cache.clear()
+
+                last_seen: float = time.monotonic()  # последнее сообщение или PONG
+                last_ping: float = last_seen
+                while True:
+                    message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                    now: float = time.monotonic()
+                    if message is None:
+                        if now - last_seen >= 3 * self.INVALIDATION_PING_INTERVAL:
+                            raise ConnectionError("нет ответа на PING")
+                        if now - last_ping >= self.INVALIDATION_PING_INTERVAL:
+                            await pubsub.ping()
+                            last_ping = now
+                        continue
+
+                    last_seen = now
+                    if message["type"] != "message":
+                        continue  # pong
+
+                    instance_id, _, redis_key = message["data"].partition(":")
+                    if instance_id != self._instance_id:
+                        self.local_cache.delete(redis_key)
+
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Подписка на инвалидации кэша оборвалась: {e}")
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.aclose()
 
     # [ KEYS ]
     @staticmethod
@@ -39,18 +151,129 @@ class RedisService:
     def _get_diary_key(telegram_id: str) -> str:
         return f"user:{telegram_id}:diary"
 
+    @staticmethod
+    def _get_profile_fragments_key(user_id: UUID) -> str:
+        return f"user:{user_id}:profile_fragments"
+
+    @staticmethod
+    def _get_profile_version_key(user_id: UUID) -> str:
+        return f"user:{user_id}:profile_version"
+
+    @staticmethod
+    def _get_history_key(user_id: UUID) -> str:
+        return f"chat:history:{user_id}"
+
+    @staticmethod
+    def _get_history_summary_key(user_id: UUID) -> str:
+        return f"chat:history:{user_id}:summary"
+
     # [ ASSISTANT CONTEXT ]
     async def get_history(self, user_id: UUID, max_messages: int = 15) -> list[dict]:
-        """Возвращает последние N сообщений в формате OpenAI messages"""
-        key = f"chat:history:{user_id}"
-        messages = await self.redis.lrange(key, 0, max_messages - 1)
+        """
+        Возвращает последние N сообщений в формате OpenAI messages.
+
+        Одним MULTI: чтение + продление TTL — история не истечёт, пока ход диалога в работе.
+        """
+        key = self._get_history_key(user_id)
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.lrange(key, 0, max_messages - 1)
+            pipe.expire(key, consts.CHAT_HISTORY_TTL_SECONDS)
+            messages, _ = await pipe.execute()
         return [json.loads(msg) for msg in messages[::-1]]  # последние → первые
 
-    async def add_message(self, user_id: UUID, role: str, content: str):
-        key = f"chat:history:{user_id}"
-        msg = {"role": role, "content": content}
-        await self.redis.lpush(key, json.dumps(msg))  # добавляем слева
-        await self.redis.ltrim(key, 0, 49)  # храним максимум 50 сообщений
+    async def get_history_with_summary(self, user_id: UUID, max_messages: int) -> tuple[list[dict], str | None]:
+        """
+        История (последние → первые) + сводка свёрнутых старых ходов — одним MULTI, с продлением TTL
+        """
+        key = self._get_history_key(user_id)
+        summary_key = self._get_history_summary_key(user_id)
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.lrange(key, 0, max_messages - 1)
+            pipe.get(summary_key)
+            pipe.expire(key, consts.CHAT_HISTORY_TTL_SECONDS)
+            pipe.expire(summary_key, consts.CHAT_HISTORY_TTL_SECONDS)
+            messages, summary, _, _ = await pipe.execute()
+        return [json.loads(msg) for msg in messages[::-1]], summary
+
+    async def fold_history(self, user_id: UUID, folded: list[dict], summary: str) -> bool:
+        """
+        Сворачивает самые старые сообщения folded (от старых к новым) в сводку — одним Lua скриптом:
+        новая сводка + удаление хвоста, только если хвост списка всё ещё ровно эти сообщения.
+        Пока LLM писала сводку, LTRIM в append_turn мог срезать хвост — тогда ничего не меняется.
+
+        :return: False — хвост изменился, сворачивание пропущено
+        """
+        if not folded:
+            return False
+
+        # те же строки, что пишет append_turn (json.dumps без параметров)
+        tail: list[str] = [json.dumps(message) for message in reversed(folded)]
+        result = await self._fold_history_script(
+            keys=[self._get_history_key(user_id), self._get_history_summary_key(user_id)],
+            args=[summary, consts.CHAT_HISTORY_TTL_SECONDS, *tail]
+        )
+        return bool(result)
+
+    async def append_turn(self, user_id: UUID, user_message: str, assistant_message: str) -> int:
+        """
+        Сохраняет ход диалога (реплика юзера + ответ) одним Lua скриптом:
+            проверка дубликата, LPUSH обоих сообщений, LTRIM, EXPIRE — атомарно, за один round trip.
+
+        :return: длина истории после записи; 0 — такая реплика юзера уже есть в последних сообщениях, ход не записан
+        """
+        user_json: str = json.dumps({"role": "user", "content": user_message})
+        assistant_json: str = json.dumps({"role": "assistant", "content": assistant_message})
+
+        history_length = await self._append_turn_script(
+            keys=[self._get_history_key(user_id)],
+            args=[
+                user_json,
+                assistant_json,
+                consts.CHAT_HISTORY_MAX_MESSAGES,
+                consts.CHAT_HISTORY_TTL_SECONDS,
+                consts.CHAT_HISTORY_DEDUP_DEPTH,
+            ]
+        )
+        return int(history_length)
+
+    # [ PROFILE FRAGMENTS ]
+    PROFILE_FRAGMENTS_VERSION_FIELD = "__version__"
+
+    async def get_profile_fragments(self, user_id: UUID) -> tuple[dict[str, str] | None, str]:
+        """
+        Отрендеренные блоки профиля для промпта + текущая версия профиля (одним pipeline).
+        Блоки другой версии (профиль обновился после рендера) не возвращаются.
+        """
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.hgetall(self._get_profile_fragments_key(user_id))
+            pipe.get(self._get_profile_version_key(user_id))
+            fragments, version = await pipe.execute()
+
+        version = version or "0"
+        if fragments and fragments.pop(self.PROFILE_FRAGMENTS_VERSION_FIELD, None) == version:
+            return fragments, version
+        return None, version
+
+    async def set_profile_fragments(self, user_id: UUID, fragments: dict[str, str], version: str) -> None:
+        """
+        Сохраняет блоки, отрендеренные по профилю версии version
+        (версию читать ДО загрузки профиля: если профиль обновится во время рендера — блоки не совпадут по версии)
+        """
+        key = self._get_profile_fragments_key(user_id)
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.delete(key)
+            pipe.hset(key, mapping={**fragments, self.PROFILE_FRAGMENTS_VERSION_FIELD: version})
+            pipe.expire(key, consts.PROFILE_FRAGMENTS_TTL_SECONDS)
+            await pipe.execute()
+
+    async def invalidate_profile_fragments(self, user_id: UUID) -> None:
+        """Новая версия профиля — блоки старой версии больше не читаются"""
+        version_key = self._get_profile_version_key(user_id)
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.incr(version_key)
+            pipe.expire(version_key, consts.PROFILE_VERSION_TTL_SECONDS)
+            pipe.delete(self._get_profile_fragments_key(user_id))
+            await pipe.execute()
 
     # [ TYPIFICATION MESSAGES ]
     async def get_typification_answers(self, tg_id: str, typification_key: str) -> list[str]:
@@ -90,11 +313,19 @@ class RedisService:
         Получить все характеристики одним словарем: {"SocialProfileSchema": {...}, ... }
         """
         redis_key = self._get_characteristics_key(telegram_id)
+        if self.local_cache is not None:
+            local = self.local_cache.get(redis_key)
+            if local is not None:
+                return local
+
         cached_json: dict = await self.redis.get(redis_key)
 
         if cached_json is not None and cached_json.__len__() > 2:  # str format: {}
             try:
-                return json.loads(cached_json)
+                characteristics = json.loads(cached_json)
+                if self.local_cache is not None:
+                    self.local_cache.set(redis_key, characteristics)
+                return characteristics
             except json.JSONDecodeError:
                 logger.warning(f"Повреждённый кэш характеристик: {redis_key}")
                 await self.redis.delete(redis_key)
@@ -103,14 +334,30 @@ class RedisService:
     async def get_access_token(self, telegram_id: str) -> Optional[str]:
         """Получение access token из кэша"""
         redis_key = self._get_token_key(telegram_id)
-        return await self.redis.get(redis_key)
+        if self.local_cache is not None:
+            local = self.local_cache.get(redis_key)
+            if local is not None:
+                return local
+
+        token = await self.redis.get(redis_key)
+        if token and self.local_cache is not None:
+            self.local_cache.set(redis_key, token)
+        return token
 
     async def get_user_profile(self, telegram_id: str) -> UserSchema | None:
         """Получение профиля юзера из кэша"""
         redis_key = self._get_user_profile_key(telegram_id)
+        if self.local_cache is not None:
+            local = self.local_cache.get(redis_key)
+            if local is not None:
+                return local
+
         cache_data = await self.redis.get(redis_key)
         if cache_data:
-            return UserSchema.model_validate_json(cache_data)
+            user = UserSchema.model_validate_json(cache_data)
+            if self.local_cache is not None:
+                self.local_cache.set(redis_key, user)
+            return user
         return None
 
     # [ SETTERS ]
@@ -123,6 +370,7 @@ class RedisService:
         """Сохранение access token в кэш"""
         redis_key = self._get_token_key(telegram_id)
         await self.redis.set(redis_key, access_token, ex=expire_seconds)
+        await self._set_local(redis_key, access_token, expire_seconds)
 
     async def set_user_profile(
             self,
@@ -137,6 +385,7 @@ class RedisService:
             data.model_dump_json(),
             ex=expire_seconds
         )
+        await self._set_local(cache_key, data, expire_seconds)
 
     async def set_all_characteristics(
             self,
@@ -153,6 +402,10 @@ class RedisService:
             json.dumps(characteristics),
             ex=expire_seconds
         )
+        if characteristics:
+            await self._set_local(redis_key, characteristics, expire_seconds)
+        else:
+            await self._publish_invalidation(redis_key)
 
     async def set_diary(
             self,
@@ -176,18 +429,17 @@ class RedisService:
     async def invalidate_user_profile(self, telegram_id: str) -> None:
         """Инвалидация кэша профиля пользователя"""
         cache_key = self._get_user_profile_key(telegram_id)
-        await self.redis.delete(cache_key)
+        await self._invalidate_key(cache_key)
 
     async def invalidate_chat_context(self, user_id: UUID) -> None:
-        """Инвалидация контекста"""
-        key = f"chat:history:{user_id}"
-        await self.redis.delete(key)
+        """Инвалидация контекста (история + сводка)"""
+        await self.redis.delete(self._get_history_key(user_id), self._get_history_summary_key(user_id))
 
     async def invalidate_characteristics(self, telegram_id: str) -> None:
         """Инвалидация кэша характеристик"""
         cache_key = self._get_characteristics_key(telegram_id)
-        await self.redis.delete(cache_key)
+        await self._invalidate_key(cache_key)
 
-    async def invalidate_all_diaries(self):
-        async for key in self.redis.scan_iter("user:*:diary"):
-            await self.redis.delete(key)
+    async def invalidate_diary(self, telegram_id: str) -> None:
+        """Инвалидация кэша дневника юзера"""
+        await self.redis.delete(self._get_diary_key(telegram_id))
@@ -1,3 +1,5 @@
+import asyncio
+import contextlib
 import json
 import logging
 import uuid
@@ -5,13 +7,15 @@ from typing import Type, Sequence
 
 from src.api.response_schemas.survey import Characteristic
 from src.core.consts import (
-    MIN_CHARS_LENGTH_TO_GENERATE_PSYCHO, MIN_CHARS_LENGTH_TO_GENERATE_LEARN
+    MIN_CHARS_LENGTH_TO_GENERATE_PSYCHO, MIN_CHARS_LENGTH_TO_GENERATE_LEARN, GENERATION_USER_CONCURRENCY,
+    GENERATION_COMBINED_MAX_SCHEMAS
 )
 from src.core.enums.user import TALKING_MODES
-from src.core.prompts.typifications.finish import END_TYPIFICATION_PROMPT
+from src.core.prompts.typifications.finish import END_TYPIFICATION_PROMPT, END_TYPIFICATION_COMBINED_PROMPT
 from src.core.schemas.log_schemas import CharacteristicBatchLogSchema
 from src.core.services.assistant_service import AssistantService
 from src.core.utils.funcs import clean_characteristic_json
+from src.infrastructure.config.config import config
 from src.infrastructure.database.models.base import S, M
 from src.infrastructure.database.repository.characteristic_repo import CharacteristicFormat, CharacteristicRepository, \
     CHARACTERISTIC_SCHEMAS_TO_MODELS
@@ -51,90 +55,216 @@ class CharacteristicService:
                 telegram_id=telegram_id
             )
 
-    async def should_generate_characteristic(
+    async def add_to_batches(
             self,
             user_id: uuid.UUID,
             message_text: str,
-            schema_type: Type[S],  # таблица характеристики
-            telegram_id: str,
-            access_token: str,
+            schema_types: list[Type[S]],
             talk_mode: TALKING_MODES
-    ) -> bool | None:
+    ) -> list[Type[S]]:
         """
-        Определяет, пора ли генерировать/обновлять характеристику
-
-        Если недостаточно длины —> записывает лог в таблицу батчей.
+        Пишет сообщение в батчи нескольких схем (один запрос к счётчикам + одна вставка логов).
+        Возвращает схемы, у которых набрался батч для генерации
+        """
+        model_types: list[Type[M]] = [self._get_model_type(schema_type) for schema_type in schema_types]
+        totals: dict[str, int] = await self.repo.add_logs_to_batch(
+            user_id=user_id,
+            characteristic_types=model_types,
+            message=message_text
+        )
 
-        Если достаточно —> обновляет таблицу характеристики и удаляет таблицу батчей.
+        min_chars: int = self._get_min_chars(talk_mode)
+        return [
+            schema_type for schema_type, model_type in zip(schema_types, model_types)
+            if totals.get(model_type.__name__, 0) >= min_chars
+        ]
 
-        :param message_text: текст пользователя
-        :param schema_type: схема, полученная из CHECK_IN
+    async def generate_characteristics(
+            self,
+            user_id: uuid.UUID,
+            schema_types: list[Type[S]],
+            telegram_id: str,
+            access_token: str,
+            talk_mode: TALKING_MODES,
+            max_concurrency: int = GENERATION_USER_CONCURRENCY,
+            llm_semaphore: asyncio.Semaphore | None = None
+    ) -> tuple[list[S], list[Type[S]]]:
         """
-        model_type: Type[M] = CHARACTERISTIC_SCHEMAS_TO_MODELS.get(schema_type)
-        if not model_type:
-            raise ValueError(f"Неизвестный тип схемы: {schema_type}")
+        Генерация схем, у которых набрался батч (сообщение в батчи уже записано — add_to_batches):
+            — порог перепроверяется по счётчикам (батч мог быть использован предыдущей задачей)
+            — генерация параллельно (не больше max_concurrency на юзера, llm_semaphore — общий лимит процесса)
+            — результаты + списание использованных логов — одной транзакцией, кэш инвалидируется один раз
 
-        # [ создаем батч для этого профиля харки ]
-        await self.repo.create_log_in_batch(
-            user_id=user_id,
-            characteristic_type=model_type,
-            message=message_text
+        Возвращает (сгенерированные характеристики, схемы с ошибкой генерации — их батчи не списываются)
+        """
+        model_types: dict[Type[S], Type[M]] = {
+            schema_type: self._get_model_type(schema_type) for schema_type in schema_types
+        }
+        totals: dict[str, int] = await self.repo.get_batch_totals(
+            user_id, [model_type.__name__ for model_type in model_types.values()]
         )
+        min_chars: int = self._get_min_chars(talk_mode)
 
-        # [ получаем все батчи этого профиля]
-        batch_logs: Sequence[CharacteristicBatchLogSchema] = await self.repo.get_batch_logs(
-            user_id=user_id,
-            characteristic_type=model_type
+        ready: list[tuple[Type[S], Sequence[CharacteristicBatchLogSchema]]] = []
+        for schema_type, model_type in model_types.items():
+            if totals.get(model_type.__name__, 0) >= min_chars:
+                ready.append((schema_type, await self.repo.get_batch_logs(user_id, model_type)))
+
+        if not ready:
+            return [], []
+
+        user_semaphore = asyncio.Semaphore(max_concurrency)
+
+        @contextlib.asynccontextmanager
+        async def llm_slot():
+            async with user_semaphore, llm_semaphore or contextlib.nullcontext():
+                yield
+
+        async def generate_single(schema_type: Type[S], batch_logs: Sequence[CharacteristicBatchLogSchema]) -> S:
+            async with llm_slot():
+                return await self._generate_from_batch(schema_type, batch_logs, telegram_id, access_token)
+
+        async def generate_group(
+                schema_types_group: list[Type[S]],
+                batch_logs: Sequence[CharacteristicBatchLogSchema]
+        ) -> list[S | Exception]:
+            """Схемы с одинаковым батчем — одним запросом, не прошедшие валидацию — по одной"""
+            combined: dict[Type[S], S | Exception] = {}
+            invalid: list[Type[S]] = schema_types_group
+            if len(schema_types_group) > 1:
+                try:
+                    async with llm_slot():
+                        combined, invalid = await self._generate_combined_from_batch(
+                            schema_types_group, batch_logs, telegram_id, access_token
+                        )
+                except Exception as e:
+                    logger.warning(f"Комбинированная генерация не удалась ({user_id}), генерация по схемам: {e}")
+
+            fallback = await asyncio.gather(
+                *(generate_single(schema_type, batch_logs) for schema_type in invalid),
+                return_exceptions=True
+            )
+            combined.update(zip(invalid, fallback))
+            return [combined[schema_type] for schema_type in schema_types_group]
+
+        groups: list[tuple[list[Type[S]], Sequence[CharacteristicBatchLogSchema]]] = self._group_by_batch(ready)
+        results = await asyncio.gather(*(generate_group(*group) for group in groups))
+
+        generated: list[S] = []
+        failed: list[Type[S]] = []
+        for (schema_types_group, _), group_results in zip(groups, results):
+            for schema_type, result in zip(schema_types_group, group_results):
+                if isinstance(result, Exception):
+                    logger.error(f"Ошибка генерации {schema_type.__name__} для {user_id}", exc_info=result)
+                    failed.append(schema_type)
+                else:
+                    generated.append(result)
+
+        generated_types: set[type] = {type(characteristic) for characteristic in generated}
+        await self.repo.append_characteristics(
+            user_id,
+            generated,
+            telegram_id=telegram_id,
+            consumed_logs=[
+                log for schema_type, batch_logs in ready if schema_type in generated_types for log in batch_logs
+            ]
         )
+        return generated, failed
 
-        logs = [log.message for log in batch_logs]
-        logs_length = sum(len(log) for log in logs)
+    @staticmethod
+    def _get_model_type(schema_type: Type[S]) -> Type[M]:
+        model_type: Type[M] = CHARACTERISTIC_SCHEMAS_TO_MODELS.get(schema_type)
+        if not model_type:
+            raise ValueError(f"Неизвестный тип схемы: {schema_type}")
+        return model_type
 
+    def _get_min_chars(self, talk_mode: TALKING_MODES) -> int:
+        """Порог длины батча для генерации"""
         min_chars: int = self.min_chars_psycho
         match talk_mode:
             case TALKING_MODES.RESEARCH:
                 min_chars = self.min_chars_learn
             case TALKING_MODES.INDIVIDUAL_PSYCHO:
                 min_chars = self.min_chars_psycho
+        return min_chars
 
-        if logs_length >= min_chars:
-            # генерируем новую характеристику
-            await self.generate_characteristic(
-                user_id=user_id,
-                characteristic_type=schema_type,
-                batch_logs=batch_logs,
-                telegram_id=telegram_id,
-                access_token=access_token
-            )
-
-            # Удаляем старые логи батчей после генерации
-            await self.repo.delete_batch_logs(
-                user_id=user_id,
-                characteristic_type=model_type
-            )
+    @staticmethod
+    def _group_by_batch(
+            ready: list[tuple[Type[S], Sequence[CharacteristicBatchLogSchema]]]
+    ) -> list[tuple[list[Type[S]], Sequence[CharacteristicBatchLogSchema]]]:
+        """
+        Группы схем для комбинированной генерации: одинаковые сообщения в батче
+        (по GENERATION_COMBINED_MAX_SCHEMAS схем), без LLM_COMBINED_GENERATION — по схеме на группу
+        """
+        if not config.LLM_COMBINED_GENERATION:
+            return [([schema_type], batch_logs) for schema_type, batch_logs in ready]
 
-            return True
+        by_messages: dict[tuple[str, ...], list[tuple[Type[S], Sequence[CharacteristicBatchLogSchema]]]] = {}
+        for schema_type, batch_logs in ready:
+            by_messages.setdefault(tuple(log.message for log in batch_logs), []).append((schema_type, batch_logs))
 
-        return False
+        groups: list[tuple[list[Type[S]], Sequence[CharacteristicBatchLogSchema]]] = []
+        for items in by_messages.values():
+            for i in range(0, len(items), GENERATION_COMBINED_MAX_SCHEMAS):
+                chunk = items[i:i + GENERATION_COMBINED_MAX_SCHEMAS]
+                groups.append(([schema_type for schema_type, _ in chunk], chunk[0][1]))
+        return groups
 
-    async def generate_characteristic(
+    async def _get_old_characteristic(
             self,
-            user_id: uuid.UUID,
             characteristic_type: type[S],
-            batch_logs: Sequence[CharacteristicBatchLogSchema],
             telegram_id: str,
             access_token: str
-    ) -> None:
-        """
-        Генерирует и сохраняет характеристику с учетом прошлой (если она есть.)
-        """
+    ) -> S | None:
+        """Актуальная характеристика юзера (из кэша)"""
         old_characteristic: list[S] | None = await self.repo.cache_service.get_characteristic_row(
             characteristic_name=characteristic_type.__name__,
             access_token=access_token,
             telegram_id=telegram_id
         )
-        if old_characteristic:
-            old_characteristic = old_characteristic[0]
+        return old_characteristic[0] if old_characteristic else None
+
+    async def _generate_combined_from_batch(
+            self,
+            characteristic_types: list[type[S]],
+            batch_logs: Sequence[CharacteristicBatchLogSchema],
+            telegram_id: str,
+            access_token: str
+    ) -> tuple[dict[type[S], S], list[type[S]]]:
+        """
+        Несколько характеристик по одному батчу одним запросом:
+        сообщения передаются один раз, дальше — поля каждой характеристики
+        """
+        old_characteristics: list[S | None] = await asyncio.gather(*(
+            self._get_old_characteristic(characteristic_type, telegram_id, access_token)
+            for characteristic_type in characteristic_types
+        ))
+
+        # [ batch logs + old characteristics + fields instruction]
+        all_text: list[str] = [log.message + "\n" for log in batch_logs]
+        for characteristic_type, old_characteristic in zip(characteristic_types, old_characteristics):
+            cleaned: dict = clean_characteristic_json(old_characteristic or characteristic_type, generate=True)
+            all_text.append(
+                f"Текущая характеристика {characteristic_type.__name__}: "
+                + json.dumps(cleaned, ensure_ascii=False, indent=2)
+            )
+
+        return await self.assistant_service.generate_characteristics_combined(
+            input_query=' '.join(all_text),
+            characteristic_types=characteristic_types
+        )
+
+    async def _generate_from_batch(
+            self,
+            characteristic_type: type[S],
+            batch_logs: Sequence[CharacteristicBatchLogSchema],
+            telegram_id: str,
+            access_token: str
+    ) -> S:
+        """Новая характеристика по батчу и прошлой характеристике (только LLM, без записи в БД)"""
+        old_characteristic: S | None = await self._get_old_characteristic(
+            characteristic_type, telegram_id, access_token
+        )
 
         # [ batch logs + old characteristic + fields instruction]
         all_text: list[str] = [log.message + "\n" for log in batch_logs]
@@ -146,11 +276,66 @@ class CharacteristicService:
 
         combined_text: str = ' '.join(all_text)
 
-        new_characteristic: S = await self.assistant_service.generate_characteristic(
+        return await self.assistant_service.generate_characteristic(
             old_characteristic=combined_text,
             characteristic_type=characteristic_type
         )
-        await self.repo.append_characteristic(user_id=user_id, characteristic=new_characteristic, telegram_id=telegram_id)
+
+    async def typification_end_many(
+            self,
+            user_id: uuid.UUID,
+            answers: list[str],
+            characteristic_names: list[str],
+            access_token: str,
+            user_telegram_id: str
+    ) -> None:
+        """
+        ЗАКАНЧИВАЕТ ТИПИРОВАНИЕ по нескольким характеристикам:
+            — ответы передаются один раз, все характеристики — одним запросом
+            — не прошедшие валидацию генерируются по одной (typification_end)
+        """
+        if len(characteristic_names) < 2 or not config.LLM_COMBINED_GENERATION:
+            for characteristic_name in characteristic_names:
+                await self.typification_end(user_id, answers, characteristic_name, access_token, user_telegram_id)
+            return
+
+        characteristic_types: list[type[S]] = [
+            CharacteristicFormat.get_cls_from_schema_name(schema_name=characteristic_name)
+            for characteristic_name in characteristic_names
+        ]
+        old_profiles: list[S | None] = await asyncio.gather(*(
+            self._get_old_characteristic(characteristic_type, user_telegram_id, access_token)
+            for characteristic_type in characteristic_types
+        ))
+
+        assistant_request: dict = {
+            "answers": answers,
+            "characteristics": {
+                characteristic_type.__name__: clean_characteristic_json(old_profile or characteristic_type)
+                for characteristic_type, old_profile in zip(characteristic_types, old_profiles)
+            }
+        }
+
+        try:
+            generated, invalid = await self.assistant_service.generate_characteristics_combined(
+                input_query=json.dumps(assistant_request, ensure_ascii=False, indent=2),
+                characteristic_types=characteristic_types,
+                prompt=END_TYPIFICATION_COMBINED_PROMPT,
+                prompt_template="typification_end_combined"
+            )
+        except Exception as e:
+            logger.warning(f"Комбинированное типирование не удалось ({user_id}), генерация по схемам: {e}")
+            generated, invalid = {}, characteristic_types
+
+        await self.repo.append_characteristics(
+            user_id,
+            list(generated.values()),
+            telegram_id=user_telegram_id
+        )
+        for characteristic_type in invalid:
+            await self.typification_end(
+                user_id, answers, characteristic_type.__name__, access_token, user_telegram_id
+            )
 
     async def typification_end(
             self,
@@ -184,7 +369,8 @@ class CharacteristicService:
         profile: S = await self.assistant_service.get_response(
             input_query=json.dumps(assistant_request, ensure_ascii=False, indent=2),
             prompt=END_TYPIFICATION_PROMPT,
-            pydantic_model=pydantic_model
+            pydantic_model=pydantic_model,
+            prompt_template="typification_end"
         )
 
         await self.repo.append_characteristic(
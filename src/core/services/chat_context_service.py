@@ -0,0 +1,73 @@
+import logging
+from uuid import UUID
+
+from src.core import consts
+from src.core.services.cache_services.redis_service import RedisService
+from src.core.services.dependencies.task_service_dep import get_task_service
+from src.core.utils.tokens import TokenEstimator, token_estimator
+
+logger = logging.getLogger(__name__)
+
+
+class ChatContextService:
+    """
+    Контекст диалога для промпта в пределах бюджета токенов.
+
+    Окно — последние сообщения истории, сколько влезает в бюджет (после сводки).
+    Сообщения за окном сворачиваются в сводку фоновой задачей (fold_chat_history_job),
+    сводка лежит рядом с историей: chat:history:{user_id}:summary.
+    """
+
+    SUMMARY_TITLE = "Краткое содержание более раннего диалога с пользователем:\n"
+
+    def __init__(self, redis_service: RedisService, estimator: TokenEstimator = token_estimator):
+        self.redis_service = redis_service
+        self.estimator = estimator
+
+    def fit_window(self, messages: list[dict], summary: str | None, token_budget: int) -> int:
+        """Сколько последних сообщений влезает в бюджет вместе со сводкой"""
+        used: int = self.estimator.estimate(summary) if summary else 0
+        fitted: int = 0
+        for message in reversed(messages):
+            used += self.estimator.estimate(message["content"]) + self.estimator.MESSAGE_OVERHEAD
+            if used > token_budget:
+                break
+            fitted += 1
+
+        # окно начинается с реплики юзера — ответ без вопроса только путает модель
+        if fitted and messages[len(messages) - fitted]["role"] == "assistant":
+            fitted -= 1
+        return fitted
+
+    async def build_history(
+            self,
+            user_id: UUID,
+            token_budget: int = consts.CHAT_CONTEXT_TOKEN_BUDGET
+    ) -> list[dict]:
+        """
+        История для промпта (OpenAI messages): сводка + последние сообщения в пределах бюджета.
+        Если за окном набралось достаточно сообщений — ставит их сворачивание в сводку.
+        """
+        messages, summary = await self.redis_service.get_history_with_summary(
+            user_id,
+            max_messages=consts.CHAT_HISTORY_MAX_MESSAGES
+        )
+
+        fitted: int = self.fit_window(messages, summary, token_budget)
+        window: list[dict] = messages[len(messages) - fitted:] if fitted else []
+
+        if len(messages) - fitted >= consts.CHAT_SUMMARY_FOLD_MIN_MESSAGES:
+            await self._enqueue_fold(user_id)
+
+        if summary:
+            return [{"role": "system", "content": self.SUMMARY_TITLE + summary}, *window]
+        return window
+
+    @staticmethod
+    async def _enqueue_fold(user_id: UUID) -> None:
+        """Сворачивание не критично для ответа — ошибки очереди только логируются"""
+        try:
+            task_service = await get_task_service()
+            await task_service.enqueue_history_fold(user_id)
+        except Exception as e:
+            logger.warning(f"Не удалось поставить сворачивание истории {user_id}: {e}")
@@ -1,6 +1,14 @@
 from src.infrastructure.config.config import config
 from services.api_client.personalityGPT_api import PersonalityGPT_APIClient
 
+api_client = PersonalityGPT_APIClient(base_url=config.WEBHOOK_URL)
+
 
 def get_api_client() -> PersonalityGPT_APIClient:
-    return PersonalityGPT_APIClient(base_url=config.WEBHOOK_URL)
+    return api_client
+
+
+def set_api_client(client: PersonalityGPT_APIClient) -> None:
+    """Подменяет транспорт (in-process режим). Вызывается при старте бота, до обработки апдейтов"""
+    global api_client
+    api_client = client
@@ -1,6 +1,13 @@
 from src.core.services.assistant_service import AssistantService
+from src.core.services.dependencies.balance_service_dep import get_balance_service
+from src.core.services.dependencies.llm_response_cache_dep import get_llm_response_cache
+from src.core.services.dependencies.prompt_cache_stats_dep import get_prompt_cache_stats
 
 
 async def get_assistant_service() -> AssistantService:
     """Возвращает синглтон ассистента с клиентом ()"""
-    return AssistantService()
+    return AssistantService(
+        balance_service=get_balance_service(),
+        prompt_cache_stats=get_prompt_cache_stats(),
+        response_cache=get_llm_response_cache()
+    )
@@ -0,0 +1,11 @@
+from src.core.services.balance_service import BalanceService
+from src.core.services.dependencies.redis_service_dep import redis_client
+
+balance_service = BalanceService(
+    redis_client=redis_client
+)
+
+
+def get_balance_service() -> BalanceService:
+    """Возвращает синглтон — кэш баланса общий для всех AssistantService процесса"""
+    return balance_service
@@ -1,10 +1,12 @@
 from src.core.services.dependencies.api_client_dep import get_api_client
 from src.core.services.dependencies.redis_service_dep import get_redis_service
 from src.core.services.cache_services.cache_service import CacheService
+from src.infrastructure.config.config import config
 
 cache_service = CacheService(
     redis_service=get_redis_service(),
-    api_client=get_api_client()
+    api_client=get_api_client(),
+    use_redis_lock=config.CACHE_STAMPEDE_LOCK
 )
 
 
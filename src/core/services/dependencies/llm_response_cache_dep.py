@@ -0,0 +1,10 @@
+from src.core.services.cache_services.llm_response_cache import LLMResponseCache
+from src.core.services.dependencies.redis_service_dep import redis_client
+
+llm_response_cache = LLMResponseCache(
+    redis_client=redis_client
+)
+
+
+def get_llm_response_cache() -> LLMResponseCache:
+    return llm_response_cache
@@ -0,0 +1,11 @@
+from src.core.services.dependencies.redis_service_dep import redis_client
+from src.core.services.prompt_cache_stats import PromptCacheStats
+
+prompt_cache_stats = PromptCacheStats(
+    redis_client=redis_client
+)
+
+
+def get_prompt_cache_stats() -> PromptCacheStats:
+    """Возвращает синглтон — счётчики копятся со всех запросов процесса"""
+    return prompt_cache_stats
@@ -1,12 +1,18 @@
 from redis.asyncio import Redis
 
+from src.core.services.cache_services.local_cache import LocalCache
 from src.core.services.cache_services.redis_service import RedisService
+from src.infrastructure.config.config import config
 from src.infrastructure.config.redis_config import REDIS_POOL
 
 redis_client = Redis(connection_pool=REDIS_POOL)
 
 redis_service = RedisService(
-    redis_client=redis_client
+    redis_client=redis_client,
+    local_cache=LocalCache(
+        maxsize=config.LOCAL_CACHE_MAXSIZE,
+        ttl=config.LOCAL_CACHE_TTL
+    ) if config.LOCAL_CACHE_ENABLED else None
 )
 
 
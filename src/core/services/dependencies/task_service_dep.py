@@ -0,0 +1,30 @@
+import asyncio
+
+from arq import create_pool
+from arq.connections import RedisSettings
+
+from src.core.task_logic.task_service import TaskService
+from src.infrastructure.config.config import config
+
+task_service: TaskService | None = None
+_init_lock = asyncio.Lock()
+
+
+async def get_task_service() -> TaskService:
+    """Синглтон TaskService (пул arq создаётся при первом обращении)"""
+    global task_service
+    async with _init_lock:
+        if task_service is None:
+            arq_pool = await create_pool(
+                RedisSettings.from_dsn(config.ARQ_REDIS_URL),
+                default_queue_name=config.ARQ_REDIS_QUEUE
+            )
+            task_service = TaskService(arq_pool)
+    return task_service
+
+
+async def close_task_service() -> None:
+    global task_service
+    if task_service is not None:
+        await task_service.arq_pool.aclose()
+        task_service = None
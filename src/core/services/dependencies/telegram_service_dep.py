@@ -1,6 +1,9 @@
+from src.core.services.dependencies.redis_service_dep import redis_client
 from src.core.services.telegram_service import TelegramService
 
-telegram_service = TelegramService()
+telegram_service = TelegramService(
+    redis_client=redis_client
+)
 
 
 async def get_telegram_service():
@@ -0,0 +1,90 @@
+import asyncio
+import logging
+from collections import defaultdict
+
+from redis.asyncio import Redis
+
+logger = logging.getLogger(__name__)
+
+
+class PromptCacheStats:
+    """
+    Статистика префиксного кэша DeepSeek по шаблонам промптов.
+
+    usage.prompt_cache_hit_tokens / prompt_cache_miss_tokens копятся в памяти процесса
+    и пачкой сбрасываются в Redis (HINCRBY, общий счётчик всех процессов) — без round trip на каждый запрос.
+    Hit ratio шаблона: hit / (hit + miss), см. get_stats().
+    """
+
+    KEY_PREFIX = "llm:prompt_cache"
+
+    def __init__(self, redis_client: Redis, flush_every: int = 20):
+        self.redis = redis_client
+        self.flush_every = flush_every
+
+        self._pending: dict[str, dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self._pending_requests: int = 0
+        self._flush_task: asyncio.Task | None = None
+
+    def _get_key(self, template: str) -> str:
+        return f"{self.KEY_PREFIX}:{template}"
+
+    def record(self, template: str, usage) -> None:
+        """Учитывает usage запроса по шаблону template"""
+        if usage is None:
+            return
+
+        hit: int = getattr(usage, "prompt_cache_hit_tokens", None) or 0
+        miss: int = getattr(usage, "prompt_cache_miss_tokens", None) or 0
+
+        counters = self._pending[template]
+        counters["hit"] += hit
+        counters["miss"] += miss
+        counters["requests"] += 1
+
+        self._pending_requests += 1
+        if self._pending_requests >= self.flush_every:
+            self._schedule_flush()
+
+    def _schedule_flush(self) -> None:
+        if self._flush_task and not self._flush_task.done():
+            return
+        self._flush_task = asyncio.create_task(self.flush())
+
+    async def flush(self) -> None:
+        """Сбрасывает накопленное в Redis одним pipeline"""
+        if not self._pending:
+            return
+
+        pending, self._pending = self._pending, defaultdict(lambda: defaultdict(int))
+        self._pending_requests = 0
+
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for template, counters in pending.items():
+                    for field, value in counters.items():
+                        pipe.hincrby(self._get_key(template), field, value)
+                await pipe.execute()
+        except Exception as e:
+            logger.warning(f"Не удалось сохранить статистику кэша промптов: {e}")
+
+    async def get_stats(self) -> dict[str, dict[str, float]]:
+        """{template: {"hit", "miss", "requests", "hit_ratio"}} по всем процессам"""
+        await self.flush()
+
+        stats: dict[str, dict[str, float]] = {}
+        async for key in self.redis.scan_iter(match=f"{self.KEY_PREFIX}:*"):
+            counters: dict = await self.redis.hgetall(key)
+            hit, miss = int(counters.get("hit", 0)), int(counters.get("miss", 0))
+            stats[key.removeprefix(f"{self.KEY_PREFIX}:")] = {
+                "hit": hit,
+                "miss": miss,
+                "requests": int(counters.get("requests", 0)),
+                "hit_ratio": hit / (hit + miss) if hit + miss else 0.0,
+            }
+        return stats
+
+    async def close(self) -> None:
+        if self._flush_task and not self._flush_task.done():
+            await self._flush_task
+        await self.flush()
@@ -1,9 +1,11 @@
+import asyncio
 import io
 import logging
 from typing import Optional
 
-from deepgram import DeepgramClient
+from deepgram import AsyncDeepgramClient
 
+from src.core import consts
 from src.infrastructure.config.config import config
 
 logger = logging.getLogger(__name__)
@@ -14,6 +16,7 @@ class SpeechService:
     Сервис для распознавания речи с использованием Deepgram API (SDK v5+).
 
     Поддерживает pre-recorded аудио из байтов.
+    Клиент асинхронный: пока Deepgram распознаёт голосовое, event loop бота обслуживает других юзеров.
     """
 
     def __init__(
@@ -25,8 +28,13 @@ class SpeechService:
             punctuate: bool = True,
             paragraphs: bool = False,
             diarize: bool = False,
+            max_concurrency: int = consts.SPEECH_CONCURRENCY,
+            timeout_seconds: float = consts.SPEECH_TIMEOUT_SECONDS,
     ):
-        self.client = DeepgramClient(api_key=api_key)
+        self.client = AsyncDeepgramClient(api_key=api_key)
+
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.timeout_seconds = timeout_seconds
 
         self.default_options = {
             "model": default_model,
@@ -47,6 +55,8 @@ class SpeechService:
     ) -> str:
         """
         Распознавание речи из сырых байтов аудио (ogg, mp3, wav, pcm и т.д.).
+
+        Не больше max_concurrency запросов одновременно, общее ожидание (очередь + запрос) — timeout_seconds.
         """
         if not audio_bytes:
             raise ValueError("Пустой аудио буфер")
@@ -59,11 +69,13 @@ class SpeechService:
         options.update(override_options)
 
         try:
-            # В v5+ передаём байты напрямую в request (без {"buffer": ...})
-            response = self.client.listen.v1.media.transcribe_file(
-                request=audio_bytes,  # ← просто bytes
-                **options  # ← kwargs вместо отдельного словаря
-            )
+            async with asyncio.timeout(self.timeout_seconds):
+                async with self.semaphore:
+                    # В v5+ передаём байты напрямую в request (без {"buffer": ...})
+                    response = await self.client.listen.v1.media.transcribe_file(
+                        request=audio_bytes,  # ← просто bytes
+                        **options  # ← kwargs вместо отдельного словаря
+                    )
 
             # Структура ответа в v5+ почти та же
             if (
@@ -76,6 +88,10 @@ class SpeechService:
 
             return ""  # тишина или очень короткий файл
 
+        except TimeoutError:
+            logger.warning(f"Deepgram не ответил за {self.timeout_seconds} сек")
+            raise ValueError("Не удалось распознать аудио: превышено время ожидания")
+
         except Exception as e:
             logger.exception("Ошибка транскрипции Deepgram")
             raise ValueError(f"Не удалось распознать аудио: {str(e)}")
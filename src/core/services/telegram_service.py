@@ -1,20 +1,83 @@
+import asyncio
 import json
 import logging
+import os
+import socket
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass, field
 
 import aiohttp
 from aiogram.types import ReplyKeyboardMarkup, InlineKeyboardMarkup
+from redis.asyncio import Redis
 
+from src.core.utils.rate_limiter import TokenBucket, KeyedTokenBuckets
 from src.infrastructure.config.config import config
 
 logger = logging.getLogger(__name__)
 
 
+@dataclass
+class DeliveryMetrics:
+    """Счётчики доставки (для подбора лимитов и контроля рассылок)"""
+    sent: int = 0
+    failed: int = 0
+    rate_limited: int = 0  # ответы 429
+    _sent_at: deque = field(default_factory=lambda: deque(maxlen=10_000))
+
+    def mark_sent(self) -> None:
+        self.sent += 1
+        self._sent_at.append(time.monotonic())
+
+    def throughput(self, window: float = 60.0) -> float:
+        """Отправок в секунду за последние window секунд"""
+        border: float = time.monotonic() - window
+        return sum(1 for sent_at in self._sent_at if sent_at >= border) / window
+
+
 class TelegramService:
-    """Сервис для отправки сообщений через Telegram Bot API"""
+    """
+    Сервис для отправки сообщений через Telegram Bot API
 
-    def __init__(self):
+    — одна aiohttp сессия на процесс (keep-alive к api.telegram.org)
+    — token bucket: общий лимит бота (~30 msg/s) и лимит на чат (~1 msg/s)
+    — 429: ждём retry_after и повторяем
+    — notify/broadcast кладут сообщения в очередь Redis: переживают рестарт,
+      отправляет их run_delivery_worker (запущен в каждом процессе API)
+    """
+
+    OUTBOX_KEY = "telegram:outbox"
+    CONSUMERS_KEY = "telegram:outbox:consumers"
+    MAX_RETRIES = 3
+    LEASE_TTL = 30  # сек: консьюмер без продления лизы считается упавшим
+
+    def __init__(
+            self,
+            redis_client: Redis | None = None,
+            global_rate: float = config.TELEGRAM_GLOBAL_RATE,
+            chat_rate: float = config.TELEGRAM_CHAT_RATE,
+    ):
         """Инициализация сервиса"""
         self.api_url = f"{config.TELEGRAM_API_URL}{config.TELEGRAM_BOT_TOKEN}"
+        self.redis = redis_client
+
+        self._global_bucket = TokenBucket(rate=global_rate, capacity=global_rate)
+        self._chat_buckets = KeyedTokenBuckets(rate=chat_rate, capacity=1)
+        self._session: aiohttp.ClientSession | None = None
+        self.metrics = DeliveryMetrics()
+
+    async def _ensure_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(total=30)
+            )
+        return self._session
+
+    async def close(self) -> None:
+        if self._session:
+            await self._session.close()
+            self._session = None
 
     @staticmethod
     def _clean_html_text(text: str) -> str:
@@ -29,14 +92,17 @@ class TelegramService:
             text = text.replace(old, new)
         return text
 
-    async def send_message(
+    @staticmethod
+    def _serialize_markup(reply_markup: ReplyKeyboardMarkup | InlineKeyboardMarkup) -> str:
+        # Не включаем url, web_app и другие поля если они None
+        return reply_markup.model_dump_json(exclude_none=True)
+
+    def _build_send_data(
             self,
             user_telegram_id: str,
             message: str,
-            reply_markup: ReplyKeyboardMarkup | InlineKeyboardMarkup = None  # keyboard
-    ):
-        """Отправляет сообщение юзеру"""
-        url = f"{self.api_url}/sendMessage"
+            reply_markup: ReplyKeyboardMarkup | InlineKeyboardMarkup = None
+    ) -> dict:
         data = {
             "chat_id": user_telegram_id,
             "text": self._clean_html_text(message),
@@ -45,14 +111,65 @@ class TelegramService:
         }
 
         if reply_markup:
-            import json
-            data["reply_markup"] = json.dumps(reply_markup)
+            data["reply_markup"] = self._serialize_markup(reply_markup)
+        return data
+
+    # [ TRANSPORT ]
+    async def _call(self, method: str, data: dict) -> tuple[int, str]:
+        """
+        Запрос к Bot API под лимитами (чат + общий), с повтором на 429.
+        Возвращает (status, text ответа)
+        """
+        chat_bucket: TokenBucket = self._chat_buckets.get(str(data["chat_id"]))
+        session: aiohttp.ClientSession = await self._ensure_session()
+
+        for attempt in range(self.MAX_RETRIES + 1):
+            await chat_bucket.acquire()
+            await self._global_bucket.acquire()
+
+            async with session.post(f"{self.api_url}/{method}", data=data) as response:
+                response_text: str = await response.text()
+                if response.status != 429:
+                    if response.status == 200:
+                        self.metrics.mark_sent()
+                    else:
+                        self.metrics.failed += 1
+                    return response.status, response_text
+
+            self.metrics.rate_limited += 1
+            retry_after: float = self._get_retry_after(response_text)
+            logger.warning(f"Telegram 429 ({method}, chat {data['chat_id']}): retry_after={retry_after}")
 
-        async with aiohttp.ClientSession() as session:
-            async with session.post(url, data=data) as response:
-                if response.status == 403:
-                    response_text = await response.text()
-                    raise ValueError(f"Ошибка отправки сообщения в Telegram: {response.status} - {response_text}")
+            # 429 может быть и за общий лимит бота — притормаживаем все отправки процесса
+            chat_bucket.pause(retry_after)
+            self._global_bucket.pause(retry_after)
+            if attempt == self.MAX_RETRIES:
+                break
+
+        self.metrics.failed += 1
+        return 429, response_text
+
+    @staticmethod
+    def _get_retry_after(response_text: str) -> float:
+        try:
+            return float(json.loads(response_text)["parameters"]["retry_after"])
+        except (ValueError, KeyError, TypeError):
+            return 1.0
+
+    # [ SEND ]
+    async def send_message(
+            self,
+            user_telegram_id: str,
+            message: str,
+            reply_markup: ReplyKeyboardMarkup | InlineKeyboardMarkup = None  # keyboard
+    ):
+        """Отправляет сообщение юзеру"""
+        status, response_text = await self._call(
+            "sendMessage",
+            self._build_send_data(user_telegram_id, message, reply_markup)
+        )
+        if status == 403:
+            raise ValueError(f"Ошибка отправки сообщения в Telegram: {status} - {response_text}")
 
     async def edit_message(
             self,
@@ -63,7 +180,6 @@ class TelegramService:
             parse_mode: str = "HTML"
     ):
         """Редактирует сообщение"""
-        url: str = f"{self.api_url}/editMessageText"
         data = {
             "chat_id": user_telegram_id,
             "message_id": old_message_id,
@@ -72,24 +188,153 @@ class TelegramService:
         }
 
         if reply_markup:
-            # Ручная сериализация, чтобы избежать проблем с None значениями
-            keyboard_data = {
-                "inline_keyboard": [
-                    [
-                        {
-                            "text": button.text,
-                            "callback_data": button.callback_data
-                            # Не включаем url, web_app и другие поля если они None
-                        }
-                        for button in row
-                    ]
-                    for row in reply_markup.inline_keyboard
-                ]
-            }
-            data["reply_markup"] = json.dumps(keyboard_data)
-
-        async with aiohttp.ClientSession() as session:
-            async with session.post(url, data=data) as response:
-                if response.status != 200:
-                    response_text = await response.text()
-                    raise ValueError(f"Ошибка отправки сообщения в Telegram: {response.status} - {response_text}")
+            data["reply_markup"] = self._serialize_markup(reply_markup)
+
+        status, response_text = await self._call("editMessageText", data)
+        if status != 200:
+            raise ValueError(f"Ошибка отправки сообщения в Telegram: {status} - {response_text}")
+
+    # [ DURABLE QUEUE ]
+    async def notify(
+            self,
+            user_telegram_id: str,
+            message: str,
+            reply_markup: ReplyKeyboardMarkup | InlineKeyboardMarkup = None
+    ) -> None:
+        """Уведомление через очередь (без Redis — сразу отправка)"""
+        if self.redis is None:
+            await self.send_message(user_telegram_id, message, reply_markup)
+            return
+
+        await self.redis.lpush(
+            self.OUTBOX_KEY,
+            json.dumps(self._build_send_data(user_telegram_id, message, reply_markup), ensure_ascii=False)
+        )
+
+    async def broadcast(self, user_telegram_ids: list[str], message: str, batch_size: int = 500) -> int:
+        """Рассылка одного сообщения многим юзерам: пачками в очередь. Возвращает число поставленных"""
+        if self.redis is None:
+            for tg_id in user_telegram_ids:
+                await self.notify(tg_id, message)
+            return len(user_telegram_ids)
+
+        for i in range(0, len(user_telegram_ids), batch_size):
+            batch: list[str] = [
+                json.dumps(self._build_send_data(tg_id, message), ensure_ascii=False)
+                for tg_id in user_telegram_ids[i:i + batch_size]
+            ]
+            await self.redis.lpush(self.OUTBOX_KEY, *batch)
+        return len(user_telegram_ids)
+
+    def _get_processing_key(self, consumer: str) -> str:
+        return f"{self.OUTBOX_KEY}:processing:{consumer}"
+
+    def _get_lease_key(self, consumer: str) -> str:
+        return f"{self.OUTBOX_KEY}:lease:{consumer}"
+
+    async def _recover_stale_consumers(self) -> None:
+        """Возвращает в очередь processing-списки консьюмеров, чья лиза истекла (процесс упал/остановлен)"""
+        for consumer in await self.redis.smembers(self.CONSUMERS_KEY):
+            if await self.redis.exists(self._get_lease_key(consumer)):
+                continue
+
+            processing_key: str = self._get_processing_key(consumer)
+            recovered: int = 0
+            while await self.redis.lmove(processing_key, self.OUTBOX_KEY, "RIGHT", "RIGHT"):
+                recovered += 1
+            await self.redis.srem(self.CONSUMERS_KEY, consumer)
+            if recovered:
+                logger.info(f"Очередь уведомлений: {recovered} сообщений консьюмера {consumer} возвращено")
+
+    async def _heartbeat(self, consumer: str) -> None:
+        """Продлевает лизу консьюмера и подбирает сообщения упавших"""
+        while True:
+            try:
+                await self.redis.set(self._get_lease_key(consumer), 1, ex=self.LEASE_TTL)
+                await self._recover_stale_consumers()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Не удалось продлить лизу консьюмера {consumer}: {e}")
+            await asyncio.sleep(self.LEASE_TTL / 3)
+
+    async def run_delivery_worker(self, consumer: str | None = None, concurrency: int = 30) -> None:
+        """
+        Отправляет сообщения из очереди.
+
+        Надёжная очередь: сообщение перекладывается в processing-список консьюмера (LMOVE)
+        и удаляется из него только после отправки. У каждого процесса свой консьюмер с лизой (heartbeat):
+        списки консьюмеров с истёкшей лизой возвращаются в очередь, списки живых — не трогаются.
+        """
+        if self.redis is None:
+            return
+
+        consumer = consumer or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        processing_key: str = self._get_processing_key(consumer)
+
+        await self.redis.set(self._get_lease_key(consumer), 1, ex=self.LEASE_TTL)
+        await self.redis.sadd(self.CONSUMERS_KEY, consumer)
+        heartbeat = asyncio.create_task(self._heartbeat(consumer))
+
+        semaphore = asyncio.Semaphore(concurrency)
+        in_flight: set[asyncio.Task] = set()
+
+        async def deliver(raw: str) -> None:
+            try:
+                try:
+                    data: dict = json.loads(raw)
+                    status, response_text = await self._call("sendMessage", data)
+                    if status != 200:
+                        logger.warning(f"Уведомление {data['chat_id']} не доставлено: {status} - {response_text}")
+                except asyncio.CancelledError:
+                    # остановка: не отправлено — остаётся в processing до восстановления
+                    raise
+                except Exception as e:
+                    logger.error(f"Ошибка доставки уведомления: {e}")
+                # отправлено или окончательная ошибка — из processing убираем
+                await self.redis.lrem(processing_key, 1, raw)
+            finally:
+                semaphore.release()
+
+        try:
+            while True:
+                await semaphore.acquire()
+                try:
+                    raw: str | None = await self.redis.blmove(
+                        self.OUTBOX_KEY, processing_key, timeout=5, src="RIGHT", dest="LEFT"
+                    )
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    semaphore.release()
+                    logger.warning(f"Очередь уведомлений недоступна: {e}")
+                    await asyncio.sleep(1)
+                    continue
+
+                if raw is None:
+                    semaphore.release()
+                    continue
+
+                task = asyncio.create_task(deliver(raw))
+                in_flight.add(task)
+                task.add_done_callback(in_flight.discard)
+        finally:
+            # незавершённые останутся в processing: без лизы их вернёт в очередь любой живой консьюмер
+            heartbeat.cancel()
+            for task in in_flight:
+                task.cancel()
+            await asyncio.gather(heartbeat, *in_flight, return_exceptions=True)
+            try:
+                await self.redis.delete(self._get_lease_key(consumer))
+            except Exception as e:
+                logger.warning(f"Не удалось снять лизу консьюмера {consumer}: {e}")
+
+    async def delivery_stats(self) -> dict:
+        """Метрики доставки + размер очереди"""
+        return {
+            "sent": self.metrics.sent,
+            "failed": self.metrics.failed,
+            "rate_limited": self.metrics.rate_limited,
+            "throughput_per_sec": round(self.metrics.throughput(), 2),
+            "queued": await self.redis.llen(self.OUTBOX_KEY) if self.redis is not None else 0,
+        }
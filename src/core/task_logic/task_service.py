@@ -1,13 +1,68 @@
+import uuid
 from enum import Enum
 
 from arq import ArqRedis
 
+from src.core.enums.user import TALKING_MODES
+from src.core.schemas.user_schemas import UserSchema
+
 
 class ARQ_JOBS(str, Enum):
     summary_logs = "summary_jobs"
+    summary_logs_chunk = "summarize_daily_logs_chunk"
+    generate_characteristics = "generate_characteristics_job"
+    change_user_name = "change_user_name_job"
+    fold_chat_history = "fold_chat_history_job"
 
 
 class TaskService:
     def __init__(self, arq_pool: ArqRedis):
         self.arq_pool = arq_pool
 
+    async def enqueue_characteristic_generation(
+            self,
+            user: UserSchema,
+            message: str,
+            characteristic_names: list[str],
+            change_name: bool,
+            access_token: str,
+            talk_mode: TALKING_MODES
+    ) -> None:
+        """
+        Задачи после check_in: генерация характеристик с набравшимся батчем (одна задача на все схемы) + смена имени.
+
+        Job id — по check_in (uuid на вызов), не по тексту: одинаковые сообщения подряд ("да", "ок")
+        — разные check_in, и задача с набравшимся батчем не отбрасывается arq как повтор.
+        """
+        check_in_id: str = str(uuid.uuid4())  # чекпоинт готовых схем и уведомление
+
+        if change_name:
+            await self.arq_pool.enqueue_job(
+                ARQ_JOBS.change_user_name.value,
+                str(user.id),
+                user.telegram_id,
+                message,
+                _job_id=f"change_name:{user.id}:{check_in_id}",
+            )
+
+        if not characteristic_names:
+            return
+
+        await self.arq_pool.enqueue_job(
+            ARQ_JOBS.generate_characteristics.value,
+            str(user.id),
+            user.telegram_id,
+            characteristic_names,
+            access_token,
+            talk_mode.value,
+            check_in_id,
+            _job_id=f"generation:{user.id}:{check_in_id}",
+        )
+
+    async def enqueue_history_fold(self, user_id: uuid.UUID) -> None:
+        """Сворачивание старой истории диалога в сводку (одна задача на юзера в очереди)"""
+        await self.arq_pool.enqueue_job(
+            ARQ_JOBS.fold_chat_history.value,
+            str(user_id),
+            _job_id=f"fold_history:{user_id}",
+        )
@@ -0,0 +1,47 @@
+import logging
+import uuid
+
+from src.core import consts
+from src.core.services.assistant_service import AssistantService
+from src.core.services.cache_services.redis_service import RedisService
+from src.core.services.chat_context_service import ChatContextService
+from src.core.services.dependencies.assistant_service_dep import get_assistant_service
+from src.core.services.dependencies.redis_service_dep import get_redis_service
+
+logger = logging.getLogger(__name__)
+
+
+async def fold_chat_history_job(ctx, user_id: str):
+    """
+    [ сворачивание истории диалога ] — сообщения за окном контекста дописываются в сводку юзера.
+
+    Инкрементально: LLM получает прошлую сводку + только новые выпавшие из окна сообщения,
+    затем они удаляются из хвоста истории (новая сводка и удаление — одним Lua скриптом,
+    только если хвост не изменился за время генерации сводки).
+    Ставится ChatContextService.build_history, одна задача на юзера в очереди (job id).
+    """
+    redis_service: RedisService = get_redis_service()
+    assistant_service: AssistantService = await get_assistant_service()
+    context_service = ChatContextService(redis_service)
+    user_uuid = uuid.UUID(user_id)
+
+    messages, summary = await redis_service.get_history_with_summary(
+        user_uuid,
+        max_messages=consts.CHAT_HISTORY_MAX_MESSAGES
+    )
+    fitted: int = context_service.fit_window(messages, summary, consts.CHAT_CONTEXT_TOKEN_BUDGET)
+    to_fold: list[dict] = messages[:len(messages) - fitted]
+
+    if len(to_fold) < consts.CHAT_SUMMARY_FOLD_MIN_MESSAGES:
+        return
+
+    new_summary: str = await assistant_service.summarize_chat_history(summary, to_fold)
+    if not new_summary:
+        logger.warning(f"Пустая сводка истории для {user_id}, сворачивание пропущено")
+        return
+
+    if not await redis_service.fold_history(user_uuid, folded=to_fold, summary=new_summary):
+        # хвост срезан/изменён, пока писалась сводка — свернём заново при следующем ходе
+        logger.info(f"История {user_id} изменилась во время сворачивания, сводка не сохранена")
+        return
+    logger.info(f"История {user_id}: свёрнуто {len(to_fold)} сообщений")
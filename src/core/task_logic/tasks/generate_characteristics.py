@@ -0,0 +1,162 @@
+import asyncio
+import logging
+import uuid
+from typing import Type
+
+from arq import Retry
+
+from src.core import consts
+from src.core.enums.user import TALKING_MODES
+from src.core.services.assistant_service import AssistantService
+from src.core.services.cache_services.cache_service import CacheService
+from src.core.services.characteristic_service import CharacteristicService
+from src.core.services.dependencies.assistant_service_dep import get_assistant_service
+from src.core.services.dependencies.cache_service_dep import get_cache_service
+from src.core.services.dependencies.telegram_service_dep import get_telegram_service
+from src.core.services.service_container import get_session
+from src.core.services.telegram_service import TelegramService
+from src.core.utils.funcs import get_characteristics_raw_most_diff
+from src.infrastructure.database.models.base import S
+from src.infrastructure.database.repository.characteristic_repo import CharacteristicRepository, \
+    get_schema_type_from_name
+from src.infrastructure.database.repository.user_repo import UserRepository
+
+logger = logging.getLogger(__name__)
+
+# лимит одновременных генераций на воркер (каждая — многосекундный запрос к LLM), общий для всех задач
+_generation_semaphore = asyncio.Semaphore(consts.GENERATION_CONCURRENCY)
+
+GENERATION_MAX_TRIES = 3
+NOTIFIED_KEY_TTL = 3600
+
+
+async def generate_characteristics_job(
+        ctx,
+        user_id: str,
+        telegram_id: str,
+        characteristic_names: list[str],
+        access_token: str,
+        talk_mode: str,
+        check_in_id: str
+):
+    """
+    Генерация характеристик после check_in (генерация + уведомление) — одна задача на сообщение.
+    Сообщение уже в батчах (записано в транзакции check_in), ставятся только схемы с набравшимся батчем.
+
+    — схемы генерируются параллельно (лимит на юзера + общий лимит воркера)
+    — запись одной транзакцией, одна инвалидация кэша, одно уведомление
+    — задачи одного юзера выполняются по очереди (Redis лок): батч не генерируется дважды
+    — при ошибке повторяются только упавшие схемы (готовые отмечаются в Redis)
+    """
+    cache_service: CacheService = await get_cache_service()
+    redis = cache_service.redis_service.redis
+    done_key: str = f"generation:done:{check_in_id}"
+
+    done: set[str] = set(await redis.smembers(done_key))
+    schema_types: list[Type[S]] = []
+    for characteristic_name in characteristic_names:
+        schema_type: Type[S] | None = get_schema_type_from_name(characteristic_name)
+        if schema_type is None:
+            logger.error(f"Неизвестная характеристика {characteristic_name} (юзер {user_id})")
+        elif characteristic_name not in done:
+            schema_types.append(schema_type)
+
+    if not schema_types:
+        return
+
+    job_try: int = ctx.get("job_try", 1)
+    try:
+        async with redis.lock(f"lock:generation:{user_id}", timeout=300, blocking_timeout=240):
+            async with get_session() as session:
+                characteristic_service = CharacteristicService(
+                    repo=CharacteristicRepository(session, cache_service),
+                    assistant_service=await get_assistant_service()
+                )
+                generated, failed = await characteristic_service.generate_characteristics(
+                    user_id=uuid.UUID(user_id),
+                    schema_types=schema_types,
+                    telegram_id=telegram_id,
+                    access_token=access_token,
+                    talk_mode=TALKING_MODES(talk_mode),
+                    llm_semaphore=_generation_semaphore
+                )
+    except Exception as e:
+        logger.exception(f"Ошибка генерации характеристик для {user_id} (попытка {job_try})")
+        if job_try < GENERATION_MAX_TRIES:
+            raise Retry(defer=job_try * 15) from e
+        raise
+
+    if generated:
+        await redis.sadd(done_key, *[type(characteristic).__name__ for characteristic in generated])
+        await redis.expire(done_key, NOTIFIED_KEY_TTL)
+
+        try:
+            await _notify_about_update(
+                telegram_id, type(generated[0]).__name__, access_token, check_in_id, cache_service
+            )
+        except Exception:
+            # характеристики уже сохранены — уведомление не повод перезапускать генерацию
+            logger.exception(f"Не удалось уведомить {telegram_id} об обновлении характеристик")
+
+    if failed:
+        logger.error(f"Не сгенерированы {[schema.__name__ for schema in failed]} для {user_id} (попытка {job_try})")
+        if job_try < GENERATION_MAX_TRIES:
+            raise Retry(defer=job_try * 15)
+
+
+async def _notify_about_update(
+        telegram_id: str,
+        characteristic_name: str,
+        access_token: str,
+        check_in_id: str,
+        cache_service: CacheService
+) -> None:
+    """[ только одно уведомление за check_in ]"""
+    is_first: bool = await cache_service.redis_service.redis.set(
+        f"generation:notified:{check_in_id}", 1, nx=True, ex=NOTIFIED_KEY_TTL
+    )
+    if not is_first:
+        return
+
+    assistant_service: AssistantService = await get_assistant_service()
+    telegram_service: TelegramService = await get_telegram_service()
+
+    if characteristic_name in ["MBTISchema", "HollandCodesSchema", "HexacoSchema"]:
+        await telegram_service.notify(
+            message=f"<b>твой тип личности стал точнее з:</b>",
+            user_telegram_id=telegram_id
+        )
+        return
+
+    characteristics_raw: list[S] = await cache_service.get_characteristic_row(
+        access_token,
+        telegram_id,
+        characteristic_name=characteristic_name,
+    )
+    percent_diff, diff_type, field_name = get_characteristics_raw_most_diff(characteristics_raw)
+
+    message_text = await assistant_service.generate_telegram_message_characteristic_diff(
+        str(percent_diff) + diff_type + field_name
+    )
+    await telegram_service.notify(
+        message=f"{message_text}",
+        user_telegram_id=telegram_id
+    )
+
+
+async def change_user_name_job(ctx, user_id: str, telegram_id: str, message: str):
+    """[ смена имени юзера ] — имя извлекается из сообщения и последних реплик"""
+    cache_service: CacheService = await get_cache_service()
+    assistant_service: AssistantService = await get_assistant_service()
+
+    history: list[dict] = await cache_service.redis_service.get_history(
+        user_id=uuid.UUID(user_id),
+        max_messages=5
+    )
+    history_str: str = "".join([history_message["content"] for history_message in history])
+
+    new_name: str = await assistant_service.extract_user_name(message + history_str)
+
+    async with get_session() as session:
+        await UserRepository(session).update(uuid.UUID(user_id), real_name=new_name)
+    await cache_service.redis_service.invalidate_user_profile(telegram_id)
@@ -1,67 +1,165 @@
+import asyncio
 import datetime as dt
 import logging
 import uuid
 
+from arq import Retry
+
 from src.core import consts
 from src.core.schemas.assistant_response import SummaryResponseSchema
 from src.core.services.assistant_service import AssistantService
-from src.core.services.service_container import get_service_container
+from src.core.services.cache_services.redis_service import RedisService
+from src.core.services.service_container import get_service_container, get_session
+from src.core.services.telegram_service import TelegramService
+from src.core.task_logic.task_service import ARQ_JOBS
 from src.infrastructure.database.repository.user_repo import UserRepository
 
 logger = logging.getLogger(__name__)
 
+# общий лимит запросов к LLM на воркер (все чанки, выполняющиеся параллельно)
+_llm_semaphore = asyncio.Semaphore(consts.SUMMARY_LLM_CONCURRENCY)
+
+NOTIFIED_KEY_TTL = 86400 * 2
+
+
+def _notified_key(day: dt.date) -> str:
+    """Чекпоинт: юзеры, которым уже отправлено уведомление о записи за день"""
+    return f"summary:{day.isoformat()}:notified"
+
 
 async def summarize_daily_logs(ctx):
     """
-    Ежедневная задача: сводка логов за вчера для активных пользователей.
-    Запускается в 00:00.
-    """
+    Ежедневная задача: сводка логов за день для активных пользователей.
+    Запускается в 23:55 МСК.
 
+    Координатор: делит активных юзеров на чанки и ставит по arq задаче на чанк.
+    Job id чанка детерминирован (день + первый юзер), поэтому повторный запуск не дублирует задачи.
+    """
     logger.info("Cron-задача summarize_daily_logs запущена!")
 
     today = dt.date.today()
 
-    logs_size = consts.MAX_LOGS_SIZE
-    max_chars = consts.MAX_CHARS
+    async with get_session() as session:
+        active_users: list[tuple[uuid.UUID, str]] = await UserRepository(session).get_active_users(today)
+
+    chunk_size: int = consts.SUMMARY_CHUNK_SIZE
+    chunks: list[list[tuple[uuid.UUID, str]]] = [
+        active_users[i:i + chunk_size] for i in range(0, len(active_users), chunk_size)
+    ]
+
+    for chunk in chunks:
+        await ctx["redis"].enqueue_job(
+            ARQ_JOBS.summary_logs_chunk.value,
+            today.isoformat(),
+            [(str(user_id), telegram_id) for user_id, telegram_id in chunk],
+            _job_id=f"summary:{today.isoformat()}:{chunk[0][0]}",
+        )
+
+    logger.info(f"summarize_daily_logs: {len(active_users)} юзеров, {len(chunks)} чанков")
 
-    records: list[tuple[uuid.UUID, str, str]] = []
-    telegram_ids: list[str] = []
+
+async def summarize_daily_logs_chunk(ctx, day_iso: str, users: list[tuple[str, str]]):
+    """
+    Сводка логов за день для чанка юзеров.
+
+    Идемпотентно и с чекпоинтами, повтор продолжает с места падения:
+        — запись в дневник одна на юзера в день (ON CONFLICT DO NOTHING), у кого она уже есть — не суммаризируем
+        — уведомленные юзеры отмечаются в Redis и повторно не получают сообщение
+    """
+    day: dt.date = dt.date.fromisoformat(day_iso)
+    telegram_ids: dict[uuid.UUID, str] = {uuid.UUID(user_id): telegram_id for user_id, telegram_id in users}
 
     async with get_service_container() as container:
         user_repo: UserRepository = await container.get_user_repo()
         assistant_service: AssistantService = await container.assistant_service
-        redis_service = await container.redis_service
-        telegram_service = await container.telegram_service
+        redis_service: RedisService = await container.redis_service
+        telegram_service: TelegramService = await container.telegram_service
+
+        user_ids: list[uuid.UUID] = list(telegram_ids)
+        done: set[uuid.UUID] = await user_repo.get_users_with_diary(user_ids, day)
 
         user_logs: dict[uuid.UUID, list[tuple[str, str]]] = await user_repo.get_active_user_logs(
-            date_filter=today,
-            max_logs_per_user=logs_size,
-            max_chars=max_chars
+            date_filter=day,
+            max_logs_per_user=consts.MAX_LOGS_SIZE,
+            max_chars=consts.MAX_CHARS,
+            user_ids=[user_id for user_id in user_ids if user_id not in done]
         )  # user_id: [(log, str_time_hh_mm), ...]
 
-        for user_id, logs_list in user_logs.items():
-            logs_text = ' '.join([f"{time_text}: {log_text}" for log_text, time_text in logs_list])
+        results = await asyncio.gather(
+            *(
+                _summarize_user(user_id, logs_list, day, assistant_service)
+                for user_id, logs_list in user_logs.items()
+            ),
+            return_exceptions=True
+        )
+
+        failed: int = 0
+        for user_id, result in zip(user_logs.keys(), results):
+            if isinstance(result, Exception):
+                failed += 1
+                logger.error(f"Не удалось сделать сводку для {user_id}", exc_info=result)
+            else:
+                done.add(user_id)
+
+        await _notify_users(
+            [telegram_ids[user_id] for user_id in done],
+            day,
+            redis_service,
+            telegram_service
+        )
 
-            summary_text: SummaryResponseSchema = await assistant_service.summarize_user_daily_logs(
-                user_logs=logs_text
-            )
+    if failed:
+        # arq повторит чанк, готовые юзеры будут пропущены
+        raise Retry(defer=ctx.get("job_try", 1) * 60)
 
-            records.append(
-                (user_id, summary_text.summary_text, summary_text.context_text)
-            )
 
-            user = await user_repo.get_user(user_id)
-            telegram_ids.append(user.telegram_id)
+async def _summarize_user(
+        user_id: uuid.UUID,
+        logs_list: list[tuple[str, str]],
+        day: dt.date,
+        assistant_service: AssistantService
+) -> None:
+    """Сводка одного юзера (LLM под общим лимитом) + запись в дневник в своей сессии"""
+    logs_text = ' '.join([f"{time_text}: {log_text}" for log_text, time_text in logs_list])
+
+    async with _llm_semaphore:
+        summary_text: SummaryResponseSchema = await assistant_service.summarize_user_daily_logs(
+            user_logs=logs_text
+        )
 
-        await user_repo.bulk_create_diary_records(
-            records
+    async with get_session() as session:
+        await UserRepository(session).create_diary_record(
+            user_id=user_id,
+            text_content=summary_text.summary_text,
+            context_text=summary_text.context_text,
+            day=day
         )
 
-        # [ рассылка о новой записи ]
-        for tg_id in telegram_ids:
-            await telegram_service.send_message(
-                user_telegram_id=tg_id,
-                message="у вас появилась новая запись в дневнике! ^^"
-            )
 
-        await redis_service.invalidate_all_diaries()
+async def _notify_users(
+        telegram_ids: list[str],
+        day: dt.date,
+        redis_service: RedisService,
+        telegram_service: TelegramService
+) -> None:
+    """[ рассылка о новой записи ] — через очередь уведомлений, каждому юзеру не больше одного раза за день"""
+    if not telegram_ids:
+        return
+
+    key: str = _notified_key(day)
+    for tg_id in telegram_ids:
+        await redis_service.invalidate_diary(tg_id)
+
+    already_notified: list[int] = await redis_service.redis.smismember(key, telegram_ids)
+    to_notify: list[str] = [
+        tg_id for tg_id, notified in zip(telegram_ids, already_notified) if not notified
+    ]
+    if not to_notify:
+        return
+
+    await telegram_service.broadcast(
+        to_notify,
+        message="у вас появилась новая запись в дневнике! ^^"
+    )
+    await redis_service.redis.sadd(key, *to_notify)
+    await redis_service.redis.expire(key, NOTIFIED_KEY_TTL)
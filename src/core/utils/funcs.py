@@ -5,6 +5,7 @@ from pydantic import BaseModel
 
 from src.core.schemas.user_schemas import UserTelegramDataSchema
 from src.infrastructure.database.models.base import S
+from src.infrastructure.database.schema_registry import EXCLUDED_FIELDS, SchemaMeta, get_schema_meta
 
 
 async def get_telegram_schema_from_data(user: User) -> UserTelegramDataSchema:
@@ -34,11 +35,37 @@ def clean_characteristic_json(
 
     - Если передан экземпляр → использует реальные значения (None → "неизвестно")
     - Если передан класс схемы → все поля считаются "неизвестно"
+
+    Поля и описания схем характеристик берутся из реестра (посчитаны при импорте),
+    значения — getattr без model_dump (в схемах характеристик только плоские поля),
+    кроме схем со своим model_dump.
     """
-    exclude = {
-        "id", "user_id", "created_at", "updated_at",
-        "telegram_id", "accuracy_percent", "GROUP"
+    is_class: bool = isinstance(schema_instance, type) and issubclass(schema_instance, BaseModel)
+    meta: SchemaMeta | None = get_schema_meta(schema_instance if is_class else schema_instance.__class__)
+    if meta is None:
+        return _clean_characteristic_json_reflective(schema_instance, generate)
+
+    if is_class:
+        return {field.name: f"None — {field.description}" for field in meta.fields}
+
+    if meta.custom_dump:
+        data: dict[str, Any] = schema_instance.model_dump(exclude_none=False)
+        values = (data.get(field.name) for field in meta.fields)
+    else:
+        values = (getattr(schema_instance, field.name) for field in meta.fields)
+
+    return {
+        field.name: f"{'None' if value is None else value} — {field.description}"
+        for field, value in zip(meta.fields, values)
     }
+
+
+def _clean_characteristic_json_reflective(
+        schema_instance: S | Type[S],
+        generate: bool = False
+) -> dict[str, str]:
+    """clean_characteristic_json для схем вне реестра — обход model_fields на каждый вызов"""
+    exclude = set(EXCLUDED_FIELDS)
     if generate:
         exclude.update("records")
         exclude.update("SOCIONICS_BANNED_FIELDS")
@@ -58,7 +85,7 @@ def clean_characteristic_json(
         if field_name in exclude:
             continue
 
-        description = getattr(field_info, "description", "").strip()
+        description = (getattr(field_info, "description", "") or "").strip()
         if not description:
             description = field_name.replace("_", " ").title()
 
@@ -74,22 +101,11 @@ def clean_characteristic_json(
     return result
 
 
-def clean_characteristics_json(characteristics: dict[str, dict[str, Any]]) -> str:
-    """очищает схемы для красивого запроса ассистенту"""
-    text: str = ""
-
-    for schema_name, characteristic in characteristics.items():
-        # Заголовок схемы
-        text += f"{schema_name}:\n"
-
-        # поле: значение — описание
-        for field_name, formatted_value in characteristic.items():
-            text += f"{field_name}: {formatted_value}\n"
-        text += "\n"
-
-    text = text.rstrip()
-
-    return text
+def render_characteristic_block(schema_name: str, characteristic: dict[str, Any]) -> str:
+    """Блок одной схемы для запроса ассистенту: заголовок + "поле: значение — описание" построчно"""
+    lines: list[str] = [f"{schema_name}:"]
+    lines.extend(f"{field_name}: {formatted_value}" for field_name, formatted_value in characteristic.items())
+    return "\n".join(lines)
 
 
 def get_characteristics_raw_most_diff(characteristics_raw: list[S]) -> tuple[float, str, str] | None:
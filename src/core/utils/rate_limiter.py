@@ -0,0 +1,68 @@
+import asyncio
+import time
+from collections import OrderedDict
+
+
+class TokenBucket:
+    """
+    Token bucket: в среднем rate операций в секунду, подряд — не больше capacity.
+    acquire() ждёт, пока появится токен.
+    """
+
+    def __init__(self, rate: float, capacity: float = 1.0):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens: float = capacity
+        self.updated_at: float = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now: float = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def pause(self, seconds: float) -> None:
+        """Блокирует бакет на seconds (например, retry_after от API)"""
+        self._refill()
+        self.tokens = min(self.tokens, 0.0) - seconds * self.rate
+
+    @property
+    def is_idle(self) -> bool:
+        """Бакет полон — его можно выбросить без потери состояния"""
+        self._refill()
+        return self.tokens >= self.capacity
+
+
+class KeyedTokenBuckets:
+    """Отдельный TokenBucket на ключ (например, на чат), неактивные бакеты вытесняются"""
+
+    def __init__(self, rate: float, capacity: float = 1.0, max_keys: int = 10_000):
+        self.rate = rate
+        self.capacity = capacity
+        self.max_keys = max_keys
+        self._buckets: OrderedDict[str, TokenBucket] = OrderedDict()
+
+    def get(self, key: str) -> TokenBucket:
+        bucket: TokenBucket | None = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(self.rate, self.capacity)
+            self._evict()
+        self._buckets.move_to_end(key)
+        return bucket
+
+    def _evict(self) -> None:
+        if len(self._buckets) <= self.max_keys:
+            return
+        for key in [key for key, bucket in self._buckets.items() if bucket.is_idle]:
+            del self._buckets[key]
+            if len(self._buckets) <= self.max_keys:
+                break
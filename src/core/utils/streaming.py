@@ -0,0 +1,141 @@
+import asyncio
+import re
+from typing import AsyncIterator, Awaitable, Callable, TypeVar
+
+T = TypeVar("T")
+
+# callback стриминга: получает очередной кусок текста ответа
+OnDelta = Callable[[str], Awaitable[None]]
+
+
+class JsonFieldStream:
+    """
+    Достаёт значение строкового поля из JSON, который приходит кусками (stream ответа LLM).
+
+    Модель отвечает JSON'ом ({"classifications": [...], "user_answer": "..."}),
+    а юзеру показывается только user_answer — его можно отдавать по мере генерации.
+
+    feed(chunk) -> новый расшифрованный кусок значения поля ("" если пока нечего отдать)
+    """
+
+    _ESCAPES: dict[str, str] = {
+        '"': '"', '\\': '\\', '/': '/',
+        'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t',
+    }
+
+    def __init__(self, field: str):
+        self._key_pattern = re.compile(r'"%s"\s*:\s*"' % re.escape(field))
+        self._buffer: str = ""
+        self._pos: int | None = None  # начало ещё не разобранной части значения
+
+        self.value: str = ""
+        self.done: bool = False
+
+    def feed(self, chunk: str) -> str:
+        self._buffer += chunk
+        if self.done:
+            return ""
+
+        if self._pos is None:
+            match = self._key_pattern.search(self._buffer)
+            if not match:
+                return ""
+            self._pos = match.end()
+
+        buffer: str = self._buffer
+        i: int = self._pos
+        decoded: list[str] = []
+
+        while i < len(buffer):
+            char = buffer[i]
+
+            if char == '"':
+                self.done = True
+                i += 1
+                break
+
+            if char == '\\':
+                # escape может быть разрезан между чанками — ждём следующий
+                if i + 1 >= len(buffer):
+                    break
+                escaped = buffer[i + 1]
+                if escaped == 'u':
+                    char, consumed = self._decode_unicode_escape(buffer, i)
+                    if not consumed:
+                        break
+                    decoded.append(char)
+                    i += consumed
+                    continue
+
+                decoded.append(self._ESCAPES.get(escaped, escaped))
+                i += 2
+                continue
+
+            decoded.append(char)
+            i += 1
+
+        self._pos = i
+        text: str = "".join(decoded)
+        self.value += text
+        return text
+
+    @staticmethod
+    def _decode_unicode_escape(buffer: str, i: int) -> tuple[str, int]:
+        """
+        \\uXXXX с позиции i -> (символ, длина разобранного); (.., 0) — escape не дошёл целиком, ждём чанк.
+
+        Символы вне BMP (эмодзи) приходят суррогатной парой \\uD83D\\uDE00 — склеиваем в один символ:
+        одиночный суррогат Telegram не принимает. Непарный суррогат -> U+FFFD.
+        """
+        if i + 6 > len(buffer):
+            return "", 0
+        try:
+            code: int = int(buffer[i + 2:i + 6], 16)
+        except ValueError:
+            return "", 6
+
+        if 0xDC00 <= code <= 0xDFFF:
+            return "\ufffd", 6
+        if not 0xD800 <= code <= 0xDBFF:
+            return chr(code), 6
+
+        # старший суррогат: ждём следующий \\uXXXX (младший)
+        following: str = buffer[i + 6:i + 8]
+        if not "\\u".startswith(following):
+            return "\ufffd", 6
+        if i + 12 > len(buffer):
+            return "", 0
+        try:
+            low: int = int(buffer[i + 8:i + 12], 16)
+        except ValueError:
+            return "\ufffd", 6
+        if not 0xDC00 <= low <= 0xDFFF:
+            return "\ufffd", 6
+        return chr(0x10000 + ((code - 0xD800) << 10) + (low - 0xDC00)), 12
+
+
+async def iterate_deltas(run: Callable[[OnDelta], Awaitable[T]]) -> AsyncIterator[str | T]:
+    """
+    Превращает callback-стриминг (on_delta) в async итератор:
+    отдаёт куски текста по мере генерации, последним элементом — результат run.
+    Ошибка run пробрасывается в итератор.
+    """
+    queue: asyncio.Queue[str] = asyncio.Queue()
+    task: asyncio.Task = asyncio.create_task(run(queue.put))
+
+    try:
+        while True:
+            getter = asyncio.ensure_future(queue.get())
+            done, _ = await asyncio.wait({getter, task}, return_when=asyncio.FIRST_COMPLETED)
+            if getter in done:
+                yield getter.result()
+                continue
+
+            getter.cancel()
+            while not queue.empty():
+                yield queue.get_nowait()
+            yield task.result()
+            return
+    finally:
+        if not task.done():
+            task.cancel()
@@ -0,0 +1,62 @@
+import math
+
+
+class TokenEstimator:
+    """
+    Оценка числа токенов DeepSeek без загрузки токенизатора.
+
+    Веса по классам символов (из доки DeepSeek: 1 англ. символ ≈ 0.3 токена, 1 иероглиф ≈ 0.6),
+    кириллица дробится BPE мельче латиницы. Оценка подстраивается под реальный токенизатор:
+    после каждого запроса observe() сравнивает её с usage.prompt_tokens (скользящий коэффициент).
+    """
+
+    LATIN = 0.3
+    CYRILLIC = 0.4
+    DIGIT = 0.5
+    SPACE = 0.1
+    OTHER = 0.7  # пунктуация, эмодзи, иероглифы
+
+    MESSAGE_OVERHEAD = 4  # служебные токены роли/разделителей на сообщение
+
+    def __init__(self, smoothing: float = 0.1, min_factor: float = 0.5, max_factor: float = 2.0):
+        self.factor = 1.0
+        self.smoothing = smoothing
+        self.min_factor = min_factor
+        self.max_factor = max_factor
+
+    def _raw(self, text: str) -> float:
+        tokens = 0.0
+        for char in text:
+            if char.isspace():
+                tokens += self.SPACE
+            elif char.isdigit():
+                tokens += self.DIGIT
+            elif "a" <= char.lower() <= "z":
+                tokens += self.LATIN
+            elif "Ѐ" <= char <= "ӿ":
+                tokens += self.CYRILLIC
+            else:
+                tokens += self.OTHER
+        return tokens
+
+    def estimate(self, text: str) -> int:
+        """Токенов в тексте"""
+        if not text:
+            return 0
+        return math.ceil(self._raw(text) * self.factor)
+
+    def estimate_messages(self, messages: list[dict]) -> int:
+        """Токенов в OpenAI messages (с накладными на каждое сообщение)"""
+        return sum(self.estimate(message["content"]) + self.MESSAGE_OVERHEAD for message in messages)
+
+    def observe(self, estimated: int, actual: int) -> None:
+        """Калибровка по реальному usage.prompt_tokens запроса, оценка которого была estimated"""
+        if estimated <= 0 or actual <= 0:
+            return
+        ratio = self.factor * actual / estimated
+        factor = (1 - self.smoothing) * self.factor + self.smoothing * ratio
+        self.factor = min(self.max_factor, max(self.min_factor, factor))
+
+
+# общий на процесс: калибровка накапливается со всех запросов
+token_estimator = TokenEstimator()
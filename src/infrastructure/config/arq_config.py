@@ -4,8 +4,12 @@ from typing import cast
 from arq.connections import RedisSettings
 from arq.cron import cron
 from arq.typing import WorkerCoroutine
+from arq.worker import func
 
-from src.core.task_logic.tasks.summarize_daily_logs import summarize_daily_logs
+from src.core.task_logic.tasks.fold_chat_history import fold_chat_history_job
+from src.core.task_logic.tasks.generate_characteristics import generate_characteristics_job, change_user_name_job, \
+    GENERATION_MAX_TRIES
+from src.core.task_logic.tasks.summarize_daily_logs import summarize_daily_logs, summarize_daily_logs_chunk
 from src.infrastructure.config.config import config
 from src.infrastructure.config.loggerConfig import configure_logging
 
@@ -13,7 +17,13 @@ from src.infrastructure.config.loggerConfig import configure_logging
 class WorkerSettings:
     # Функции которые может выполнять worker
     functions = [
-        summarize_daily_logs
+        summarize_daily_logs,
+        summarize_daily_logs_chunk,  # шард сводки, ставится координатором summarize_daily_logs
+        # генерация характеристик после check_in (ставит API)
+        func(generate_characteristics_job, max_tries=GENERATION_MAX_TRIES, timeout=300),
+        func(change_user_name_job, max_tries=GENERATION_MAX_TRIES, timeout=60),
+        # сводка старой истории диалога; результат не храним — job id сразу свободен для следующего сворачивания
+        func(fold_chat_history_job, max_tries=GENERATION_MAX_TRIES, timeout=60, keep_result=0),
     ]
 
     cron_jobs = [
@@ -29,6 +29,14 @@ class Config(BaseSettings):
     # Deepseek API
     DEEPSEEK_API_KEY: ClassVar[str] = environ.get("DEEPSEEK_API_KEY", "")
     MINIMUM_USD_ON_BALANCE: ClassVar[float] = 1
+    DEEPSEEK_BALANCE_REFRESH_SECONDS: ClassVar[int] = int(environ.get("DEEPSEEK_BALANCE_REFRESH_SECONDS", "300"))
+    DEEPSEEK_BALANCE_REFRESH_TOKENS: ClassVar[int] = int(environ.get("DEEPSEEK_BALANCE_REFRESH_TOKENS", "200000"))
+
+    # Стриминг ответа шизы в Telegram (прогрессивное редактирование сообщения)
+    LLM_STREAMING: ClassVar[bool] = environ.get("LLM_STREAMING", "false").lower() == "true"
+    STREAM_EDIT_INTERVAL: ClassVar[float] = float(environ.get("STREAM_EDIT_INTERVAL", "1.0"))  # не чаще 1 edit/сек на чат
+    # Генерация нескольких схем одним запросом к LLM (фоллбэк — по запросу на схему)
+    LLM_COMBINED_GENERATION: ClassVar[bool] = environ.get("LLM_COMBINED_GENERATION", "true").lower() == "true"
 
     # Database
     DATABASE_URL: str = environ.get("DATABASE_URL", "")
@@ -36,6 +44,8 @@ class Config(BaseSettings):
     # Telegram Bot
     TELEGRAM_BOT_TOKEN: ClassVar[str] = environ.get("TELEGRAM_BOT_TOKEN", "")
     TELEGRAM_API_URL: ClassVar[str] = "https://api.telegram.org/bot"
+    TELEGRAM_GLOBAL_RATE: ClassVar[float] = float(environ.get("TELEGRAM_GLOBAL_RATE", "25"))  # лимит бота ~30 msg/s
+    TELEGRAM_CHAT_RATE: ClassVar[float] = float(environ.get("TELEGRAM_CHAT_RATE", "1"))  # лимит на чат ~1 msg/s
 
     # FastAPI
     WEBAPP_HOST: str = environ.get("WEBAPP_HOST", "0.0.0.0")
@@ -44,6 +54,18 @@ class Config(BaseSettings):
 
     API_KEY: str = environ.get("API_KEY", "")
 
+    # Транспорт бот → API: "http" (бот и API раздельно) | "inprocess" (один хост, ручки вызываются напрямую)
+    API_TRANSPORT: ClassVar[str] = environ.get("API_TRANSPORT", "http").lower()
+
+    # HTTP клиент бот → API (пул keep-alive соединений)
+    HTTP_POOL_LIMIT: ClassVar[int] = int(environ.get("HTTP_POOL_LIMIT", "100"))
+    HTTP_POOL_LIMIT_PER_HOST: ClassVar[int] = int(environ.get("HTTP_POOL_LIMIT_PER_HOST", "50"))
+    HTTP_KEEPALIVE_TIMEOUT: ClassVar[float] = float(environ.get("HTTP_KEEPALIVE_TIMEOUT", "4"))  # < keep-alive uvicorn (5с)
+    HTTP_DNS_CACHE_TTL: ClassVar[int] = int(environ.get("HTTP_DNS_CACHE_TTL", "300"))
+    HTTP_FORCE_CLOSE: ClassVar[bool] = environ.get("HTTP_FORCE_CLOSE", "false").lower() == "true"
+    HTTP_GET_RETRIES: ClassVar[int] = int(environ.get("HTTP_GET_RETRIES", "2"))
+    HTTP_RETRY_BACKOFF: ClassVar[float] = float(environ.get("HTTP_RETRY_BACKOFF", "0.2"))
+
     # Yookassa
     PROVIDER_TOKEN: str = environ.get("PROVIDER_TOKEN", "")  # Токен платежки с BotFather
     CURRENCY: str = "RUB"
@@ -55,6 +77,12 @@ class Config(BaseSettings):
 
     # Redis
     REDIS_URL: str = environ.get("REDIS_URL", "redis://redis:6379")
+    CACHE_STAMPEDE_LOCK: bool = environ.get("CACHE_STAMPEDE_LOCK", "false").lower() == "true"
+
+    # L1 кэш в памяти процесса перед Redis
+    LOCAL_CACHE_ENABLED: bool = environ.get("LOCAL_CACHE_ENABLED", "false").lower() == "true"
+    LOCAL_CACHE_MAXSIZE: int = int(environ.get("LOCAL_CACHE_MAXSIZE", "1024"))
+    LOCAL_CACHE_TTL: float = float(environ.get("LOCAL_CACHE_TTL", "60"))
 
     # ARQ
     ARQ_REDIS_URL: str = environ.get("ARQ_REDIS_URL", "")
@@ -0,0 +1,41 @@
+"""
+Заполнение user_profile_current из истории таблиц профилей.
+
+Запускать один раз после миграции c3f1a7d9e2b4 (повторный запуск безопасен — строки перезаписываются):
+    python -m src.infrastructure.database.backfill_profile_current
+"""
+import asyncio
+import logging
+import uuid
+
+from sqlalchemy import select
+
+from src.infrastructure.config.loggerConfig import configure_logging
+from src.infrastructure.database.engine import async_session_maker, engine
+from src.infrastructure.database.models.records import UserRecords
+from src.infrastructure.database.repository.characteristic_repo import CharacteristicRepository
+
+logger = logging.getLogger(__name__)
+
+
+async def backfill_profile_current() -> None:
+    async with async_session_maker() as session:
+        result = await session.execute(select(UserRecords.user_id).distinct())
+        user_ids: list[uuid.UUID] = list(result.scalars().all())
+
+    logger.info(f"backfill user_profile_current: {len(user_ids)} юзеров")
+
+    for i, user_id in enumerate(user_ids, start=1):
+        async with async_session_maker() as session:
+            # кэш не нужен: пересборка только пишет в БД
+            repo = CharacteristicRepository(session, cache_service=None)
+            schemas_count: int = await repo.rebuild_profile_current(user_id)
+
+        logger.info(f"[{i}/{len(user_ids)}] {user_id}: {schemas_count} схем")
+
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    configure_logging()
+    asyncio.run(backfill_profile_current())
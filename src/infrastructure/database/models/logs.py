@@ -1,6 +1,7 @@
+from datetime import datetime
 from typing import Type
 
-from sqlalchemy import UUID, ForeignKey, String, Text, Index
+from sqlalchemy import UUID, ForeignKey, String, Text, Index, Integer, DateTime, UniqueConstraint, func
 from sqlalchemy.orm import mapped_column, Mapped
 
 from src.core.schemas.log_schemas import CharacteristicBatchLogSchema, UserLogSchema
@@ -43,6 +44,37 @@ class CharacteristicBatchLog(IDMixin, TimestampsMixin):
         return CharacteristicBatchLogSchema
 
 
+class CharacteristicBatchCounter(IDMixin):
+    """
+    Накопительный счётчик батча: одна строка на (юзер, характеристика).
+
+    Обновляется вместе с добавлением в батч (INSERT ... ON CONFLICT DO UPDATE ... RETURNING) —
+    проверка порога генерации без чтения строк батча.
+    """
+    __tablename__ = "characteristic_batch_counters"
+
+    user_id: Mapped[UUID] = mapped_column(
+        UUID(as_uuid=True),
+        ForeignKey("users.id", ondelete="CASCADE"),
+        nullable=False
+    )
+    characteristic_type: Mapped[str] = mapped_column(String(64), nullable=False)
+
+    total_chars: Mapped[int] = mapped_column(Integer, nullable=False, server_default="0", comment="сумма длин сообщений")
+    messages_count: Mapped[int] = mapped_column(Integer, nullable=False, server_default="0")
+
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        nullable=False,
+        server_default=func.now(),
+        onupdate=func.now()
+    )
+
+    __table_args__ = (
+        UniqueConstraint("user_id", "characteristic_type", name="uq_batch_counter_user_type"),
+    )
+
+
 class UserLog(IDMixin, TimestampsMixin):
     """Просто логи"""
     __tablename__ = "user_logs"
@@ -0,0 +1,42 @@
+from datetime import datetime
+
+from sqlalchemy import String, DateTime, func, UUID, ForeignKey, Integer, UniqueConstraint
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import mapped_column, Mapped
+
+from src.infrastructure.database.models.base import IDMixin
+
+
+class UserProfileCurrent(IDMixin):
+    """
+    Денормализованный «текущий профиль»: одна строка на (юзер, схема).
+
+    Обновляется в той же транзакции, что и append_characteristic.
+    Хранит самую свежую запись и самую свежую запись другого дня (to_jsonb строки таблицы профиля)
+    + количество записей — чтение профиля не зависит от длины истории.
+    """
+
+    __tablename__ = "user_profile_current"
+
+    user_id: Mapped[UUID] = mapped_column(
+        UUID(as_uuid=True),
+        ForeignKey("users.id", ondelete="CASCADE"),
+        nullable=False,
+        index=True
+    )
+    schema_name: Mapped[str] = mapped_column(String(64), nullable=False, comment="название схемы")
+
+    latest: Mapped[dict] = mapped_column(JSONB, nullable=False, comment="самая свежая запись")
+    previous: Mapped[dict | None] = mapped_column(JSONB(none_as_null=True), nullable=True, comment="самая свежая запись другого дня")
+    record_count: Mapped[int] = mapped_column(Integer, nullable=False, server_default="0", comment="количество записей")
+
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        nullable=False,
+        server_default=func.now(),
+        onupdate=func.now()
+    )
+
+    __table_args__ = (
+        UniqueConstraint("user_id", "schema_name", name="uq_user_profile_current_user_schema"),
+    )
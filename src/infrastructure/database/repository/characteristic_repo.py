@@ -1,55 +1,26 @@
 import logging
 import uuid
-from typing import Generic, Sequence, Any
+from collections import defaultdict
+from datetime import datetime, date, UTC
+from typing import Generic, Sequence
 
-from sqlalchemy import select, delete, desc, func
-from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy import select, delete, desc, func, union_all, cast, Date, DateTime, String, literal, literal_column, \
+    Select, update, case
+from sqlalchemy.dialects.postgresql import insert, JSONB
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.api.response_schemas.characteristic import CharacteristicResponseRaw
-from src.core.schemas.clinical_disorders.anxiety.gdr import GDRSchema
-from src.core.schemas.clinical_disorders.anxiety.panic import PanicSchema
-from src.core.schemas.clinical_disorders.anxiety.ptsd import PTSDSchema
-from src.core.schemas.clinical_disorders.mood_disorders.bipolar import BipolarDisorderSchema
-from src.core.schemas.clinical_disorders.mood_disorders.depression import DepressionDisorderSchema
-from src.core.schemas.clinical_disorders.neuro_disorders.adhd import ADHDSchema
-from src.core.schemas.clinical_disorders.neuro_disorders.autism import AutismSchema
-from src.core.schemas.clinical_disorders.neuro_disorders.dissociative import DissociativeSchema
-from src.core.schemas.clinical_disorders.neuro_disorders.eating import EatingSchema
-from src.core.schemas.clinical_disorders.neuro_disorders.looks_disorder import LooksSchema
-from src.core.schemas.clinical_disorders.personality_disorders.bpd import BPDSchema
-from src.core.schemas.personality_types.hexaco import HexacoSchema
-from src.core.schemas.personality_types.holland_codes import HollandCodesSchema
-from src.core.schemas.personality_types.socionics_type import MBTISchema
-from src.core.schemas.traits.traits_basic import CognitiveProfileSchema, EmotionalProfileSchema, \
-    BehavioralProfileSchema, \
-    SocialProfileSchema
-from schemas.triads.dark_triad import DarkTriadsSchema
-from src.core.schemas.traits.traits_humor import HumorProfileSchema
+from src.core.schemas.log_schemas import CharacteristicBatchLogSchema
 from src.core.services.cache_services.cache_service import CacheService
 from src.infrastructure.database.models.base import M, S
-from src.infrastructure.database.models.basic_profiles.traits_basic import (
-    CognitiveProfile, EmotionalProfile, BehavioralProfile,
-    SocialProfile
-)
-from database.models.triads.dark_triad import DarkTriads
-from src.infrastructure.database.models.basic_profiles.traits_humor import HumorProfile
-from src.infrastructure.database.models.clinical_disorders.anxiety.gdr import GDRDisorder
-from src.infrastructure.database.models.clinical_disorders.anxiety.panic import PanicDisorder
-from src.infrastructure.database.models.clinical_disorders.anxiety.ptsd import PTSDDisorder
-from src.infrastructure.database.models.clinical_disorders.mood_disorders.bipolar import BipolarDisorder
-from src.infrastructure.database.models.clinical_disorders.mood_disorders.depression import DepressionDisorder
-from src.infrastructure.database.models.clinical_disorders.neuro_disorders.adhd import ADHDDisorder
-from src.infrastructure.database.models.clinical_disorders.neuro_disorders.autism import AutismDisorder
-from database.models.clinical_disorders.personality_disorders.dissociative import DissociativeDisorder
-from src.infrastructure.database.models.clinical_disorders.neuro_disorders.eating_disorders import EatingDisorder
-from src.infrastructure.database.models.clinical_disorders.neuro_disorders.looks_disorder import LooksDisorder
-from database.models.clinical_disorders.mood_disorders.bpd import BPDDisorder
-from src.infrastructure.database.models.logs import CharacteristicBatchLog
-from src.infrastructure.database.models.personality_types.hexaco import UserHexaco
-from src.infrastructure.database.models.personality_types.holland_codes import UserHollandCodes
-from src.infrastructure.database.models.personality_types.socionics import UserSocionics
+from src.infrastructure.database.models.logs import CharacteristicBatchLog, CharacteristicBatchCounter
+from src.infrastructure.database.models.profile_current import UserProfileCurrent
 from src.infrastructure.database.models.records import UserRecords
+from src.infrastructure.database.schema_registry import (  # noqa: F401 — реэкспорт
+    CHARACTERISTIC_SCHEMAS_TO_MODELS, CHARACTERISTIC_SCHEMAS_BY_NAME, PERSONALITY_SCHEMAS,
+    SCHEMA_SHORT_NAMES, SHORT_TO_FULL_SCHEMA
+)
+from src.infrastructure.database.unit_of_work import commit_or_flush
 
 # from src.infrastructure.database.models.love_preferences.relationships import LoveLanguage, SexualPreference, \
 #    RelationshipPreference
@@ -61,49 +32,8 @@ class CharacteristicFormat(Generic[S, M]):
 
     @staticmethod
     def get_cls_from_schema_name(schema_name: str) -> type[S] | None:
-        for cls in CHARACTERISTIC_SCHEMAS_TO_MODELS.keys():
-            if schema_name == cls.__name__:
-                return cls
-        return None
-
-
-CHARACTERISTIC_SCHEMAS_TO_MODELS = {
-    # [ traits core ]
-    SocialProfileSchema: SocialProfile,
-    CognitiveProfileSchema: CognitiveProfile,
-    EmotionalProfileSchema: EmotionalProfile,
-    BehavioralProfileSchema: BehavioralProfile,
-
-    DarkTriadsSchema: DarkTriads,
-
-    HumorProfileSchema: HumorProfile,
-
-    BipolarDisorderSchema: BipolarDisorder,
-    DepressionDisorderSchema: DepressionDisorder,
-    ADHDSchema: ADHDDisorder,
-    AutismSchema: AutismDisorder,
-    DissociativeSchema: DissociativeDisorder,
-    EatingSchema: EatingDisorder,
-    LooksSchema: LooksDisorder,
-    GDRSchema: GDRDisorder,
-    PanicSchema: PanicDisorder,
-    PTSDSchema: PTSDDisorder,
-    BPDSchema: BPDDisorder,
-
-    HexacoSchema: UserHexaco,
-    HollandCodesSchema: UserHollandCodes,
-    MBTISchema: UserSocionics,
-
-    # "RelationshipPreferenceSchema": RelationshipPreference,
-    # "LoveLanguageSchema": LoveLanguage,
-    # "SexualPreferenceSchema": SexualPreference
-}
-
-PERSONALITY_SCHEMAS = (
-    HexacoSchema,
-    HollandCodesSchema,
-    MBTISchema
-)
+        return CHARACTERISTIC_SCHEMAS_BY_NAME.get(schema_name)
+
 
 # LOVE_SCHEMAS = (
 #     RelationshipPreferenceSchema,
@@ -111,41 +41,9 @@ PERSONALITY_SCHEMAS = (
 #     SexualPreferenceSchema
 # )
 
-SCHEMA_SHORT_NAMES = {
-    "SocialProfileSchema":      "soc",
-    "CognitiveProfileSchema":   "cog",
-    "EmotionalProfileSchema":   "emo",
-    "BehavioralProfileSchema":  "beh",
-
-    "DarkTriadsSchema":         "dark",
-    "HumorProfileSchema":       "hum",
-
-    "BipolarDisorderSchema":    "bip",
-    "DepressionSchema":         "dep",
-    "ADHDSchema":               "adhd",
-    "AutismSchema":             "aut",
-    "DissociativeSchema":       "dis",
-    "EatingSchema":             "eat",
-    "LooksSchema":              "look",
-    "GDRSchema":                "gad",
-    "PanicSchema":              "pan",
-    "PTSDSchema":               "pts",
-    "BPDSchema":                "bpd",
-
-    "HexacoSchema":         "hex",
-    "HollandCodesSchema":   "hol",
-    "MBTISchema":      "socion",
-
-    "ChangeName": "name"
-    # добавляй новые по мере появления
-}
-SHORT_TO_FULL_SCHEMA = {v: k for k, v in SCHEMA_SHORT_NAMES.items()}
-
 
 def get_schema_type_from_name(schema_name: str) -> type[S] | None:
-    for schema in CHARACTERISTIC_SCHEMAS_TO_MODELS.keys():
-        if schema_name == schema.__name__:
-            return schema
+    return CHARACTERISTIC_SCHEMAS_BY_NAME.get(schema_name)
 
 
 # noinspection SpellCheckingInspection
@@ -165,82 +63,156 @@ class CharacteristicRepository:
         Возвращает список из CharacteristicRaw схем разных типов.
 
         CharacteristicRaw содержит две схемы (самую свежую и самую свежую любого другого дня)
-        """
 
-        # Список пар (модель, схема)
-        model_schema_pairs: list[tuple[M, S]] = [
-            (m, s) for s, m in CHARACTERISTIC_SCHEMAS_TO_MODELS.items()
+        Читается из user_profile_current (один индексный запрос),
+        схемы, которых там нет (таблица заполнена не полностью, напр. до backfill), —
+        из истории одним UNION ALL запросом только по этим схемам.
+        """
+        snapshot: dict[str, tuple[list[dict], int]] = await self.get_profile_current(user_id)
+        missing_schemas: list[type[S]] = [
+            schema_cls for schema_cls in CHARACTERISTIC_SCHEMAS_TO_MODELS.keys()
+            if schema_cls.__name__ not in snapshot
         ]
+        if missing_schemas:
+            snapshot |= await self.get_snapshot_from_history(user_id, missing_schemas)
 
-        profile_models = [m for m, s in model_schema_pairs]
-        profile_names = {m.__tablename__ for m, s in model_schema_pairs}
-
-        if profile_models:
-            count_subquery = (
-                select(
-                    UserRecords.user_id,
-                    UserRecords.profile_name,
-                    func.count(UserRecords.id).label("record_count")
-                )
-                .where(
-                    UserRecords.user_id == user_id,
-                    UserRecords.profile_name.in_(profile_names)
-                )
-                .group_by(UserRecords.user_id, UserRecords.profile_name)
-                .subquery()
+        # [ собираем в порядке CHARACTERISTIC_SCHEMAS_TO_MODELS ]
+        response: list[CharacteristicResponseRaw] = []
+        for schema_cls in CHARACTERISTIC_SCHEMAS_TO_MODELS.keys():
+            if schema_cls.__name__ not in snapshot:
+                continue
+
+            payloads, record_count = snapshot[schema_cls.__name__]
+            raw = CharacteristicResponseRaw(
+                type=schema_cls.__name__,
+                characteristics=[schema_cls.model_validate(self._normalize_payload(payload)) for payload in payloads]
             )
+            # [ добавление records ]
+            raw.characteristics[0].records = record_count or 0
+            response += [raw]
+        return response
 
-            counts_result = await self.session.execute(
-                select(count_subquery.c.profile_name, count_subquery.c.record_count)
-            )
-            # noinspection PyTypeChecker
-            records_map = dict(counts_result.all())  # {"social": 42, "emotional": 15, ...}
-        else:
-            records_map = {}
+    async def get_profile_current(
+            self,
+            user_id: uuid.UUID
+    ) -> dict[str, tuple[list[dict], int]]:
+        """{schema_name: ([latest, previous?], record_count)} из user_profile_current"""
+        stmt = select(
+            UserProfileCurrent.schema_name,
+            UserProfileCurrent.latest,
+            UserProfileCurrent.previous,
+            UserProfileCurrent.record_count
+        ).where(UserProfileCurrent.user_id == user_id)
+        result = await self.session.execute(stmt)
 
-        # [ получаем каждую модель в правильно порядке для CharacteristicRaw ]
-        response: list[CharacteristicResponseRaw] = []
-        for model_cls, schema_cls in model_schema_pairs:
-            # noinspection PyTypeChecker
-            stmt = (
-                select(model_cls)
-                .where(model_cls.user_id == user_id)
-                .order_by(desc(model_cls.created_at))
-                .limit(20)
-            )
+        return {
+            schema_name: ([latest, previous] if previous else [latest], record_count)
+            for schema_name, latest, previous, record_count in result.all()
+        }
+
+    async def get_snapshot_from_history(
+            self,
+            user_id: uuid.UUID,
+            schema_types: Sequence[type[S]] | None = None
+    ) -> dict[str, tuple[list[dict], int]]:
+        """
+        {schema_name: ([latest, previous?], record_count)} из таблиц профилей (schema_types — только эти схемы).
+        Все профили, выбор двух строк и количество записей — одним запросом (UNION ALL по таблицам).
+        """
+        stmt = union_all(*[
+            self._get_snapshot_select(CHARACTERISTIC_SCHEMAS_TO_MODELS[schema_cls], schema_cls, user_id)
+            for schema_cls in (schema_types or CHARACTERISTIC_SCHEMAS_TO_MODELS.keys())
+        ])
+        result = await self.session.execute(stmt)
+
+        rows_map: dict[str, list[tuple[datetime, dict, int]]] = defaultdict(list)
+        for schema_name, payload, created_at, record_count in result.all():
+            rows_map[schema_name].append((created_at, payload, record_count))
 
-            result = await self.session.execute(stmt)
-            instances: list[Any] | Any = result.scalars().all()
+        snapshot: dict[str, tuple[list[dict], int]] = {}
+        for schema_name, rows in rows_map.items():
+            rows.sort(key=lambda row: row[0], reverse=True)  # самая свежая первой
+            snapshot[schema_name] = ([payload for _, payload, _ in rows], rows[0][2])
+        return snapshot
 
-            if not instances:
-                instances = []
-            else:
-                latest = instances[0]
+    @staticmethod
+    def _get_snapshot_select(
+            model_cls: type[M],
+            schema_cls: type[S],
+            user_id: uuid.UUID,
+            history_limit: int = 20
+    ) -> Select:
+        """
+        Две строки одной таблицы профиля:
+            — самая свежая
+            — самая свежая из любого другого дня (среди последних history_limit записей)
 
-                latest_date = latest.created_at.date()
-                second = None
+        + количество записей из user_records.
+        """
+        table_name: str = model_cls.__tablename__
 
-                for inst in instances[1:]:
-                    if inst.created_at.date() != latest_date:
-                        second = inst
-                        break
+        # дата как в python: created_at.date() у datetime в UTC
+        created_day = cast(func.timezone("UTC", model_cls.created_at), Date)
 
-                instances = [latest]
-                if second:
-                    instances.append(second)
+        recent = (
+            select(
+                func.to_jsonb(literal_column(table_name), type_=JSONB).label("payload"),
+                model_cls.created_at.label("created_at"),
+                created_day.label("created_day"),
+            )
+            .select_from(model_cls)
+            .where(model_cls.user_id == user_id)
+            .order_by(desc(model_cls.created_at))
+            .limit(history_limit)
+            .subquery()
+        )
 
-            if instances:
-                raw = CharacteristicResponseRaw(
-                    type=schema_cls.__name__,
-                    characteristics=[schema_cls.model_validate(instance, from_attributes=True) for instance in instances]
-                )
-                # [ добавление records ]
-                if model_cls.__tablename__ in records_map:
-                    raw.characteristics[0].records = records_map[model_cls.__tablename__]
-                else:
-                    raw.characteristics[0].records = 0
-                response += [raw]
-        return response
+        marked = select(
+            recent.c.payload,
+            recent.c.created_at,
+            (
+                    recent.c.created_day == func.first_value(recent.c.created_day).over(
+                        order_by=recent.c.created_at.desc()
+                    )
+            ).label("is_latest_day"),
+        ).subquery()
+
+        ranked = select(
+            marked.c.payload,
+            marked.c.created_at,
+            func.row_number().over(
+                partition_by=marked.c.is_latest_day,
+                order_by=marked.c.created_at.desc()
+            ).label("rn"),
+        ).subquery()
+
+        records_count = (
+            select(func.count(UserRecords.id))
+            .where(
+                UserRecords.user_id == user_id,
+                UserRecords.profile_name == table_name
+            )
+            .scalar_subquery()
+        )
+
+        return (
+            select(
+                literal(schema_cls.__name__, type_=String).label("schema_name"),
+                ranked.c.payload,
+                ranked.c.created_at,
+                records_count.label("record_count"),
+            )
+            .where(ranked.c.rn == 1)
+        )
+
+    @staticmethod
+    def _normalize_payload(payload: dict) -> dict:
+        """to_jsonb отдаёт даты в таймзоне сессии — приводим к UTC, как у ORM-моделей"""
+        for key in ("created_at", "updated_at"):
+            value = payload.get(key)
+            if isinstance(value, str):
+                payload[key] = datetime.fromisoformat(value).astimezone(UTC)
+        return payload
 
     async def append_characteristic(
             self,
@@ -250,45 +222,207 @@ class CharacteristicRepository:
     ) -> None:
         """
         Добавление новой характеристики юзера
+        + обновление user_profile_current в той же транзакции
         """
+        await self._insert_characteristic(user_id, characteristic)
+        await commit_or_flush(self.session)
+
+        await self.cache_service.redis_service.invalidate_characteristics(telegram_id)
+        await self.cache_service.redis_service.invalidate_profile_fragments(user_id)
+
+    async def append_characteristics(
+            self,
+            user_id: uuid.UUID,
+            characteristics: list[S],
+            telegram_id: str,
+            consumed_logs: Sequence[CharacteristicBatchLogSchema] = ()
+    ) -> None:
+        """
+        Несколько новых характеристик (генерация по батчам / типирование):
+            вставка + user_profile_current (+ списание использованных логов батча) — одна транзакция,
+            одна инвалидация кэша
+        """
+        if not characteristics:
+            return
+
+        for characteristic in characteristics:
+            await self._insert_characteristic(user_id, characteristic)
+
+        if consumed_logs:
+            await self._consume_batch_logs(user_id, consumed_logs)
+        await commit_or_flush(self.session)
+
+        await self.cache_service.redis_service.invalidate_characteristics(telegram_id)
+        await self.cache_service.redis_service.invalidate_profile_fragments(user_id)
+
+    async def _insert_characteristic(
+            self,
+            user_id: uuid.UUID,
+            characteristic: S
+    ) -> None:
+        """Строка профиля + UserRecords (один запрос) + user_profile_current (без commit)"""
         char_data = characteristic.model_dump(exclude={"created_at", "updated_at", "GROUP", "records"})  # даты на стороне БД
         char_data["user_id"] = user_id
 
         model_class: type[M] = CHARACTERISTIC_SCHEMAS_TO_MODELS.get(type(characteristic))
 
+        # [ добавление UserRecords ] — data-modifying CTE того же INSERT (id задаётся явно: python default в CTE не работает)
+        new_record = insert(UserRecords).values(
+            id=uuid.uuid4(),
+            user_id=str(user_id),
+            profile_name=model_class.__tablename__,
+        ).cte("new_record")
+
         stmt = (
             insert(model_class)
             .values(char_data)
-            .returning(None)
+            .returning(func.to_jsonb(literal_column(model_class.__tablename__), type_=JSONB))
+            .add_cte(new_record)
         )
-        await self.session.execute(stmt)
+        payload: dict = (await self.session.execute(stmt)).scalar_one()
 
-        # [ добавление UserRecords ]
-        record_stmt = insert(UserRecords).values(
-            user_id=str(user_id),
-            profile_name=model_class.__tablename__,
+        await self._update_profile_current(user_id, type(characteristic), payload)
+
+    async def _update_profile_current(
+            self,
+            user_id: uuid.UUID,
+            schema_cls: type[S],
+            payload: dict
+    ) -> None:
+        """
+        Сдвигает «текущий профиль»:
+            — latest = новая запись
+            — previous = старая latest, если она другого дня (иначе previous не меняется)
+            — record_count + 1
+
+        Если строки ещё нет (юзер не попал в backfill) — собирает её из истории.
+        """
+        new_day: date = datetime.fromisoformat(payload["created_at"]).astimezone(UTC).date()
+        latest_day = cast(
+            func.timezone("UTC", cast(UserProfileCurrent.latest["created_at"].astext, DateTime(timezone=True))),
+            Date
         )
-        await self.session.execute(record_stmt)
-        await self.session.commit()
 
-        await self.cache_service.redis_service.invalidate_characteristics(telegram_id)
+        update_stmt = (
+            update(UserProfileCurrent)
+            .where(
+                UserProfileCurrent.user_id == user_id,
+                UserProfileCurrent.schema_name == schema_cls.__name__
+            )
+            .values(
+                latest=payload,
+                previous=case(
+                    (latest_day != new_day, UserProfileCurrent.latest),
+                    else_=UserProfileCurrent.previous
+                ),
+                record_count=UserProfileCurrent.record_count + 1,
+            )
+            .returning(UserProfileCurrent.id)
+        )
+        if (await self.session.execute(update_stmt)).first():
+            return
+
+        snapshot = await self.get_snapshot_from_history(user_id, [schema_cls])
+        payloads, record_count = snapshot.get(schema_cls.__name__, ([payload], 1))
+        await self._upsert_profile_current(user_id, schema_cls.__name__, payloads, record_count)
 
-    async def create_log_in_batch(
+    async def _upsert_profile_current(
             self,
             user_id: uuid.UUID,
-            characteristic_type: type[M],
-            message: str
+            schema_name: str,
+            payloads: list[dict],
+            record_count: int
     ) -> None:
-        """Создает лог в таблице батчей"""
-        batch_log = CharacteristicBatchLog(
+        """Перезаписывает строку user_profile_current целиком"""
+        stmt = insert(UserProfileCurrent).values(
             user_id=user_id,
-            characteristic_type=characteristic_type.__name__,
-            message=message
+            schema_name=schema_name,
+            latest=payloads[0],
+            previous=payloads[1] if len(payloads) > 1 else None,
+            record_count=record_count,
+        )
+        stmt = stmt.on_conflict_do_update(
+            constraint="uq_user_profile_current_user_schema",
+            set_={
+                "latest": stmt.excluded.latest,
+                "previous": stmt.excluded.previous,
+                "record_count": stmt.excluded.record_count,
+                "updated_at": func.now(),
+            }
+        )
+        await self.session.execute(stmt)
+
+    async def rebuild_profile_current(self, user_id: uuid.UUID) -> int:
+        """Пересобирает user_profile_current юзера из истории (backfill). Возвращает количество схем"""
+        snapshot = await self.get_snapshot_from_history(user_id)
+        for schema_name, (payloads, record_count) in snapshot.items():
+            await self._upsert_profile_current(user_id, schema_name, payloads, record_count)
+        await commit_or_flush(self.session)
+        return len(snapshot)
+
+    async def add_logs_to_batch(
+            self,
+            user_id: uuid.UUID,
+            characteristic_types: list[type[M]],
+            message: str
+    ) -> dict[str, int]:
+        """
+        Добавляет сообщение в батчи нескольких характеристик.
+        Возвращает {название модели: накопленная длина батча}.
+
+        Длина ведётся в characteristic_batch_counters (один многострочный upsert ... RETURNING),
+        строки батча не читаются. Вызывается один раз на check_in (в его транзакции),
+        поэтому одинаковые сообщения подряд ("да", "да") — разные записи батча.
+        """
+        if not characteristic_types:
+            return {}
+
+        type_names: list[str] = [characteristic_type.__name__ for characteristic_type in characteristic_types]
+
+        stmt = insert(CharacteristicBatchCounter).values([
+            {
+                "user_id": user_id,
+                "characteristic_type": type_name,
+                "total_chars": len(message),
+                "messages_count": 1,
+            }
+            for type_name in type_names
+        ])
+        stmt = stmt.on_conflict_do_update(
+            constraint="uq_batch_counter_user_type",
+            set_={
+                "total_chars": CharacteristicBatchCounter.total_chars + stmt.excluded.total_chars,
+                "messages_count": CharacteristicBatchCounter.messages_count + 1,
+                "updated_at": func.now(),
+            }
+        ).returning(CharacteristicBatchCounter.characteristic_type, CharacteristicBatchCounter.total_chars)
+
+        totals: dict[str, int] = dict((await self.session.execute(stmt)).tuples().all())
+
+        await self.session.execute(
+            insert(CharacteristicBatchLog).values([
+                {"user_id": user_id, "characteristic_type": type_name, "message": message}
+                for type_name in type_names
+            ])
         )
 
-        self.session.add(batch_log)
-        await self.session.commit()
-        await self.session.refresh(batch_log)
+        await commit_or_flush(self.session)
+        return totals
+
+    async def get_batch_totals(
+            self,
+            user_id: uuid.UUID,
+            characteristic_type_names: list[str]
+    ) -> dict[str, int]:
+        """{название модели: накопленная длина батча} по счётчикам"""
+        stmt = select(
+            CharacteristicBatchCounter.characteristic_type,
+            CharacteristicBatchCounter.total_chars
+        ).where(
+            CharacteristicBatchCounter.user_id == user_id,
+            CharacteristicBatchCounter.characteristic_type.in_(characteristic_type_names)
+        )
+        return dict((await self.session.execute(stmt)).tuples().all())
 
     async def get_batch_logs(
             self,
@@ -306,18 +440,33 @@ class CharacteristicRepository:
         result = await self.session.execute(stmt)
         return [model.get_schema() for model in result.scalars().all()]
 
-    async def delete_batch_logs(
+    async def _consume_batch_logs(
             self,
             user_id: uuid.UUID,
-            characteristic_type: type[M]
-    ):
-        """Удаляет все батчи конкретной характеристики у юзера"""
-        characteristic_type_name = characteristic_type.__name__
-
-        stmt = delete(CharacteristicBatchLog).where(
-            CharacteristicBatchLog.user_id == user_id,
-            CharacteristicBatchLog.characteristic_type == characteristic_type_name
+            batch_logs: Sequence[CharacteristicBatchLogSchema]
+    ) -> None:
+        """
+        Списывает использованные логи батча (без commit):
+        удаляются только они, счётчик уменьшается на их длину — сообщения, добавленные во время генерации, остаются
+        """
+        await self.session.execute(
+            delete(CharacteristicBatchLog).where(CharacteristicBatchLog.id.in_([log.id for log in batch_logs]))
         )
 
-        await self.session.execute(stmt)
-        await self.session.commit()
+        consumed: dict[str, tuple[int, int]] = {}
+        for log in batch_logs:
+            chars, count = consumed.get(log.characteristic_type, (0, 0))
+            consumed[log.characteristic_type] = (chars + len(log.message), count + 1)
+
+        for type_name, (chars, count) in consumed.items():
+            await self.session.execute(
+                update(CharacteristicBatchCounter)
+                .where(
+                    CharacteristicBatchCounter.user_id == user_id,
+                    CharacteristicBatchCounter.characteristic_type == type_name
+                )
+                .values(
+                    total_chars=func.greatest(CharacteristicBatchCounter.total_chars - chars, 0),
+                    messages_count=func.greatest(CharacteristicBatchCounter.messages_count - count, 0),
+                )
+            )
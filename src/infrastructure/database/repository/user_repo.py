@@ -7,7 +7,6 @@ import pytz
 from sqlalchemy import select, update, func, text, desc
 from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
 
 from src.core.enums.user import GENDER, TALKING_MODES
 from src.core.schemas.diary_schema import DiarySchema
@@ -16,6 +15,7 @@ from src.infrastructure.database.models.diary import UserDiary
 from src.infrastructure.database.models.logs import UserLog
 from src.infrastructure.database.models.user import User
 from src.infrastructure.database.repository.base_repo import BaseRepository
+from src.infrastructure.database.unit_of_work import commit_or_flush
 
 logger = logging.getLogger(__name__)
 
@@ -40,15 +40,11 @@ class UserRepository(BaseRepository):
         return user.get_schema()
 
     async def get_user(self, user_id: uuid.UUID) -> UserSchema | None:
-        """Возвращает модель юзера"""
+        """Возвращает схему юзера (без дневника — он берётся отдельно через get_user_diary)"""
         stmt = (
             select(User).where(
                 User.id == user_id
             )
-            .options(
-                # [ diary ]
-                selectinload(User.diary),
-            )
         )
         result = await self.session.execute(stmt)
         user: User | None = result.scalar_one_or_none()
@@ -108,15 +104,9 @@ class UserRepository(BaseRepository):
         )
         await self.session.flush()
 
-    async def get_active_user_logs(
-            self,
-            date_filter: datetime.date,
-            max_logs_per_user: int,
-            max_chars: int
-    ) -> dict[uuid.UUID, list[tuple[str, str]]]:
-        """
-        Получение всех логов активных за сегодня юзеров
-        """
+    @staticmethod
+    def _get_msk_day_bounds(date_filter: datetime.date) -> tuple[datetime.datetime, datetime.datetime]:
+        """Начало и конец дня по МСК"""
         MSK_TZ = pytz.timezone('Europe/Moscow')
 
         start_date = MSK_TZ.localize(
@@ -128,6 +118,40 @@ class UserRepository(BaseRepository):
                 datetime.datetime.min.time()
             )
         )
+        return start_date, end_date
+
+    async def get_active_users(self, date_filter: datetime.date) -> list[tuple[uuid.UUID, str]]:
+        """Активные за день юзеры: [(user_id, telegram_id), ...]"""
+        start_date, end_date = self._get_msk_day_bounds(date_filter)
+
+        stmt = (
+            select(User.id, User.telegram_id)
+            .where(
+                select(UserLog.id).where(
+                    UserLog.user_id == User.id,
+                    UserLog.created_at >= start_date,
+                    UserLog.created_at <= end_date
+                ).exists()
+            )
+            .order_by(User.id)
+        )
+        result = await self.session.execute(stmt)
+        return [(user_id, telegram_id) for user_id, telegram_id in result.all()]
+
+    async def get_active_user_logs(
+            self,
+            date_filter: datetime.date,
+            max_logs_per_user: int,
+            max_chars: int,
+            user_ids: list[uuid.UUID] | None = None
+    ) -> dict[uuid.UUID, list[tuple[str, str]]]:
+        """
+        Получение всех логов активных за сегодня юзеров
+
+        :param user_ids: только логи этих юзеров (шард задачи)
+        """
+        start_date, end_date = self._get_msk_day_bounds(date_filter)
+
         stmt = (
             select(
                 UserLog.user_id,
@@ -140,6 +164,8 @@ class UserRepository(BaseRepository):
             )
             .order_by(UserLog.user_id, UserLog.created_at.desc())
         )
+        if user_ids is not None:
+            stmt = stmt.where(UserLog.user_id.in_(user_ids))
 
         result = await self.session.execute(stmt)
         rows = result.all()
@@ -166,55 +192,49 @@ class UserRepository(BaseRepository):
 
         try:
             await self.session.execute(text(stmt), params)
-            await self.session.commit()
+            await commit_or_flush(self.session)
             logger.info(f"Лог создан для пользователя {user_id}")
         except Exception as e:
             await self.session.rollback()
             logger.error(f"Ошибка создания лога: {e}")
             raise
 
-    async def bulk_create_diary_records(self, records: list[tuple[uuid.UUID, str, str]]) -> int:
-        """
-        Массово создаёт записи в дневник (user_diary).
-
-        Args:
-            records: список кортежей (user_id: UUID, text: str)
+    async def get_users_with_diary(self, user_ids: list[uuid.UUID], day: datetime.date) -> set[uuid.UUID]:
+        """Юзеры, у которых уже есть запись в дневнике за день"""
+        stmt = select(UserDiary.user_id).where(
+            UserDiary.user_id.in_(user_ids),
+            UserDiary.created_at == day
+        )
+        result = await self.session.execute(stmt)
+        return set(result.scalars().all())
 
-        Returns:
-            int: количество успешно вставленных записей
+    async def create_diary_record(
+            self,
+            user_id: uuid.UUID,
+            text_content: str,
+            context_text: str,
+            day: datetime.date
+    ) -> bool:
         """
-        if not records:
-            logger.info("Нет записей для массового создания в дневник")
-            return 0
-
-        data = [
-            {
-                "id": str(uuid.uuid4()),
-                "user_id": str(user_id),
-                "text": text_content,
-                "created_at": datetime.date.today(),
-                "context_text": context_text
-            }
-            for user_id, text_content, context_text in records
-        ]
-
-        stmt = text("""
-            INSERT INTO user_diary (id, user_id, created_at, text, context_text)
-            VALUES (:id, :user_id, :created_at, :text, :context_text)
-            ON CONFLICT (user_id, created_at) DO NOTHING
-        """)
-
-        try:
-            # Важно: execute со списком словарей → SQLAlchemy сам сделает executemany
-            result = await self.session.execute(stmt, data)
-            await self.session.commit()
-            count = result.rowcount
-            logger.info(f"Вставлено {count} записей")
-            return count
-        except Exception as e:
-            await self.session.rollback()
-            logger.error("Bulk insert failed", exc_info=True)
-            raise
+        Идемпотентно создаёт запись в дневник за день (одна на юзера в день).
+        Возвращает True, если запись вставлена (False — уже была)
+        """
+        stmt = (
+            insert(UserDiary)
+            .values(
+                id=uuid.uuid4(),
+                user_id=user_id,
+                text=text_content,
+                context_text=context_text,
+                created_at=day
+            )
+            .on_conflict_do_nothing(constraint="uq_user_diary_one_per_day")
+            .returning(UserDiary.id)
+        )
+        result = await self.session.execute(stmt)
+        inserted: bool = result.scalar_one_or_none() is not None
+        await self.session.commit()
+        return inserted
 
     async def change_gender(
             self,
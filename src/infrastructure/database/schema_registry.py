@@ -0,0 +1,239 @@
+"""
+Реестр схем характеристик — собирается один раз при импорте.
+
+Все поиски по имени схемы — O(1) по словарям, метаданные полей (порядок, описания, исключения)
+посчитаны заранее: горячие пути (промпт check_in, генерация) не ходят по model_fields на каждый вызов.
+"""
+from dataclasses import dataclass
+from types import MappingProxyType
+
+from pydantic import BaseModel
+
+from src.core.schemas.clinical_disorders.anxiety.gdr import GDRSchema
+from src.core.schemas.clinical_disorders.anxiety.panic import PanicSchema
+from src.core.schemas.clinical_disorders.anxiety.ptsd import PTSDSchema
+from src.core.schemas.clinical_disorders.mood_disorders.bipolar import BipolarDisorderSchema
+from src.core.schemas.clinical_disorders.mood_disorders.depression import DepressionDisorderSchema
+from src.core.schemas.clinical_disorders.neuro_disorders.adhd import ADHDSchema
+from src.core.schemas.clinical_disorders.neuro_disorders.autism import AutismSchema
+from src.core.schemas.clinical_disorders.neuro_disorders.dissociative import DissociativeSchema
+from src.core.schemas.clinical_disorders.neuro_disorders.eating import EatingSchema
+from src.core.schemas.clinical_disorders.neuro_disorders.looks_disorder import LooksSchema
+from src.core.schemas.clinical_disorders.personality_disorders.bpd import BPDSchema
+from src.core.schemas.personality_types.hexaco import HexacoSchema
+from src.core.schemas.personality_types.holland_codes import HollandCodesSchema
+from src.core.schemas.personality_types.socionics_type import MBTISchema
+from src.core.schemas.traits.traits_basic import CognitiveProfileSchema, EmotionalProfileSchema, \
+    BehavioralProfileSchema, \
+    SocialProfileSchema
+from schemas.triads.dark_triad import DarkTriadsSchema
+from src.core.schemas.traits.traits_humor import HumorProfileSchema
+from src.core.schemas.triads.light_triad import LightTriadsSchema
+from src.infrastructure.database.models.base import M, S
+from src.infrastructure.database.models.basic_profiles.traits_basic import (
+    CognitiveProfile, EmotionalProfile, BehavioralProfile,
+    SocialProfile
+)
+from database.models.triads.dark_triad import DarkTriads
+from src.infrastructure.database.models.basic_profiles.traits_humor import HumorProfile
+from src.infrastructure.database.models.clinical_disorders.anxiety.gdr import GDRDisorder
+from src.infrastructure.database.models.clinical_disorders.anxiety.panic import PanicDisorder
+from src.infrastructure.database.models.clinical_disorders.anxiety.ptsd import PTSDDisorder
+from src.infrastructure.database.models.clinical_disorders.mood_disorders.bipolar import BipolarDisorder
+from src.infrastructure.database.models.clinical_disorders.mood_disorders.depression import DepressionDisorder
+from src.infrastructure.database.models.clinical_disorders.neuro_disorders.adhd import ADHDDisorder
+from src.infrastructure.database.models.clinical_disorders.neuro_disorders.autism import AutismDisorder
+from database.models.clinical_disorders.personality_disorders.dissociative import DissociativeDisorder
+from src.infrastructure.database.models.clinical_disorders.neuro_disorders.eating_disorders import EatingDisorder
+from src.infrastructure.database.models.clinical_disorders.neuro_disorders.looks_disorder import LooksDisorder
+from database.models.clinical_disorders.mood_disorders.bpd import BPDDisorder
+from src.infrastructure.database.models.personality_types.hexaco import UserHexaco
+from src.infrastructure.database.models.personality_types.holland_codes import UserHollandCodes
+from src.infrastructure.database.models.personality_types.socionics import UserSocionics
+
+# [ исходные таблицы ]
+
+CHARACTERISTIC_SCHEMAS_TO_MODELS = {
+    # [ traits core ]
+    SocialProfileSchema: SocialProfile,
+    CognitiveProfileSchema: CognitiveProfile,
+    EmotionalProfileSchema: EmotionalProfile,
+    BehavioralProfileSchema: BehavioralProfile,
+
+    DarkTriadsSchema: DarkTriads,
+
+    HumorProfileSchema: HumorProfile,
+
+    BipolarDisorderSchema: BipolarDisorder,
+    DepressionDisorderSchema: DepressionDisorder,
+    ADHDSchema: ADHDDisorder,
+    AutismSchema: AutismDisorder,
+    DissociativeSchema: DissociativeDisorder,
+    EatingSchema: EatingDisorder,
+    LooksSchema: LooksDisorder,
+    GDRSchema: GDRDisorder,
+    PanicSchema: PanicDisorder,
+    PTSDSchema: PTSDDisorder,
+    BPDSchema: BPDDisorder,
+
+    HexacoSchema: UserHexaco,
+    HollandCodesSchema: UserHollandCodes,
+    MBTISchema: UserSocionics,
+
+    # "RelationshipPreferenceSchema": RelationshipPreference,
+    # "LoveLanguageSchema": LoveLanguage,
+    # "SexualPreferenceSchema": SexualPreference
+}
+
+PERSONALITY_SCHEMAS = (
+    HexacoSchema,
+    HollandCodesSchema,
+    MBTISchema
+)
+
+# группы для бота (порядок схем в группе = порядок вывода)
+SCHEMA_GROUPS: dict[str, tuple[type[S], ...]] = {
+    "basic": (
+        SocialProfileSchema,
+        CognitiveProfileSchema,
+        EmotionalProfileSchema,
+        BehavioralProfileSchema,
+    ),
+    "humor": (
+        HumorProfileSchema,
+    ),
+    "triads": (
+        DarkTriadsSchema,
+        LightTriadsSchema
+    ),
+    "neuro": (
+        AutismSchema,
+        ADHDSchema
+    ),
+    "mood_disorders": (
+        DepressionDisorderSchema,
+        BipolarDisorderSchema
+    ),
+    "bpd": (
+        BPDSchema,
+    ),
+    "dissociative": (
+        DissociativeSchema,
+    ),
+    "anxiety": (
+        PTSDSchema,
+        PanicSchema,
+        GDRSchema
+    ),
+    "looks": (
+        LooksSchema,
+        EatingSchema
+    ),
+}
+
+SCHEMA_SHORT_NAMES = {
+    "SocialProfileSchema":      "soc",
+    "CognitiveProfileSchema":   "cog",
+    "EmotionalProfileSchema":   "emo",
+    "BehavioralProfileSchema":  "beh",
+
+    "DarkTriadsSchema":         "dark",
+    "HumorProfileSchema":       "hum",
+
+    "BipolarDisorderSchema":    "bip",
+    "DepressionSchema":         "dep",
+    "ADHDSchema":               "adhd",
+    "AutismSchema":             "aut",
+    "DissociativeSchema":       "dis",
+    "EatingSchema":             "eat",
+    "LooksSchema":              "look",
+    "GDRSchema":                "gad",
+    "PanicSchema":              "pan",
+    "PTSDSchema":               "pts",
+    "BPDSchema":                "bpd",
+
+    "HexacoSchema":         "hex",
+    "HollandCodesSchema":   "hol",
+    "MBTISchema":      "socion",
+
+    "ChangeName": "name"
+    # добавляй новые по мере появления
+}
+SHORT_TO_FULL_SCHEMA = {v: k for k, v in SCHEMA_SHORT_NAMES.items()}
+
+# служебные поля — не попадают ни в промпт, ни в генерацию
+EXCLUDED_FIELDS = frozenset({
+    "id", "user_id", "created_at", "updated_at",
+    "telegram_id", "accuracy_percent", "GROUP"
+})
+
+
+# [ метаданные ]
+
+@dataclass(frozen=True, slots=True)
+class FieldMeta:
+    name: str
+    description: str  # описание поля (или имя поля в Title Case, если описания нет)
+
+
+@dataclass(frozen=True, slots=True)
+class SchemaMeta:
+    name: str
+    schema: type[S]
+    model: type[M] | None  # None — схема без таблицы (только в кэше бота)
+    short_name: str | None
+    group: str | None
+    fields: tuple[FieldMeta, ...]  # поля для промпта/генерации (без EXCLUDED_FIELDS), в порядке схемы
+    custom_dump: bool  # схема переопределяет model_dump (MBTISchema) — значения только через него
+
+
+def _build_fields(schema: type[S]) -> tuple[FieldMeta, ...]:
+    fields: list[FieldMeta] = []
+    for field_name, field_info in schema.model_fields.items():
+        if field_name in EXCLUDED_FIELDS:
+            continue
+        description: str = (field_info.description or "").strip() or field_name.replace("_", " ").title()
+        fields.append(FieldMeta(name=field_name, description=description))
+    return tuple(fields)
+
+
+def _build_registry() -> dict[str, SchemaMeta]:
+    schema_to_group: dict[type[S], str] = {
+        schema: group
+        for group, schemas in SCHEMA_GROUPS.items()
+        for schema in schemas
+    }
+
+    schemas: list[type[S]] = list(CHARACTERISTIC_SCHEMAS_TO_MODELS)
+    schemas += [schema for schema in schema_to_group if schema not in CHARACTERISTIC_SCHEMAS_TO_MODELS]
+
+    return {
+        schema.__name__: SchemaMeta(
+            name=schema.__name__,
+            schema=schema,
+            model=CHARACTERISTIC_SCHEMAS_TO_MODELS.get(schema),
+            short_name=SCHEMA_SHORT_NAMES.get(schema.__name__),
+            group=schema_to_group.get(schema),
+            fields=_build_fields(schema),
+            custom_dump=schema.model_dump is not BaseModel.model_dump,
+        )
+        for schema in schemas
+    }
+
+
+SCHEMA_REGISTRY: MappingProxyType[str, SchemaMeta] = MappingProxyType(_build_registry())
+SCHEMA_META_BY_TYPE: MappingProxyType[type[S], SchemaMeta] = MappingProxyType(
+    {meta.schema: meta for meta in SCHEMA_REGISTRY.values()}
+)
+
+# только схемы с таблицей (характеристики юзера в БД)
+CHARACTERISTIC_SCHEMAS_BY_NAME: MappingProxyType[str, type[S]] = MappingProxyType(
+    {meta.name: meta.schema for meta in SCHEMA_REGISTRY.values() if meta.model is not None}
+)
+
+
+def get_schema_meta(schema: str | type[S]) -> SchemaMeta | None:
+    """Метаданные схемы по имени или классу"""
+    if isinstance(schema, str):
+        return SCHEMA_REGISTRY.get(schema)
+    return SCHEMA_META_BY_TYPE.get(schema)
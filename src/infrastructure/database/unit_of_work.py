@@ -0,0 +1,38 @@
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+_UNIT_OF_WORK_KEY = "unit_of_work"
+
+
+@asynccontextmanager
+async def unit_of_work(session: AsyncSession) -> AsyncIterator[AsyncSession]:
+    """
+    Одна транзакция на несколько записей разных репозиториев.
+
+    Внутри блока репозитории не коммитят (commit_or_flush делает flush),
+    commit — один раз при выходе, при исключении — rollback.
+    """
+    if session.info.get(_UNIT_OF_WORK_KEY):
+        # вложенный блок — коммитит внешний
+        yield session
+        return
+
+    session.info[_UNIT_OF_WORK_KEY] = True
+    try:
+        yield session
+        await session.commit()
+    except BaseException:
+        await session.rollback()
+        raise
+    finally:
+        session.info.pop(_UNIT_OF_WORK_KEY, None)
+
+
+async def commit_or_flush(session: AsyncSession) -> None:
+    """commit вне unit_of_work, внутри — только flush (commit сделает unit_of_work)"""
+    if session.info.get(_UNIT_OF_WORK_KEY):
+        await session.flush()
+    else:
+        await session.commit()